@@ -0,0 +1,129 @@
+import os
+import random
+import zipfile
+from bisect import bisect_left
+from itertools import accumulate
+from typing import Optional
+
+# Syllables of the generated words (term of rank r spells r in base len(SYLLABLES))
+SYLLABLES = ("ka", "lo", "mi", "nu", "pe", "ra", "si", "to", "ve", "zu", "ba", "do", "fi", "go", "hu", "je")
+# Operators of the generated "x y OP" queries
+OPERATORS = ("AND", "OR", "NOT")
+
+
+class SyntheticCorpus:
+    """
+    Deterministic AP-style corpus: term ranks follow a Zipf distribution (frequency ~ 1 / rank^exponent)
+    The same parameters and seed always give the same documents and query workloads.
+    """
+    def __init__(
+        self,
+        n_docs: int = 10_000,
+        vocabulary_size: int = 50_000,
+        zipf_exponent: float = 1.0,
+        mean_doc_length: int = 250,
+        seed: int = 0
+        ):
+        self.n_docs = n_docs
+        self.vocabulary_size = vocabulary_size
+        self.zipf_exponent = zipf_exponent
+        self.mean_doc_length = mean_doc_length
+        self.seed = seed
+        # Terms by rank (most frequent first) and the cumulative Zipf weights to sample them
+        self.vocabulary = [_word(rank) for rank in range(vocabulary_size)]
+        weights = [1 / (rank + 1) ** zipf_exponent for rank in range(vocabulary_size)]
+        total = sum(weights)
+        self._probabilities = [weight / total for weight in weights]
+        self._cum_weights = list(accumulate(self._probabilities))
+
+    def write(self, data_dir: str, n_zips: int = 4, docs_per_file: int = 500) -> list[str]:
+        """Write the documents as AP-format zips (zip -> member files -> <DOC> blocks), return the zip paths."""
+        os.makedirs(data_dir, exist_ok=True)
+        rnd = random.Random(self.seed)
+        docs_per_zip = -(-self.n_docs // n_zips)
+        zip_paths = []
+
+        doc_number = 0
+        for zip_number in range(n_zips):
+            zip_path = os.path.join(data_dir, f"ap{zip_number:03d}.zip")
+            with zipfile.ZipFile(zip_path, "w", zipfile.ZIP_DEFLATED) as zip_file:
+                zip_end = min(self.n_docs, doc_number + docs_per_zip)
+                file_number = 0
+                while doc_number < zip_end:
+                    file_name = f"AP88{zip_number:02d}{file_number:02d}"
+                    parts = []
+                    for _ in range(min(docs_per_file, zip_end - doc_number)):
+                        doc_number += 1
+                        parts.append(self.__document(rnd, f"{file_name}-{doc_number:06d}"))
+                    zip_file.writestr(file_name, "".join(parts))
+                    file_number += 1
+            zip_paths.append(zip_path)
+
+        return zip_paths
+
+    def __document(self, rnd: random.Random, doc_id: str) -> str:
+        length = max(1, int(rnd.gauss(self.mean_doc_length, self.mean_doc_length / 3)))
+        words = rnd.choices(self.vocabulary, cum_weights=self._cum_weights, k=length)
+        # Break the text into lines of ~12 words like the AP newswire
+        lines = [" ".join(words[i:i + 12]) for i in range(0, length, 12)]
+        text = "\n".join(lines)
+        return (
+            f"<DOC>\n<DOCNO> {doc_id} </DOCNO>\n<FILEID>AP-NR-{doc_id}</FILEID>\n"
+            f"<HEAD>Synthetic</HEAD>\n<TEXT>\n{text}\n</TEXT>\n</DOC>\n"
+        )
+
+    def document_fraction(self, rank: int) -> float:
+        """Expected fraction of the documents containing the term of a rank."""
+        return 1 - (1 - self._probabilities[rank]) ** self.mean_doc_length
+
+    def queries(
+        self,
+        n_queries: int,
+        selectivity: float,
+        operators: tuple[str, ...] = OPERATORS,
+        seed: Optional[int] = None
+        ) -> list[str]:
+        """RPN queries "x y OP" whose expected result is ~selectivity of the documents.
+
+        Terms occur independently, so for terms in fractions f1, f2 of the documents
+        AND matches f1 * f2, OR f1 + f2 - f1 * f2 and NOT f1 * (1 - f2) of them.
+        """
+        rnd = random.Random(self.seed if seed is None else seed)
+        # Document fractions by rank decrease, negate them to search an increasing list
+        negated_fractions = [-self.document_fraction(rank) for rank in range(self.vocabulary_size)]
+
+        def term_near(fraction: float) -> str:
+            """A term with an expected document fraction close to fraction (one of a few neighbours)."""
+            rank = min(bisect_left(negated_fractions, -fraction), self.vocabulary_size - 1)
+            rank = min(self.vocabulary_size - 1, max(0, rank + rnd.randint(-3, 3)))
+            return self.vocabulary[rank]
+
+        queries = []
+        for i in range(n_queries):
+            operator = operators[i % len(operators)]
+            if operator == "AND":
+                # f1 * f2 = s with f1 = f2
+                left = right = selectivity ** 0.5
+            elif operator == "OR":
+                # f1 + f2 - f1 * f2 = s with f1 = f2
+                left = right = 1 - (1 - selectivity) ** 0.5
+            else:
+                # f1 * (1 - f2) = s, excluding a term in a random fraction of the documents
+                right = rnd.uniform(0.05, 0.5)
+                left = min(1.0, selectivity / (1 - right))
+            left_term, right_term = term_near(left), term_near(right)
+            while right_term == left_term:
+                right_term = term_near(right)
+            queries.append(f"{left_term} {right_term} {operator}")
+        return queries
+
+
+def _word(rank: int) -> str:
+    """Pronounceable term of a rank (distinct for each rank)."""
+    syllables = []
+    while True:
+        rank, digit = divmod(rank, len(SYLLABLES))
+        syllables.append(SYLLABLES[digit])
+        if not rank:
+            return "".join(syllables)
+        rank -= 1  # bijective numbering: "ka" and "kaka" are both used
@@ -0,0 +1,309 @@
+import argparse
+import json
+import logging
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+import zipfile
+from datetime import datetime, timezone
+from typing import Callable, Iterator, Optional
+
+# Run from anywhere: the index modules live in the repository root
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from benchmarks.corpusGenerator import OPERATORS, SyntheticCorpus
+from booleanRetrieval import BooleanRetrieval
+from invertedIndex import InvertedIndex
+from rankedRetrieval import RankedRetrieval
+
+logger = logging.getLogger(__name__)
+
+# Result sizes (fraction of the documents) of the per-operator query workloads
+SELECTIVITIES = (0.001, 0.01, 0.1)
+# Runs of each query in the operator benchmark, the fastest counts (filters out scheduler noise)
+REPEATS = 3
+# Relative change reported as a regression / improvement by --compare
+COMPARE_TOLERANCE = 0.10
+# Metrics compared by --compare: {key: True if higher is better, ...} (latencies, throughputs, memory)
+METRIC_DIRECTIONS = {
+    "seconds": False,
+    "median_us": False,
+    "p95_us": False,
+    "mean_us": False,
+    "build_peak_mb": False,
+    "docs_per_second": True,
+    "mb_per_second": True,
+    "qps": True,
+}
+# Numbers describing the workload rather than its speed - a change means the runs measured different
+# work (e.g. a query now matches other documents), reported apart from the metrics
+WORKLOAD_KEYS = {"measured_selectivity", "documents", "terms", "input_mb"}
+
+
+def _timed(function: Callable[[], object]) -> tuple[float, object]:
+    """(seconds, result) of one call."""
+    start = time.perf_counter()
+    result = function()
+    return time.perf_counter() - start, result
+
+
+def _latency_stats(seconds: list[float]) -> dict[str, float]:
+    """Median / p95 / mean latency in microseconds."""
+    micros = sorted(second * 1e6 for second in seconds)
+    p95 = statistics.quantiles(micros, n=20)[18] if len(micros) > 1 else micros[0]
+    return {
+        "median_us": round(statistics.median(micros), 2),
+        "p95_us": round(p95, 2),
+        "mean_us": round(statistics.fmean(micros), 2),
+    }
+
+
+def bench_indexing(data_dir: str, workers: int) -> tuple[dict, InvertedIndex]:
+    """Serial (and parallel) build throughput, returns the results and the serially built index."""
+    text_bytes = 0
+    for zip_name in os.listdir(data_dir):
+        with zipfile.ZipFile(os.path.join(data_dir, zip_name)) as zip_file:
+            text_bytes += sum(info.file_size for info in zip_file.infolist())
+
+    index = InvertedIndex()
+    seconds, _ = _timed(lambda: index.build_index(data_dir))
+    n_docs = len(index.get_doc_id_map())
+    results = {
+        "documents": n_docs,
+        "terms": len(index.get_index()),
+        "input_mb": round(text_bytes / 2 ** 20, 2),
+        "serial": {
+            "seconds": round(seconds, 3),
+            "docs_per_second": round(n_docs / seconds, 1),
+            "mb_per_second": round(text_bytes / 2 ** 20 / seconds, 2),
+        },
+    }
+
+    if workers > 1:
+        seconds, _ = _timed(lambda: InvertedIndex().build_index(data_dir, workers=workers))
+        results["parallel"] = {
+            "workers": workers,
+            "seconds": round(seconds, 3),
+            "docs_per_second": round(n_docs / seconds, 1),
+            "mb_per_second": round(text_bytes / 2 ** 20 / seconds, 2),
+        }
+    return results, index
+
+
+def bench_memory(data_dir: str) -> dict:
+    """Peak Python heap of a serial build (separate run, tracemalloc slows the build down)."""
+    tracemalloc.start()
+    try:
+        InvertedIndex().build_index(data_dir)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {"build_peak_mb": round(peak / 2 ** 20, 2)}
+
+
+def bench_operators(index: InvertedIndex, corpus: SyntheticCorpus, n_queries: int, strategy: str) -> dict:
+    """Latency of single AND / OR / NOT queries by result selectivity (no cache, no planner rewrites)."""
+    retrieval = BooleanRetrieval(strategy=strategy, optimize=False)
+    inverted_index = index.get_index()
+    n_docs = len(index.get_doc_id_map())
+
+    results = {}
+    for operator in OPERATORS:
+        for selectivity in SELECTIVITIES:
+            queries = corpus.queries(n_queries, selectivity, (operator,))
+            latencies = []
+            matched = 0
+            for query in queries:
+                runs = [
+                    _timed(lambda: retrieval._execute_query_retrieval(query.split(), inverted_index))
+                    for _ in range(REPEATS)
+                ]
+                latencies.append(min(seconds for seconds, _ in runs))
+                matched += len(runs[0][1])
+            results[f"{operator}@{selectivity}"] = {
+                **_latency_stats(latencies),
+                "measured_selectivity": round(matched / (len(queries) * n_docs), 5),
+            }
+    return results
+
+
+def bench_queries(index: InvertedIndex, corpus: SyntheticCorpus, n_queries: int) -> dict:
+    """End-to-end queries per second of mixed workloads."""
+    inverted_index = index.get_index()
+    # All operators and selectivities (a different, fixed query sample per selectivity)
+    queries = [
+        query
+        for number, selectivity in enumerate(SELECTIVITIES)
+        for query in corpus.queries(n_queries // len(SELECTIVITIES), selectivity, seed=corpus.seed + number)
+    ]
+
+    results = {}
+    retrieval = BooleanRetrieval()
+    seconds, _ = _timed(lambda: [retrieval._execute_query_retrieval(query.split(), inverted_index) for query in queries])
+    results["boolean"] = {"queries": len(queries), "qps": round(len(queries) / seconds, 1)}
+
+    seconds, _ = _timed(lambda: BooleanRetrieval().retrieve_batch(queries, inverted_index))
+    results["boolean_batch"] = {"queries": len(queries), "qps": round(len(queries) / seconds, 1)}
+
+    # Free-text queries of the operand terms, top 10
+    ranked = RankedRetrieval()
+    frequency_index, doc_lengths, doc_map = index.get_frequency_index(), index.get_doc_lengths(), index.get_doc_id_map()
+    terms = [query.split()[:2] for query in queries]
+    seconds, _ = _timed(lambda: [
+        ranked.search(query_terms, inverted_index, frequency_index, doc_lengths, doc_map, 10) for query_terms in terms
+    ])
+    results["ranked_top10"] = {"queries": len(terms), "qps": round(len(terms) / seconds, 1)}
+    return results
+
+
+def run(
+    n_docs: int,
+    vocabulary_size: int,
+    zipf_exponent: float,
+    mean_doc_length: int,
+    seed: int,
+    n_queries: int,
+    workers: int,
+    strategy: str,
+    data_dir: Optional[str] = None
+    ) -> dict:
+    """Generate the corpus (unless data_dir already holds it) and run all benchmarks."""
+    corpus = SyntheticCorpus(n_docs, vocabulary_size, zipf_exponent, mean_doc_length, seed)
+    config = {
+        "documents": n_docs,
+        "vocabulary_size": vocabulary_size,
+        "zipf_exponent": zipf_exponent,
+        "mean_doc_length": mean_doc_length,
+        "seed": seed,
+        "queries": n_queries,
+        "workers": workers,
+        "strategy": strategy,
+    }
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        if data_dir is None:
+            data_dir = tmp_dir
+        os.makedirs(data_dir, exist_ok=True)
+        if not os.listdir(data_dir):
+            logger.info("Generating %d documents into %s", n_docs, data_dir)
+            corpus.write(data_dir)
+
+        logger.info("Benchmarking indexing")
+        indexing, index = bench_indexing(data_dir, workers)
+        logger.info("Benchmarking memory")
+        memory = bench_memory(data_dir)
+        logger.info("Benchmarking operators")
+        operators = bench_operators(index, corpus, n_queries, strategy)
+        logger.info("Benchmarking queries")
+        queries = bench_queries(index, corpus, n_queries)
+
+    return {
+        "environment": _environment(),
+        "config": config,
+        "indexing": indexing,
+        "memory": memory,
+        "operators": operators,
+        "queries": queries,
+    }
+
+
+def _environment() -> dict:
+    """Where the numbers come from, to tell apart runs on different machines / commits."""
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "commit": commit,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+    }
+
+
+def _pairs(current: dict, baseline: dict, path: str = "") -> Iterator[tuple[str, str, float, float]]:
+    """(dotted name, key, old, new) of the numbers present in both result files (environment / config skipped)."""
+    for key, value in current.items():
+        if key in ("environment", "config"):
+            continue
+        name = f"{path}.{key}" if path else key
+        old = baseline.get(key)
+        if isinstance(value, dict) and isinstance(old, dict):
+            yield from _pairs(value, old, name)
+        elif isinstance(value, (int, float)) and isinstance(old, (int, float)):
+            yield name, key, old, value
+
+
+def compare(current: dict, baseline: dict) -> list[str]:
+    """Lines describing metrics that changed by more than COMPARE_TOLERANCE between two result files."""
+    lines = []
+    for name, key, old, value in _pairs(current, baseline):
+        higher_is_better = METRIC_DIRECTIONS.get(key)
+        if higher_is_better is None or not old:
+            continue
+        change = (value - old) / old
+        if abs(change) > COMPARE_TOLERANCE:
+            better = change > 0 if higher_is_better else change < 0
+            lines.append(f"{'improved' if better else 'REGRESSED'} {name}: {old} -> {value} ({change:+.0%})")
+    return lines
+
+
+def workload_drift(current: dict, baseline: dict) -> list[str]:
+    """Lines describing differences in what was measured (corpus size, result selectivity, ...)."""
+    return [
+        f"{name}: {old} -> {value}"
+        for name, key, old, value in _pairs(current, baseline)
+        if key in WORKLOAD_KEYS and value != old
+    ]
+
+
+def main(argv: Optional[list[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Index and query benchmarks on a synthetic AP-style corpus.")
+    parser.add_argument("--docs", type=int, default=10_000, help="number of generated documents")
+    parser.add_argument("--vocabulary", type=int, default=50_000, help="number of distinct terms")
+    parser.add_argument("--zipf", type=float, default=1.0, help="Zipf exponent of the term distribution")
+    parser.add_argument("--doc-length", type=int, default=250, help="mean document length in tokens")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--queries", type=int, default=300, help="queries per workload")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="processes of the parallel build")
+    parser.add_argument("--strategy", default="auto", choices=sorted(BooleanRetrieval.STRATEGIES))
+    parser.add_argument("--data-dir", help="keep the corpus here (generated if the directory is empty)")
+    parser.add_argument("--output", default="benchmark_results.json", help="JSON results file")
+    parser.add_argument("--compare", help="earlier JSON results file to compare against")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+
+    results = run(
+        args.docs, args.vocabulary, args.zipf, args.doc_length, args.seed,
+        args.queries, args.workers, args.strategy, args.data_dir
+    )
+    with open(args.output, "w", encoding="utf-8") as out_f:
+        json.dump(results, out_f, indent=2)
+    print(f"Benchmark results written to {args.output}")
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as in_f:
+            baseline = json.load(in_f)
+        if baseline.get("config") != results["config"]:
+            print("Warning: the runs used different configurations")
+        drift = workload_drift(results, baseline)
+        if drift:
+            print("Warning: the workload differs, metrics may not be comparable")
+            for line in drift:
+                print(f"  {line}")
+        for line in compare(results, baseline) or ["No changes above tolerance"]:
+            print(line)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,185 +1,943 @@
-from invertedIndex import InvertedIndex
-
-
-class BooleanRetrieval:
-    """
-    Boolean retrieval model supporting AND, OR, and AND-NOT operations
-    Complexity: O(N+M)
-    """
-    def __init__(self):
-        self.operators = {"AND", "OR", "NOT"}  # Allowed Boolean operators
-
-    def retrieve(
-        self,
-        inverted_index: dict[str, list[int]],
-        doc_map: dict[int, str],
-        query_file_path: str = "BooleanQueries.txt",
-        output_file_path: str = "Part_2.txt"
-        ) -> None:
-        """Evaluate Boolean RPN queries and write matching document IDs to file."""
-        # Open file (Part_2) for writing
-        with open(output_file_path, "w", encoding="utf-8") as out_f:
-
-            # Open queries file
-            with open(query_file_path, "r", encoding="utf-8") as in_f:
-                # Break into lines
-                lines = [line.strip() for line in in_f]
-
-            # Iterate each line
-            for line in lines:
-                # Skip empty lines
-                if not line:
-                    continue
-
-                print(f"Processing retrieval for query: {line}")
-
-                tokens = line.split()  # Tokenize the current query
-
-                # Retrieve the final result list
-                final_internal_ids = self._execute_query_retrieval(tokens, inverted_index)
-
-                # Convert internal_ids into original_ids
-                original_ids = [doc_map[internal_id] for internal_id in final_internal_ids]
-
-                # Write a line in the open file (a single query)
-                output_line = " ".join(original_ids)
-                out_f.write(output_line + "\n")
-            
-            print(f"Boolean retrieval results written to {output_file_path}")
-
-    def _execute_query_retrieval(
-            self,
-            tokens: list[str],
-            inverted_index: dict[str, list[int]]
-            ) -> list[int]:
-        """Retrieve relevant docs list for the quesry."""
-        stack = []
-
-        # Iterate each token in the query
-        for token in tokens:
-            # if token is a term, assuming there are no terms that are the same as operators
-            if token not in self.operators:
-                # get the posting list of the relevant term and append it to the stack
-                postings_ids = inverted_index.get(token, [])
-                stack.append(postings_ids)
-
-            # if token is an operator
-            else:
-                # Retrieve the posting lists in reverse order
-                r2 = stack.pop()  # Right operand
-                r1 = stack.pop()  # Left Operand
-
-                result = []
-                # Apply the required operator logic
-                if token == "AND":
-                    result = self.__intersect(r1, r2)
-                elif token == "OR":
-                    result = self.__union(r1, r2)
-                # r1 AND NOT r2
-                elif token == "NOT":
-                    result = self.__difference(r1, r2)
-
-                # Push the result list into the stack
-                stack.append(result)
-
-        return stack.pop()
-
-    # AND
-    @staticmethod
-    def __intersect(l1_ids: list[int], l2_ids: list[int]) -> list[int]:
-        """Return intersection (AND) of two sorted posting lists."""
-        intersection = []
-        i = j = 0
-
-        while i < len(l1_ids) and j < len(l2_ids):
-            if l1_ids[i] == l2_ids[j]:
-                intersection.append(l1_ids[i])
-                i += 1
-                j += 1
-
-            elif l1_ids[i] < l2_ids[j]:
-                i += 1
-
-            else:
-                j += 1
-
-        return intersection
-
-    # OR
-    @staticmethod
-    def __union(l1_ids: list[int], l2_ids: list[int]) -> list[int]:
-        """Return union (OR) of two sorted posting lists."""
-        union_result = []
-        i = j = 0
-
-        while i < len(l1_ids) and j < len(l2_ids):
-
-            if l1_ids[i] <= l2_ids[j]:
-                union_result.append(l1_ids[i])
-                i += 1
-                j += 1
-
-            elif l1_ids[i] < l2_ids[j]:
-                union_result.append(l1_ids[i])
-                i += 1
-
-            else:
-                union_result.append(l2_ids[j])
-                j += 1
-
-        # Append remaining elements
-        while i < len(l1_ids):
-            union_result.append(l1_ids[i])
-            i += 1
-
-        while j < len(l2_ids):
-            union_result.append(l2_ids[j])
-            j += 1
-
-        return union_result
-
-    # AND NOT
-    @staticmethod
-    def __difference(l1_ids: list[int], l2_ids: list[int]) -> list[int]:
-        """Return difference (r1 AND NOT r2) between two sorted posting lists."""
-        difference_result = []
-        i = j = 0
-
-        while i < len(l1_ids) and j < len(l2_ids):
-            if l1_ids[i] == l2_ids[j]:
-                i += 1
-                j += 1
-
-            elif l1_ids[i] < l2_ids[j]:
-                difference_result.append(l1_ids[i])
-                i += 1
-
-            else:
-                j += 1
-
-        # Append remaining elements in l1
-        while i < len(l1_ids):
-            difference_result.append(l1_ids[i])
-            i += 1
-
-        return difference_result
-    
-
-if __name__ == "__main__":
-    # Build inverted index
-    index = InvertedIndex()
-    index.build_index()
-
-    # Retrieve data structures
-    revert_index = index.get_index()
-    doc_mapper = index.get_doc_id_map()
-
-    # Print first 10 terms for inspection
-    first_keys = list(revert_index.keys())[:10]
-    for key in first_keys:
-        values = revert_index[key]
-        print(key, values[:10])
-
-    # Boolean retrieval
-    bool_retrieval = BooleanRetrieval()
-    bool_retrieval.retrieve(revert_index, doc_mapper)
+import heapq
+import logging
+import math
+import os
+import time
+from bisect import bisect_left
+from collections import Counter
+from collections.abc import Mapping
+from functools import reduce
+from itertools import islice
+from typing import Callable, Iterable, Iterator, Optional, Sequence
+
+from instrumentation import QueryProfiler, Sink
+from invertedIndex import InvertedIndex
+from numpyBackend import NumpyBackend, numpy_available
+from postingsList import BitmapPostings, PositionsList, PostingsList
+from queryPlanner import And, Near, Node, Not, Or, Phrase, QueryPlanner, Term, to_rpn
+from resultCache import ResultCache
+from resultWriter import ResultWriter, read_queries
+from termDictionary import TermDictionary
+from textAnalyzer import Analyzer
+
+logger = logging.getLogger(__name__)
+
+
+class BooleanRetrieval:
+    """
+    Boolean retrieval model supporting AND, OR, and AND-NOT operations,
+    plus PHRASE and NEAR/k over a positional index
+    Complexity: O(N+M) merge, O(M log(N/M)) galloping for AND / AND-NOT with skewed list lengths
+    """
+    # "auto" gallops when the probed list is at least GALLOP_RATIO times longer than the other
+    STRATEGIES = {"auto", "merge", "gallop"}
+    GALLOP_RATIO = 16
+    # "numpy" evaluates on decoded numpy.int32 arrays, "auto" picks it when NumPy is installed
+    BACKENDS = {"auto", "python", "numpy"}
+
+    def __init__(
+        self,
+        strategy: str = "auto",
+        optimize: bool = True,
+        cache: Optional[ResultCache] = None,
+        backend: str = "python",
+        analyzer: Optional[Analyzer] = None,
+        sink: Optional[Sink] = None,
+        lazy: bool = False,
+        kgrams: bool = False,
+        term_dictionary: Optional[Callable[[bool], TermDictionary]] = None
+        ):
+        if strategy not in self.STRATEGIES:
+            raise ValueError(f"Unknown strategy {strategy!r}, expected one of {sorted(self.STRATEGIES)}.")
+        if backend not in self.BACKENDS:
+            raise ValueError(f"Unknown backend {backend!r}, expected one of {sorted(self.BACKENDS)}.")
+        # Without NumPy every backend falls back to pure Python
+        self.backend = "numpy" if backend != "python" and numpy_available() else "python"
+        self._numpy = NumpyBackend() if self.backend == "numpy" else None
+        self.strategy = strategy  # AND / AND-NOT algorithm: "auto", "merge" or "gallop"
+        self.optimize = optimize  # reorder / rewrite queries with the cost-based planner
+        self.operators = {"AND", "OR", "NOT"}  # Allowed Boolean operators
+        self.planner = QueryPlanner()
+        # Query operands go through the analyzer the index was built with (InvertedIndex.get_analyzer())
+        self.analyzer = analyzer
+        # Results of queries and sub-queries across calls, keyed by plan node
+        # (optimized plans are canonical: flattened, operands in a fixed order)
+        self.cache = cache
+        # Opt-in per-query profiles (term sizes, node / operation timings) passed to sink(record)
+        self.profiler = QueryProfiler(sink) if sink is not None else None
+        # retrieve streams each query through lazy merge iterators (iter_query) instead of materializing it
+        self.lazy = lazy
+        # Wildcard operands (comput*, *ing) expand through the sorted term dictionary of the queried index
+        # (InvertedIndex.get_term_dictionary, asked on each expansion so it follows index updates, with a
+        # k-gram index for infix / suffix patterns if kgrams); without one they are plain terms
+        self.kgrams = kgrams
+        self.term_dictionary = term_dictionary
+
+    def retrieve(
+        self,
+        inverted_index: dict[str, PostingsList],
+        doc_map: Optional[Mapping[int, str]],
+        query_file_path: str = "BooleanQueries.txt",
+        output_file_path: str = "Part_2.txt",
+        positional_index: Optional[dict[str, PositionsList]] = None,
+        limit: Optional[int] = None,
+        output_format: str = "text",
+        progress: Optional[Sink] = None
+        ) -> None:
+        """Evaluate Boolean RPN queries and write matching document IDs to file (at most limit per query).
+
+        output_format "text" writes a line of DOCNOs per query, "varint" the internal IDs in the compact
+        binary form of resultWriter (doc_map may then be None); progress gets throttled progress records.
+        """
+        with ResultWriter(output_file_path, doc_map, output_format, progress) as writer:
+            # Queries are read one line at a time
+            for line in read_queries(query_file_path):
+                if self.lazy:
+                    # Doc IDs are produced while the result is written, nothing is held in full
+                    final_internal_ids = self.iter_query(line, inverted_index, positional_index, limit)
+                else:
+                    # Retrieve the final result list
+                    tokens = line.split()  # Tokenize the current query
+                    final_internal_ids = self._execute_query_retrieval(tokens, inverted_index, positional_index)[:limit]
+                writer.write(final_internal_ids)
+
+        logger.info("Boolean retrieval results written to %s", output_file_path)
+
+    def retrieve_batch(
+        self,
+        queries: list[str],
+        inverted_index: dict[str, PostingsList],
+        positional_index: Optional[dict[str, PositionsList]] = None
+        ) -> list[list[int]]:
+        """Evaluate many RPN queries, computing sub-expressions shared between them only once.
+
+        Returns the internal doc IDs of each query, in query order. The queries run one after another:
+        evaluation is pure Python and holds the GIL, so a thread pool gave no speedup, and process workers
+        would not share the sub-expression results (QueryServer with index_path evaluates on processes).
+        """
+        self.__check_source(inverted_index)
+        plans = [self._plan(query.split(), inverted_index) for query in queries]
+
+        # Only sub-expressions that occur more than once in the batch are worth keeping
+        counts: Counter = Counter()
+        for plan in plans:
+            if plan is not None:
+                self.__count_subexpressions(plan, counts)
+        # {shared_node: result (None until evaluated), ...}
+        memo = {node: None for node, count in counts.items() if count > 1}
+
+        def run(query: str, plan: Optional[Node]) -> list[int]:
+            if self.profiler is not None:
+                self.profiler.start(query)
+            # No plan: every operand was dropped by the analyzer
+            result = self.__to_list(self._evaluate(plan, inverted_index, positional_index, memo)) if plan is not None else []
+            if self.profiler is not None:
+                self.profiler.finish(len(result))
+            return result
+
+        return [run(query, plan) for query, plan in zip(queries, plans)]
+
+    def _plan(self, tokens: list[str], inverted_index: dict[str, PostingsList]) -> Optional[Node]:
+        """Parse the RPN query into an expression tree and reorder it by document frequency."""
+        plan = self.planner.parse(
+            tokens,
+            self.analyzer.analyze_term if self.analyzer is not None else None,
+            self.__expand if self.term_dictionary is not None else None
+        )
+        if plan is not None and self.optimize:
+            plan = self.planner.optimize(plan, lambda term: len(inverted_index.get(term, ())))
+        return plan
+
+    def __expand(self, pattern: str) -> list[str]:
+        """Index terms matching a wildcard pattern."""
+        return self.term_dictionary(self.kgrams).match(self.analyzer.analyze_pattern(pattern) if self.analyzer is not None else pattern)
+
+    @classmethod
+    def __count_subexpressions(cls, node: Node, counts: Counter) -> None:
+        """Count every operator node, and every AND / OR operand prefix evaluated on the way to it."""
+        if isinstance(node, Term):
+            return
+        counts[node] += 1
+
+        if isinstance(node, (And, Or)):
+            for i in range(2, len(node.operands)):
+                counts[type(node)(node.operands[:i])] += 1
+            children = node.operands
+        elif isinstance(node, Not):
+            children = (node.include, node.exclude)
+        else:
+            children = (node.left, node.right)
+
+        for child in children:
+            cls.__count_subexpressions(child, counts)
+
+    def _execute_query_retrieval(
+            self,
+            tokens: list[str],
+            inverted_index: dict[str, PostingsList],
+            positional_index: Optional[dict[str, PositionsList]] = None
+            ) -> list[int]:
+        """Retrieve relevant docs list for the query."""
+        if self.profiler is not None:
+            self.profiler.start(" ".join(tokens))
+        self.__check_source(inverted_index)
+        plan = self._plan(tokens, inverted_index)
+
+        # No plan: every operand was dropped by the analyzer
+        # (a single-term query evaluates to a compressed posting list)
+        result = self.__to_list(self._evaluate(plan, inverted_index, positional_index)) if plan is not None else []
+        if self.profiler is not None:
+            self.profiler.finish(len(result))
+        return result
+
+    def iter_query(
+            self,
+            query: str,
+            inverted_index: dict[str, PostingsList],
+            positional_index: Optional[dict[str, PositionsList]] = None,
+            limit: Optional[int] = None
+            ) -> Iterator[int]:
+        """Lazily evaluate an RPN query, yielding the matching internal doc IDs in ascending order.
+
+        Operators are merge / probe generators composed into a pipeline, so no intermediate result
+        is materialized and evaluation stops as soon as the caller does (or after limit doc IDs).
+        The query is parsed right away (malformed queries raise here), evaluated on iteration.
+        """
+        self.__check_source(inverted_index)
+        plan = self._plan(query.split(), inverted_index)
+        # No plan: every operand was dropped by the analyzer
+        if plan is None or limit == 0:
+            return iter(())
+        return self.__stream(query, plan, inverted_index, positional_index, limit)
+
+    def __stream(
+            self,
+            query: str,
+            plan: Node,
+            inverted_index: dict[str, PostingsList],
+            positional_index: Optional[dict[str, PositionsList]],
+            limit: Optional[int]
+            ) -> Iterator[int]:
+        # Profiles are per thread: one profiled lazy query at a time per thread
+        if self.profiler is not None:
+            self.profiler.start(" ".join(query.split()))
+        count = 0
+        try:
+            for doc_id in islice(self._iterate(plan, inverted_index, positional_index), limit):
+                count += 1
+                yield doc_id
+        finally:
+            # Also when the caller stops early (result_size is then what was consumed)
+            if self.profiler is not None:
+                self.profiler.finish(count)
+
+    def _iterate(
+            self,
+            node: Node,
+            inverted_index: dict[str, PostingsList],
+            positional_index: Optional[dict[str, PositionsList]] = None
+            ) -> Iterator[int]:
+        """Compose the lazy iterator of an expression tree (cached results are reused, new ones not stored).
+
+        Always runs on the pure Python postings: vectorized operations need whole arrays.
+        """
+        if isinstance(node, Term):
+            postings = inverted_index.get(node.term, ())
+            if self.profiler is not None:
+                self.profiler.term(node.term, len(postings))
+            return iter(postings)
+
+        cached = self.cache.get(node) if self.cache is not None else None
+        if cached is not None:
+            return map(int, cached) if self._numpy is not None else iter(cached)
+
+        if isinstance(node, (Phrase, Near)):
+            if not positional_index:
+                raise ValueError("PHRASE / NEAR queries need a positional index (InvertedIndex(positional=True)).")
+            return (doc_id for doc_id, _ in self._evaluate_positions(node, inverted_index, positional_index))
+
+        doc_frequency = lambda term: len(inverted_index.get(term, ()))
+        if isinstance(node, Not):
+            include = self._iterate(node.include, inverted_index, positional_index)
+            return self.__iter_combine(
+                "NOT", include, self.planner.estimate(node.include, doc_frequency),
+                node.exclude, inverted_index, positional_index
+            )
+
+        operator = "AND" if isinstance(node, And) else "OR"
+        if operator == "OR" and len(node.operands) > 2:
+            return self.__iter_union_many([
+                self._iterate(operand, inverted_index, positional_index) for operand in node.operands
+            ])
+        if operator == "AND" and len(node.operands) > 2:
+            return self.__iter_intersect_many(node.operands, doc_frequency, inverted_index, positional_index)
+        result = self._iterate(node.operands[0], inverted_index, positional_index)
+        # Upper bound on the doc IDs flowing out of the AND prefix (operands are sorted smallest first)
+        estimate = self.planner.estimate(node.operands[0], doc_frequency)
+        for operand in node.operands[1:]:
+            result = self.__iter_combine(operator, result, estimate, operand, inverted_index, positional_index)
+        return result
+
+    def __iter_combine(
+            self,
+            operator: str,
+            doc_ids: Iterator[int],
+            estimate: int,
+            operand: Node,
+            inverted_index: dict[str, PostingsList],
+            positional_index: Optional[dict[str, PositionsList]]
+            ) -> Iterator[int]:
+        """Lazy doc_ids AND / OR / NOT operand; AND and NOT probe a term's list directly when it pays off."""
+        if operator != "OR" and isinstance(operand, Term):
+            postings = inverted_index.get(operand.term, ())
+            # Bitmaps answer membership in O(1), long compressed lists are skipped through
+            if isinstance(postings, BitmapPostings) or self.__use_gallop(estimate, len(postings)):
+                if self.profiler is not None:
+                    self.profiler.term(operand.term, len(postings))
+                return self.__iter_probe(doc_ids, postings, present=operator == "AND")
+
+        operand_ids = self._iterate(operand, inverted_index, positional_index)
+        if operator == "AND":
+            return self.__iter_intersect(doc_ids, operand_ids)
+        if operator == "OR":
+            return self.__iter_union(doc_ids, operand_ids)
+        return self.__iter_difference(doc_ids, operand_ids)
+
+    def __iter_intersect_many(
+            self,
+            operands: tuple[Node, ...],
+            doc_frequency: Callable[[str], int],
+            inverted_index: dict[str, PostingsList],
+            positional_index: Optional[dict[str, PositionsList]]
+            ) -> Iterator[int]:
+        """Lazy AND of many operands in one pass instead of a chain of nested generators.
+
+        The term bitmaps are ANDed word by word up front; the smallest other operand drives, and each of
+        its doc IDs probes that bitmap, then seeks into long term lists over their skip pointers and steps
+        the other operands forward to it.
+        """
+        bitmap_terms = [
+            operand for operand in operands
+            if isinstance(operand, Term) and isinstance(inverted_index.get(operand.term), BitmapPostings)
+        ]
+        others = [operand for operand in operands if operand not in bitmap_terms]
+        bitmap = None
+        if bitmap_terms:
+            bitmaps = [inverted_index[operand.term] for operand in bitmap_terms]
+            if self.profiler is not None:
+                for operand, postings in zip(bitmap_terms, bitmaps):
+                    self.profiler.term(operand.term, len(postings))
+            bitmap = reduce(BitmapPostings.intersection, bitmaps)
+        if not others:
+            return iter(bitmap)
+
+        # Operands are sorted smallest (estimate) first
+        doc_ids = self._iterate(others[0], inverted_index, positional_index)
+        estimate = self.planner.estimate(others[0], doc_frequency)
+        seekers: list[Callable[[int], Optional[int]]] = []
+        for operand in others[1:]:
+            if isinstance(operand, Term):
+                postings = inverted_index.get(operand.term, ())
+                if self.__use_gallop(estimate, len(postings)):
+                    if self.profiler is not None:
+                        self.profiler.term(operand.term, len(postings))
+                    seekers.append(self.__seeker(postings))
+                    continue
+            seekers.append(self.__stepper(self._iterate(operand, inverted_index, positional_index)))
+        return self.__iter_leapfrog(doc_ids, bitmap, seekers)
+
+    def __check_source(self, inverted_index: dict[str, PostingsList]) -> None:
+        """Let the cache / decoded arrays notice a reloaded or updated index."""
+        if self.cache is not None:
+            self.cache.check_source(inverted_index)
+        if self._numpy is not None:
+            self._numpy.check_source(inverted_index)
+
+    def __to_list(self, result: Sequence[int]) -> list[int]:
+        if self._numpy is not None:
+            return self._numpy.to_list(result)
+        return list(result)
+
+    def _evaluate(
+            self,
+            node: Node,
+            inverted_index: dict[str, PostingsList],
+            positional_index: Optional[dict[str, PositionsList]] = None,
+            memo: Optional[dict[Node, Optional[Sequence[int]]]] = None
+            ) -> Sequence[int]:
+        """Evaluate an expression tree bottom-up, operands left to right.
+
+        memo holds results of shared sub-expressions: nodes present as keys are stored once evaluated.
+        Operator results are also looked up in / stored to the result cache, if any.
+        """
+        if isinstance(node, Term):
+            # get the posting list of the relevant term
+            if self._numpy is not None:
+                postings = self._numpy.postings(node.term, inverted_index)
+            else:
+                postings = inverted_index.get(node.term, [])
+            if self.profiler is not None:
+                self.profiler.term(node.term, len(postings))
+            return postings
+
+        cached = memo.get(node) if memo is not None else None
+        if cached is None and self.cache is not None:
+            cached = self.cache.get(node)
+        if cached is not None:
+            if self.profiler is not None:
+                self.profiler.node(to_rpn(node), 0.0, len(cached), cached=True)
+            return cached
+
+        if self.profiler is None:
+            result = self.__evaluate_operator(node, inverted_index, positional_index, memo)
+        else:
+            start = time.perf_counter()
+            result = self.__evaluate_operator(node, inverted_index, positional_index, memo)
+            self.profiler.node(to_rpn(node), time.perf_counter() - start, len(result))
+
+        if memo is not None and node in memo:
+            memo[node] = result
+        if self.cache is not None:
+            self.cache.put(node, result)
+        return result
+
+    def __evaluate_operator(
+            self,
+            node: Node,
+            inverted_index: dict[str, PostingsList],
+            positional_index: Optional[dict[str, PositionsList]],
+            memo: Optional[dict[Node, Optional[Sequence[int]]]]
+            ) -> Sequence[int]:
+        if isinstance(node, (Phrase, Near)):
+            if not positional_index:
+                raise ValueError("PHRASE / NEAR queries need a positional index (InvertedIndex(positional=True)).")
+            return [doc_id for doc_id, _ in self._evaluate_positions(node, inverted_index, positional_index)]
+
+        if isinstance(node, Not):
+            include = self._evaluate(node.include, inverted_index, positional_index, memo)
+            if not len(include):
+                return []  # nothing to subtract from
+            return self.__combine("NOT", include, self._evaluate(node.exclude, inverted_index, positional_index, memo))
+
+        node_type = type(node)
+        operands = node.operands
+
+        # Start from the longest operand prefix shared with another query of the batch
+        # (evaluated once, as a node of its own, and kept in memo)
+        results = []
+        start = 0
+        if memo:
+            for i in range(len(operands) - 1, 1, -1):
+                prefix = node_type(operands[:i])
+                if prefix in memo:
+                    results.append(self._evaluate(prefix, inverted_index, positional_index, memo))
+                    start = i
+                    break
+
+        if node_type is Or:
+            results.extend(self._evaluate(operand, inverted_index, positional_index, memo) for operand in operands[start:])
+            if len(results) == 2:
+                return self.__combine("OR", results[0], results[1])
+            # One pass over all operands instead of a pairwise chain that copies the growing result each time
+            return self.__union_many(results)
+
+        # AND stays a chain, smallest operand first: the running result only shrinks, so the later
+        # operands are galloped into / probed, and an empty result skips evaluating the rest
+        result = results[0] if results else self._evaluate(operands[0], inverted_index, positional_index, memo)
+        for operand in operands[max(start, 1):]:
+            if not len(result):
+                return []
+            result = self.__combine("AND", result, self._evaluate(operand, inverted_index, positional_index, memo))
+        return result
+
+    def _evaluate_positions(
+            self,
+            node: Node,
+            inverted_index: dict[str, PostingsList],
+            positional_index: dict[str, PositionsList]
+            ) -> Iterator[tuple[int, list[int]]]:
+        """Evaluate a positional sub-tree into (doc_id, matched positions) pairs in doc ID order."""
+        if isinstance(node, Term):
+            postings = inverted_index.get(node.term)
+            if postings is None:
+                return iter(())
+            return zip(postings, positional_index[node.term])
+
+        return self.__positional_merge(
+            self._evaluate_positions(node.left, inverted_index, positional_index),
+            self._evaluate_positions(node.right, inverted_index, positional_index),
+            node.distance if isinstance(node, Near) else None
+        )
+
+    @classmethod
+    def __positional_merge(
+            cls,
+            left: Iterator[tuple[int, list[int]]],
+            right: Iterator[tuple[int, list[int]]],
+            distance: Optional[int]
+            ) -> Iterator[tuple[int, list[int]]]:
+        """Intersect two positional lists, keeping right positions adjacent to (PHRASE) or within distance of (NEAR) left."""
+        left_entry, right_entry = next(left, None), next(right, None)
+
+        while left_entry is not None and right_entry is not None:
+            if left_entry[0] == right_entry[0]:
+                if distance is None:
+                    matched = cls.__adjacent_positions(left_entry[1], right_entry[1])
+                else:
+                    matched = cls.__near_positions(left_entry[1], right_entry[1], distance)
+                if matched:
+                    yield left_entry[0], matched
+                left_entry, right_entry = next(left, None), next(right, None)
+
+            elif left_entry[0] < right_entry[0]:
+                left_entry = next(left, None)
+
+            else:
+                right_entry = next(right, None)
+
+    @staticmethod
+    def __adjacent_positions(left_positions: list[int], right_positions: list[int]) -> list[int]:
+        """Right positions p where p - 1 is a left position (linear merge)."""
+        matched = []
+        i = 0
+        for position in right_positions:
+            while i < len(left_positions) and left_positions[i] < position - 1:
+                i += 1
+            if i < len(left_positions) and left_positions[i] == position - 1:
+                matched.append(position)
+        return matched
+
+    @staticmethod
+    def __near_positions(left_positions: list[int], right_positions: list[int], distance: int) -> list[int]:
+        """Right positions with a left position at most distance away (linear merge)."""
+        matched = []
+        i = 0
+        for position in right_positions:
+            while i < len(left_positions) and left_positions[i] < position - distance:
+                i += 1
+            if i < len(left_positions) and left_positions[i] <= position + distance:
+                matched.append(position)
+        return matched
+
+    def __combine(self, operator: str, r1: Sequence[int], r2: Sequence[int]) -> Sequence[int]:
+        """r1 AND / OR / NOT r2, recorded by the profiler if enabled."""
+        function = self.__and if operator == "AND" else self.__or if operator == "OR" else self.__and_not
+        if self.profiler is None:
+            return function(r1, r2)
+
+        algorithm, comparisons = self.__operation_cost(operator, r1, r2)
+        start = time.perf_counter()
+        result = function(r1, r2)
+        self.profiler.operation(
+            operator, algorithm, (len(r1), len(r2)), comparisons, len(result), time.perf_counter() - start
+        )
+        return result
+
+    def __union_many(self, results: list[Sequence[int]]) -> Sequence[int]:
+        """OR of many lists at once: word-level OR of the bitmaps, the other doc IDs gathered and sorted once.
+
+        Replaces k - 1 pairwise merges, each copying the growing result (a set + one sort runs at C speed,
+        well ahead of a heap k-way merge in Python; the lazy path merges through a heap as it must stream).
+        """
+        start = time.perf_counter() if self.profiler is not None else 0.0
+        bitmaps = [result for result in results if isinstance(result, BitmapPostings)]
+        lists = [result for result in results if not isinstance(result, BitmapPostings)]
+        n_ids = sum(len(result) for result in lists)
+
+        if self._numpy is not None:
+            algorithm, comparisons = "numpy-merge", sum(len(result) for result in results)
+            union = self._numpy.union_many(results)
+        else:
+            doc_ids = set().union(*lists)
+            if bitmaps:
+                # One bit per doc ID of the lists, bitmaps one word per 64 doc IDs
+                algorithm = "bitmap-set"
+                comparisons = n_ids + sum(bitmap.nbytes // 8 + 1 for bitmap in bitmaps)
+                union = reduce(BitmapPostings.union, bitmaps)
+                if doc_ids:
+                    union = union.with_ids(doc_ids)
+            else:
+                algorithm, comparisons = "set-sort", n_ids + len(doc_ids) * max(1, math.ceil(math.log2(len(doc_ids) + 1)))
+                union = sorted(doc_ids)
+
+        if self.profiler is not None:
+            self.profiler.operation(
+                "OR", algorithm, [len(result) for result in results], comparisons, len(union),
+                time.perf_counter() - start
+            )
+        return union
+
+    def __operation_cost(self, operator: str, r1: Sequence[int], r2: Sequence[int]) -> tuple[str, int]:
+        """(algorithm, elements compared) of a pairwise operation - mirrors the dispatch of __and / __or / __and_not.
+
+        Merges compare up to both lengths, galloping ~log2(gap) per probe, bitmaps one machine word per 64 doc IDs.
+        """
+        len1, len2 = len(r1), len(r2)
+        if isinstance(r1, BitmapPostings) and isinstance(r2, BitmapPostings):
+            return "bitmap", max(r1.nbytes, r2.nbytes) // 8 + 1
+
+        if operator == "OR":
+            if self._numpy is None and isinstance(r1, BitmapPostings):
+                return "bitmap-set", len2
+            if self._numpy is None and isinstance(r2, BitmapPostings):
+                return "bitmap-set", len1
+            return ("numpy-" if self._numpy is not None else "") + "merge", len1 + len2
+
+        # AND probes the shorter list into the longer one, AND-NOT r1 into r2
+        probes, probed = (min(len1, len2), max(len1, len2)) if operator == "AND" else (len1, len2)
+        if self._numpy is None and (isinstance(r1, BitmapPostings) or isinstance(r2, BitmapPostings)):
+            sparse = len1 if isinstance(r2, BitmapPostings) else len2
+            return "bitmap-probe", sparse
+        if self.__use_gallop(probes, probed):
+            prefix = "numpy-search" if self._numpy is not None else "gallop"
+            return prefix, probes * (1 + math.ceil(math.log2(probed / max(probes, 1) + 1)))
+        return ("numpy-" if self._numpy is not None else "") + "merge", len1 + len2
+
+    def __and(self, r1: Sequence[int], r2: Sequence[int]) -> Sequence[int]:
+        """r1 AND r2 - gallop the short list through the long one when lengths are skewed."""
+        # Dense terms are bitmaps: word-level AND, or probe the bitmap per doc ID of a sparse list
+        if isinstance(r1, BitmapPostings) and isinstance(r2, BitmapPostings):
+            return r1.intersection(r2)
+        if self._numpy is not None:
+            return self._numpy.intersect(r1, r2, self.__use_gallop(min(len(r1), len(r2)), max(len(r1), len(r2))))
+        if isinstance(r1, BitmapPostings):
+            return r1.select(r2)
+        if isinstance(r2, BitmapPostings):
+            return r2.select(r1)
+
+        short, long = (r1, r2) if len(r1) <= len(r2) else (r2, r1)
+        if self.__use_gallop(len(short), len(long)):
+            return self.__intersect_gallop(short, long)
+        return self.__intersect(r1, r2)
+
+    def __or(self, r1: Sequence[int], r2: Sequence[int]) -> Sequence[int]:
+        """r1 OR r2 - a bitmap operand keeps the result a bitmap."""
+        if isinstance(r1, BitmapPostings) and isinstance(r2, BitmapPostings):
+            return r1.union(r2)
+        if self._numpy is not None:
+            return self._numpy.union(r1, r2)
+        if isinstance(r1, BitmapPostings):
+            return r1.with_ids(r2)
+        if isinstance(r2, BitmapPostings):
+            return r2.with_ids(r1)
+        return self.__union(r1, r2)
+
+    def __and_not(self, r1: Sequence[int], r2: Sequence[int]) -> Sequence[int]:
+        """r1 AND NOT r2 - galloping only pays off when the subtracted list is the long one."""
+        if isinstance(r1, BitmapPostings) and isinstance(r2, BitmapPostings):
+            return r1.difference(r2)
+        if self._numpy is not None:
+            return self._numpy.difference(r1, r2, self.__use_gallop(len(r1), len(r2)))
+        if isinstance(r1, BitmapPostings):
+            return r1.without_ids(r2)
+        if isinstance(r2, BitmapPostings):
+            return r2.select(r1, present=False)
+
+        if self.__use_gallop(len(r1), len(r2)):
+            return self.__difference_gallop(r1, r2)
+        return self.__difference(r1, r2)
+
+    def __use_gallop(self, probes: int, probed_length: int) -> bool:
+        """Choose galloping over a linear merge for one AND / AND-NOT operation."""
+        if self.strategy == "auto":
+            return probed_length >= self.GALLOP_RATIO * probes
+        return self.strategy == "gallop"
+
+    @staticmethod
+    def __seeker(postings: Sequence[int]) -> Callable[[int], Optional[int]]:
+        """Return seek(target) -> first doc ID >= target, moving forward only."""
+        # Compressed lists jump over blocks with their skip pointers
+        if isinstance(postings, PostingsList):
+            return postings.cursor().advance
+
+        # Plain lists: exponential search from the last position, then bisect the bracket
+        lo = 0
+        n = len(postings)
+
+        def seek(target: int) -> Optional[int]:
+            nonlocal lo
+            step = 1
+            hi = lo
+            while hi < n and postings[hi] < target:
+                lo = hi + 1
+                hi += step
+                step *= 2
+            lo = bisect_left(postings, target, lo, min(hi, n))
+            return postings[lo] if lo < n else None
+
+        return seek
+
+    @staticmethod
+    def __stepper(doc_ids: Iterator[int]) -> Callable[[int], Optional[int]]:
+        """Return seek(target) -> first doc ID >= target of an iterator, stepping through it."""
+        current = next(doc_ids, None)
+
+        def seek(target: int) -> Optional[int]:
+            nonlocal current
+            while current is not None and current < target:
+                current = next(doc_ids, None)
+            return current
+
+        return seek
+
+    # AND
+    @staticmethod
+    def __intersect(l1_ids: Iterable[int], l2_ids: Iterable[int]) -> list[int]:
+        """Return intersection (AND) of two sorted posting lists."""
+        intersection = []
+        # Posting lists may be compressed, so walk them with decoding iterators
+        it1, it2 = iter(l1_ids), iter(l2_ids)
+        id1, id2 = next(it1, None), next(it2, None)
+
+        while id1 is not None and id2 is not None:
+            if id1 == id2:
+                intersection.append(id1)
+                id1 = next(it1, None)
+                id2 = next(it2, None)
+
+            elif id1 < id2:
+                id1 = next(it1, None)
+
+            else:
+                id2 = next(it2, None)
+
+        return intersection
+
+    # Lazy AND
+    @staticmethod
+    def __iter_intersect(it1: Iterator[int], it2: Iterator[int]) -> Iterator[int]:
+        """Yield the intersection (AND) of two sorted doc ID iterators."""
+        id1, id2 = next(it1, None), next(it2, None)
+
+        while id1 is not None and id2 is not None:
+            if id1 == id2:
+                yield id1
+                id1 = next(it1, None)
+                id2 = next(it2, None)
+
+            elif id1 < id2:
+                id1 = next(it1, None)
+
+            else:
+                id2 = next(it2, None)
+
+    # Lazy AND / AND NOT (probing)
+    @classmethod
+    def __iter_probe(cls, doc_ids: Iterator[int], postings: Sequence[int], present: bool) -> Iterator[int]:
+        """Yield the doc IDs found (present) / not found in postings, probing a bitmap or seeking a sorted list."""
+        if isinstance(postings, BitmapPostings):
+            for doc_id in doc_ids:
+                if (doc_id in postings) == present:
+                    yield doc_id
+            return
+
+        seek = cls.__seeker(postings)
+        for doc_id in doc_ids:
+            found = seek(doc_id)
+            if found is None:
+                # postings exhausted: nothing more matches, or everything left survives the NOT
+                if not present:
+                    yield doc_id
+                    yield from doc_ids
+                return
+            if (found == doc_id) == present:
+                yield doc_id
+
+    # AND (galloping)
+    @classmethod
+    def __intersect_gallop(cls, short_ids: Iterable[int], long_ids: Sequence[int]) -> list[int]:
+        """Return intersection (AND) by seeking each doc ID of the short list in the long list."""
+        intersection = []
+        seek = cls.__seeker(long_ids)
+
+        for doc_id in short_ids:
+            found = seek(doc_id)
+            if found is None:
+                break  # long list exhausted
+            if found == doc_id:
+                intersection.append(doc_id)
+
+        return intersection
+
+    # OR
+    @staticmethod
+    def __union(l1_ids: Iterable[int], l2_ids: Iterable[int]) -> list[int]:
+        """Return union (OR) of two sorted posting lists."""
+        union_result = []
+        it1, it2 = iter(l1_ids), iter(l2_ids)
+        id1, id2 = next(it1, None), next(it2, None)
+
+        while id1 is not None and id2 is not None:
+
+            if id1 == id2:
+                union_result.append(id1)
+                id1 = next(it1, None)
+                id2 = next(it2, None)
+
+            elif id1 < id2:
+                union_result.append(id1)
+                id1 = next(it1, None)
+
+            else:
+                union_result.append(id2)
+                id2 = next(it2, None)
+
+        # Append remaining elements
+        if id1 is not None:
+            union_result.append(id1)
+            union_result.extend(it1)
+
+        if id2 is not None:
+            union_result.append(id2)
+            union_result.extend(it2)
+
+        return union_result
+
+    # Lazy OR
+    @staticmethod
+    def __iter_union(it1: Iterator[int], it2: Iterator[int]) -> Iterator[int]:
+        """Yield the union (OR) of two sorted doc ID iterators."""
+        id1, id2 = next(it1, None), next(it2, None)
+
+        while id1 is not None and id2 is not None:
+            if id1 == id2:
+                yield id1
+                id1 = next(it1, None)
+                id2 = next(it2, None)
+
+            elif id1 < id2:
+                yield id1
+                id1 = next(it1, None)
+
+            else:
+                yield id2
+                id2 = next(it2, None)
+
+        # Remaining elements
+        if id1 is not None:
+            yield id1
+            yield from it1
+
+        if id2 is not None:
+            yield id2
+            yield from it2
+
+    # Lazy k-way AND
+    @staticmethod
+    def __iter_leapfrog(
+            doc_ids: Iterator[int],
+            bitmap: Optional[BitmapPostings],
+            seekers: list[Callable[[int], Optional[int]]]
+            ) -> Iterator[int]:
+        """Yield the doc IDs in the bitmap (if any) and found by every seeker."""
+        for doc_id in doc_ids:
+            if bitmap is not None and doc_id not in bitmap:
+                continue
+            for seek in seekers:
+                found = seek(doc_id)
+                if found is None:
+                    return  # an operand is exhausted
+                if found != doc_id:
+                    break
+            else:
+                yield doc_id
+
+    # Lazy k-way OR
+    @staticmethod
+    def __iter_union_many(iterators: list[Iterator[int]]) -> Iterator[int]:
+        """Yield the union (OR) of many sorted doc ID iterators, merged through a heap."""
+        last = None
+        for doc_id in heapq.merge(*iterators):
+            if doc_id != last:
+                yield doc_id
+                last = doc_id
+
+    # Lazy AND NOT
+    @staticmethod
+    def __iter_difference(it1: Iterator[int], it2: Iterator[int]) -> Iterator[int]:
+        """Yield the difference (r1 AND NOT r2) of two sorted doc ID iterators."""
+        id1, id2 = next(it1, None), next(it2, None)
+
+        while id1 is not None and id2 is not None:
+            if id1 == id2:
+                id1 = next(it1, None)
+                id2 = next(it2, None)
+
+            elif id1 < id2:
+                yield id1
+                id1 = next(it1, None)
+
+            else:
+                id2 = next(it2, None)
+
+        # Remaining elements of r1
+        if id1 is not None:
+            yield id1
+            yield from it1
+
+    # AND NOT
+    @staticmethod
+    def __difference(l1_ids: Iterable[int], l2_ids: Iterable[int]) -> list[int]:
+        """Return difference (r1 AND NOT r2) between two sorted posting lists."""
+        difference_result = []
+        it1, it2 = iter(l1_ids), iter(l2_ids)
+        id1, id2 = next(it1, None), next(it2, None)
+
+        while id1 is not None and id2 is not None:
+            if id1 == id2:
+                id1 = next(it1, None)
+                id2 = next(it2, None)
+
+            elif id1 < id2:
+                difference_result.append(id1)
+                id1 = next(it1, None)
+
+            else:
+                id2 = next(it2, None)
+
+        # Append remaining elements in l1
+        if id1 is not None:
+            difference_result.append(id1)
+            difference_result.extend(it1)
+
+        return difference_result
+
+    # AND NOT (galloping)
+    @classmethod
+    def __difference_gallop(cls, l1_ids: Iterable[int], l2_ids: Sequence[int]) -> list[int]:
+        """Return difference (r1 AND NOT r2) by seeking each doc ID of r1 in the long r2."""
+        difference_result = []
+        seek = cls.__seeker(l2_ids)
+
+        for doc_id in l1_ids:
+            if seek(doc_id) != doc_id:
+                difference_result.append(doc_id)
+
+        return difference_result
+    
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+
+    # Load a saved index, or build inverted index and save it for the next run
+    index_path = "index.bin"
+    if os.path.exists(index_path):
+        index = InvertedIndex.load(index_path)
+    else:
+        index = InvertedIndex()
+        index.build_index(workers=os.cpu_count())
+        index.save(index_path)
+
+    # Retrieve data structures
+    revert_index = index.get_index()
+    doc_mapper = index.get_doc_id_map()
+
+    # Print first 10 terms for inspection
+    first_keys = list(revert_index.keys())[:10]
+    for key in first_keys:
+        values = revert_index[key]
+        print(key, values.to_list()[:10])
+
+    # Boolean retrieval
+    bool_retrieval = BooleanRetrieval(analyzer=index.get_analyzer(), term_dictionary=index.get_term_dictionary)
+    bool_retrieval.retrieve(revert_index, doc_mapper, positional_index=index.get_positional_index())
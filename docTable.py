@@ -0,0 +1,127 @@
+from array import array
+from collections.abc import Mapping
+from typing import Iterable, Iterator, Optional, Sequence
+
+
+class DocTable(Mapping):
+    """
+    Internal ID (1..N) -> original doc ID (DOCNO) table
+    The DOCNOs are stored back to back in one UTF-8 buffer with an offsets array (DOCNO i spans
+    offsets[i - 1]:offsets[i]), the layout of the index file, so a loaded table reads them straight
+    from the memory-mapped file. The reverse (DOCNO -> internal ID) hash is built on first use.
+    Bulk lookups slice an ASCII blob decoded once (byte offsets are then character offsets), which
+    avoids a bytes object and a decode per DOCNO.
+    """
+    def __init__(self, doc_ids: Iterable[str] = ()):
+        # b'AP880212-0001AP880212-0002...' (bytearray, or a read-only view of a mapped file)
+        self._blob: bytearray | memoryview = bytearray()
+        # End offset of each DOCNO in the blob, after a leading 0 (array, or a mapped "Q" view)
+        self._offsets: array | memoryview = array("Q", [0])
+        # {original_doc_id: internal_doc_id, ...}, built on the first reverse lookup
+        self._reverse: Optional[dict[str, int]] = None
+        # Whether the blob is all ASCII (None: not checked yet) and its decoded copy for bulk lookups
+        self._ascii: Optional[bool] = True
+        self._text: str = ""
+        self.extend(doc_ids)
+
+    @classmethod
+    def from_buffer(cls, blob: memoryview, offsets: Sequence[int]) -> "DocTable":
+        """Table over an existing blob and its len(table) + 1 offsets (e.g. views of a mapped index file)."""
+        table = cls()
+        table._blob, table._offsets = blob, offsets
+        table._ascii = None
+        return table
+
+    def __ensure_mutable(self) -> None:
+        """A mapped table is read-only, copy it before adding documents."""
+        if not isinstance(self._blob, bytearray):
+            self._blob = bytearray(self._blob)
+            self._offsets = array("Q", self._offsets)
+
+    def append(self, doc_id: str) -> int:
+        """Add a DOCNO as the next internal ID and return that ID."""
+        self.__ensure_mutable()
+        if not doc_id.isascii():
+            self._ascii = False
+        # Blob first: a concurrent reader never sees an offset past the data
+        self._blob += doc_id.encode("utf-8")
+        self._offsets.append(len(self._blob))
+        internal_id = len(self._offsets) - 1
+        if self._reverse is not None:
+            self._reverse[doc_id] = internal_id
+        return internal_id
+
+    def extend(self, doc_ids: Iterable[str]) -> None:
+        """Add DOCNOs as the next internal IDs, in order."""
+        if isinstance(doc_ids, DocTable):
+            # Copy the other table's buffer and shift its offsets past this one's
+            self.__ensure_mutable()
+            first_id, base = len(self._offsets), len(self._blob)
+            if not doc_ids.__is_ascii():
+                self._ascii = False
+            self._blob += doc_ids._blob
+            self._offsets.extend(base + offset for offset in doc_ids._offsets[1:])
+            if self._reverse is not None:
+                self._reverse.update(zip(doc_ids.to_original(doc_ids), range(first_id, len(self._offsets))))
+            return
+        for doc_id in doc_ids:
+            self.append(doc_id)
+
+    def __getitem__(self, internal_id: int) -> str:
+        if not 1 <= internal_id < len(self._offsets):
+            raise KeyError(internal_id)
+        return str(self._blob[self._offsets[internal_id - 1]:self._offsets[internal_id]], "utf-8")
+
+    def __iter__(self) -> Iterator[int]:
+        return iter(range(1, len(self._offsets)))
+
+    def __len__(self) -> int:
+        return len(self._offsets) - 1
+
+    def to_original(self, internal_ids: Iterable[int]) -> list[str]:
+        """DOCNOs of internal IDs (each in 1..N), in order - the bulk form of table[internal_id]."""
+        offsets = self._offsets
+        if self.__is_ascii():
+            text = self._text
+            if len(text) != len(self._blob):  # DOCNOs appended since it was decoded
+                text = self._text = str(self._blob, "ascii")
+            return [text[offsets[internal_id - 1]:offsets[internal_id]] for internal_id in internal_ids]
+
+        blob = self._blob
+        return [str(blob[offsets[internal_id - 1]:offsets[internal_id]], "utf-8") for internal_id in internal_ids]
+
+    def __is_ascii(self) -> bool:
+        if self._ascii is None:
+            self._ascii = bytes(self._blob).isascii()
+        return self._ascii
+
+    def internal_id(self, doc_id: str) -> Optional[int]:
+        """Internal ID of a DOCNO, None if it isn't in the table."""
+        return self.__reverse().get(doc_id)
+
+    def to_internal(self, doc_ids: Iterable[str]) -> list[Optional[int]]:
+        """Internal IDs of DOCNOs (None for unknown ones), in order."""
+        reverse = self.__reverse()
+        return [reverse.get(doc_id) for doc_id in doc_ids]
+
+    def forget(self, internal_ids: Iterable[int]) -> None:
+        """Drop documents from the reverse lookup (e.g. purged by compaction - their IDs are never reused)."""
+        reverse = self.__reverse()
+        for internal_id in internal_ids:
+            reverse.pop(self[internal_id], None)
+
+    def __reverse(self) -> dict[str, int]:
+        reverse = self._reverse
+        if reverse is None:
+            reverse = self._reverse = dict(zip(self.to_original(self), self))
+        return reverse
+
+    def __getstate__(self) -> tuple[bytes, array, Optional[dict[str, int]]]:
+        # Mapped views can't be pickled
+        return bytes(self._blob), array("Q", self._offsets), self._reverse
+
+    def __setstate__(self, state: tuple[bytes, array, Optional[dict[str, int]]]) -> None:
+        blob, self._offsets, self._reverse = state
+        self._blob = bytearray(blob)
+        self._ascii = None
+        self._text = ""
@@ -0,0 +1,285 @@
+import heapq
+import threading
+from collections import Counter
+from itertools import combinations
+from typing import Iterable, Iterator, Mapping, Optional, Protocol, Sequence
+
+# MinHash signature length (one-permutation hashing: one hash per doc ID, spread over this many bins)
+SIGNATURE_SIZE = 32
+# Signature values per LSH band - two terms become near-duplicate candidates if any band is equal
+# (with 32 / 4 = 8 bands, pairs with Jaccard 0.8 are found with probability ~0.98)
+BAND_ROWS = 4
+_MASK64 = (1 << 64) - 1
+
+
+def _mix64(value: int) -> int:
+    """SplitMix64 finalizer: a well spread 64-bit hash of a doc ID (stable across runs)."""
+    value = (value + 0x9E3779B97F4A7C15) & _MASK64
+    value = ((value ^ (value >> 30)) * 0xBF58476D1CE4E5B9) & _MASK64
+    value = ((value ^ (value >> 27)) * 0x94D049BB133111EB) & _MASK64
+    return value ^ (value >> 31)
+
+
+def minhash_signature(doc_ids: Iterable[int], size: int = SIGNATURE_SIZE) -> tuple[int, ...]:
+    """One-permutation MinHash of a posting list: the minimum hash in each of size bins.
+
+    The fraction of equal entries of two signatures estimates the Jaccard similarity of the
+    lists. An empty bin (short lists) takes the value of the next non-empty bin tagged with the
+    distance, so it only matches a bin filled the same way (rotation densification).
+    """
+    bins: list[Optional[int]] = [None] * size
+    for doc_id in doc_ids:
+        value, bin_number = divmod(_mix64(doc_id), size)
+        current = bins[bin_number]
+        if current is None or value < current:
+            bins[bin_number] = value
+
+    if None in bins:
+        filled = [i for i, value in enumerate(bins) if value is not None]
+        if not filled:
+            return tuple(bins)
+        densified = []
+        for i, value in enumerate(bins):
+            if value is None:
+                # Next non-empty bin to the right (wrapping around)
+                source = next((j for j in filled if j > i), filled[0])
+                distance = (source - i) % size
+                value = bins[source] + (distance << 64)
+            densified.append(value)
+        bins = densified
+    return tuple(bins)
+
+
+def document_frequency(inverted_index: Mapping[str, Sequence[int]], term: str) -> int:
+    """Document frequency of a term in an index (0 if absent), without decoding postings where possible."""
+    if hasattr(inverted_index, "document_frequency"):
+        return inverted_index.document_frequency(term)  # memory-mapped index: read from the term entry
+    postings = inverted_index.get(term)
+    return 0 if postings is None else len(postings)
+
+
+def document_frequencies(inverted_index: Mapping[str, Sequence[int]]) -> Iterator[tuple[str, int]]:
+    """(term, document frequency) pairs of an index, without decoding postings where possible."""
+    if hasattr(inverted_index, "document_frequencies"):
+        return inverted_index.document_frequencies()  # memory-mapped index: read from the term entries
+    return ((term, len(postings)) for term, postings in inverted_index.items())
+
+
+class FrequencySource(Protocol):
+    """Where the statistics read document frequencies from (the posting lists of an InvertedIndex)."""
+    def document_frequency(self, term: str) -> int: ...
+
+    def document_frequencies(self) -> Iterable[tuple[str, int]]: ...
+
+
+class IndexStatistics:
+    """
+    Collection and term statistics, updated in batches as documents are indexed (no re-sorting of the vocabulary)
+    Terms are kept in buckets by document frequency, so top / bottom-k and the df histogram only
+    touch the distinct frequencies (a few thousand) instead of all terms. A term's document frequency
+    itself is read from its posting list in the source index, not stored again here.
+    Deleted documents are counted until compaction, when the statistics are rebuilt.
+    """
+    def __init__(self, source: FrequencySource):
+        self._source = source
+        # {document frequency: {'term': None, ...}, ...} - terms in the order they reached the frequency
+        self._buckets: dict[int, dict[str, None]] = {}
+        # {term length (characters): number of terms, ...}
+        self._term_lengths: Counter[int] = Counter()
+        self._n_terms: int = 0
+        self._n_docs: int = 0
+        self._n_tokens: int = 0
+        self._n_postings: int = 0
+        self._n_deleted: int = 0
+        # MinHash signatures computed so far - {'term': signature, ...}, dropped when the term's postings grow
+        self._signatures: dict[str, tuple[int, ...]] = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_index(cls, source: FrequencySource, doc_lengths: Iterable[int]) -> "IndexStatistics":
+        """Statistics of an existing index, given the lengths of its documents."""
+        statistics = cls(source)
+        with statistics._lock:
+            for term, frequency in source.document_frequencies():
+                statistics.__move(term, 0, frequency)
+        statistics.add_documents(doc_lengths)
+        return statistics
+
+    def add_terms(self, frequencies: Iterable[tuple[str, int]]) -> None:
+        """Count (term, documents added) pairs of a batch already in the source's posting lists."""
+        document_frequency = self._source.document_frequency
+        with self._lock:
+            for term, count in frequencies:
+                new = document_frequency(term)
+                self.__move(term, new - count, new)
+
+    def add_documents(self, lengths: Iterable[int]) -> None:
+        """Count a batch of documents by their numbers of tokens."""
+        with self._lock:
+            for length in lengths:
+                self._n_docs += 1
+                self._n_tokens += length
+
+    def mark_deleted(self, count: int) -> None:
+        """Record deletions pending compaction."""
+        with self._lock:
+            self._n_deleted += count
+
+    def __move(self, term: str, old: int, new: int) -> None:
+        """Move a term from the bucket of its old document frequency (0: a new term) to the new one."""
+        if old:
+            bucket = self._buckets[old]
+            del bucket[term]
+            if not bucket:
+                del self._buckets[old]
+            if self._signatures:
+                self._signatures.pop(term, None)
+        else:
+            self._n_terms += 1
+            self._term_lengths[len(term)] += 1
+
+        bucket = self._buckets.get(new)
+        if bucket is None:
+            self._buckets[new] = {term: None}
+        else:
+            bucket[term] = None
+        self._n_postings += new - old
+
+    def document_frequency(self, term: str) -> int:
+        return self._source.document_frequency(term)
+
+    def top_terms(self, k: int = 10) -> list[tuple[str, int]]:
+        """The k terms with the highest document frequency, highest first.
+
+        Ties come in the order the terms reached the frequency. O(D log k + k) for D distinct frequencies.
+        """
+        with self._lock:
+            result = []
+            for frequency in heapq.nlargest(k, self._buckets):
+                for term in self._buckets[frequency]:
+                    if len(result) == k:
+                        return result
+                    result.append((term, frequency))
+            return result
+
+    def bottom_terms(self, k: int = 10) -> list[tuple[str, int]]:
+        """The k terms with the lowest document frequency, lowest first (latest terms first on ties).
+
+        Reversed, this is the tail of the vocabulary stably sorted by decreasing frequency (the order
+        of get_lowest_10_terms): for df 1, the order the terms first appeared in.
+        """
+        with self._lock:
+            result = []
+            for frequency in heapq.nsmallest(k, self._buckets):
+                for term in reversed(self._buckets[frequency]):
+                    if len(result) == k:
+                        return result
+                    result.append((term, frequency))
+            return result
+
+    def df_histogram(self) -> dict[int, int]:
+        """{document frequency: number of terms, ...} by increasing frequency."""
+        with self._lock:
+            return {frequency: len(self._buckets[frequency]) for frequency in sorted(self._buckets)}
+
+    def summary(self) -> dict[str, float]:
+        """Collection and term length statistics (cheap enough to poll)."""
+        with self._lock:
+            vocabulary_size = self._n_terms
+            total_term_length = sum(length * count for length, count in self._term_lengths.items())
+            return {
+                "documents": self._n_docs,
+                "deleted_documents": self._n_deleted,
+                "tokens": self._n_tokens,
+                "average_document_length": self._n_tokens / self._n_docs if self._n_docs else 0.0,
+                "vocabulary_size": vocabulary_size,
+                "postings": self._n_postings,
+                "min_term_length": min(self._term_lengths, default=0),
+                "max_term_length": max(self._term_lengths, default=0),
+                "average_term_length": total_term_length / vocabulary_size if vocabulary_size else 0.0,
+            }
+
+    def __terms_between(self, min_df: int, max_df: int, alphabetic: bool) -> dict[int, list[str]]:
+        """{document frequency: [term, ...], ...} of the terms with min_df <= df <= max_df."""
+        with self._lock:
+            return {
+                frequency: [term for term in bucket if not alphabetic or term.isalpha()]
+                for frequency, bucket in self._buckets.items()
+                if min_df <= frequency <= max_df
+            }
+
+    def duplicate_terms(
+        self,
+        inverted_index: Mapping[str, Sequence[int]],
+        min_df: int = 20,
+        max_df: int = 100,
+        alphabetic: bool = True
+        ) -> Iterator[tuple[str, str]]:
+        """Pairs of terms with identical posting lists (with min_df <= df <= max_df).
+
+        Only terms of equal frequency can match: within a frequency bucket, lists are grouped by a
+        hash of their encoded bytes and compared only on a hash match.
+        """
+        for terms in self.__terms_between(min_df, max_df, alphabetic).values():
+            # {fingerprint: [(term, encoded postings), ...], ...}
+            seen: dict[int, list[tuple[str, bytes]]] = {}
+            for term in terms:
+                data = inverted_index[term].to_bytes()
+                fingerprint = hash(data)
+                matches = seen.setdefault(fingerprint, [])
+                for other_term, other_data in matches:
+                    if other_data == data:
+                        yield other_term, term
+                        break
+                else:
+                    matches.append((term, data))
+
+    def near_duplicate_terms(
+        self,
+        inverted_index: Mapping[str, Sequence[int]],
+        threshold: float = 0.8,
+        min_df: int = 20,
+        max_df: int = 1000,
+        alphabetic: bool = True
+        ) -> list[tuple[str, str, float]]:
+        """Pairs of terms whose posting lists have Jaccard similarity >= threshold, most similar first.
+
+        MinHash signatures (cached per term) are split into bands, terms sharing a band are
+        candidates, and candidates are verified on their decoded lists.
+        """
+        terms = [term for bucket in self.__terms_between(min_df, max_df, alphabetic).values() for term in bucket]
+
+        signatures = {}
+        for term in terms:
+            signature = self._signatures.get(term)
+            if signature is None:
+                signature = minhash_signature(inverted_index[term])
+                self._signatures[term] = signature
+            signatures[term] = signature
+
+        candidates = set()
+        for band_start in range(0, SIGNATURE_SIZE, BAND_ROWS):
+            # {band values: [term, ...], ...}
+            bands: dict[tuple[int, ...], list[str]] = {}
+            for term, signature in signatures.items():
+                bands.setdefault(signature[band_start:band_start + BAND_ROWS], []).append(term)
+            for band_terms in bands.values():
+                candidates.update(combinations(sorted(band_terms), 2))
+
+        pairs = []
+        doc_sets: dict[str, set[int]] = {}
+        for term_a, term_b in candidates:
+            df_a, df_b = self.document_frequency(term_a), self.document_frequency(term_b)
+            if min(df_a, df_b) < threshold * max(df_a, df_b):
+                continue  # Jaccard <= smaller / larger list length
+            for term in (term_a, term_b):
+                if term not in doc_sets:
+                    doc_sets[term] = set(inverted_index[term])
+            set_a, set_b = doc_sets[term_a], doc_sets[term_b]
+            intersection = len(set_a & set_b)
+            jaccard = intersection / (len(set_a) + len(set_b) - intersection)
+            if jaccard >= threshold:
+                pairs.append((term_a, term_b, jaccard))
+
+        pairs.sort(key=lambda pair: (-pair[2], pair[0], pair[1]))
+        return pairs
@@ -0,0 +1,372 @@
+import json
+import mmap
+import os
+import struct
+from array import array
+from collections.abc import Mapping
+from typing import Iterable, Iterator, Sequence
+
+from docTable import DocTable
+from postingsList import BitmapPostings, FrequencyList, PositionsList, PostingsList
+
+# File layout (little-endian):
+#   header | postings (+ frequencies + positions) blob | skip pointers | term blob | term entries
+#   | doc ID blob | doc ID offsets | doc lengths | config (JSON, e.g. analyzer settings)
+# Term entries are fixed-size records sorted by term, so a term is found by binary search
+# and its posting list is decoded straight from the mapped file on first access.
+# Skip pointers, frequencies and doc lengths are arrays read in place (aligned, little-endian hosts).
+# Dense terms store a bitmap instead of varbyte postings (ENTRY_BITMAP flag).
+MAGIC = b"IPIX"
+FORMAT_VERSION = 6
+FLAG_POSITIONAL = 1
+ENTRY_BITMAP = 1
+# magic, version, flags, n_terms, n_docs, skips_off, term_blob_off, term_entries_off, doc_blob_off, doc_offsets_off,
+# doc_lengths_off, config_off
+_HEADER = struct.Struct("<4sIIQQQQQQQQQ")
+# term_off, term_len, postings_off, postings_nbytes, postings_length, postings_last_id, skips_index, n_skips,
+# frequencies_off, frequencies_nbytes, positions_off, positions_nbytes, entry_flags
+_TERM_ENTRY = struct.Struct("<QIQQIIQIQQQQI")
+_DOC_OFFSET = struct.Struct("<Q")
+
+
+class IndexWriter:
+    """
+    Stream terms (in sorted order) and their posting lists into an index file.
+    The file is written under a temporary name next to path and renamed over it on close(), so an
+    index loaded (memory-mapped) from path keeps its data, even when saving back to the same path.
+    """
+
+    def __init__(self, path: str, positional: bool = False):
+        self._path = path
+        # Same directory (os.replace can't cross file systems), default permissions
+        self._tmp_path = f"{path}.{os.getpid()}.{id(self):x}.tmp"
+        self._file = open(self._tmp_path, "xb")
+        self._positional = positional
+        # Header placeholder, patched on close once all section offsets are known
+        self._file.write(bytes(_HEADER.size))
+        self._postings_off = _HEADER.size
+        self._postings_size = 0
+        self._skip_ids = array("I")
+        self._skip_offsets = array("I")
+        self._skip_indexes = array("I")
+        self._term_blob = bytearray()
+        self._term_entries = bytearray()
+        self._n_terms = 0
+        self._last_term: bytes | None = None
+
+    def add(
+        self,
+        term: str,
+        postings: PostingsList | BitmapPostings,
+        frequencies: FrequencyList,
+        positions: PositionsList | None = None
+        ) -> None:
+        """Append a term, its posting list and frequencies (and positions), terms must arrive in ascending order."""
+        term_bytes = term.encode("utf-8")
+        if self._last_term is not None and term_bytes <= self._last_term:
+            raise ValueError(f"Terms must be added in sorted order, got {term!r} after {self._last_term!r}.")
+        self._last_term = term_bytes
+
+        if self._positional and positions is None:
+            raise ValueError(f"Missing positions for term {term!r} in a positional index.")
+
+        postings_off = self._postings_off + self._postings_size
+        data = postings.to_bytes()
+        self._file.write(data)
+        self._postings_size += len(data)
+
+        # Frequencies follow their posting list, aligned so they can be cast in place
+        padding = -(self._postings_off + self._postings_size) % 4
+        self._file.write(bytes(padding))
+        self._postings_size += padding
+        frequencies_off = self._postings_off + self._postings_size
+        frequencies_data = frequencies.to_bytes()
+        self._file.write(frequencies_data)
+        self._postings_size += len(frequencies_data)
+
+        # Positions follow their posting list in the same blob
+        positions_off = self._postings_off + self._postings_size
+        positions_data = positions.to_bytes() if self._positional else b""
+        self._file.write(positions_data)
+        self._postings_size += len(positions_data)
+
+        skip_ids, skip_offsets, skip_indexes = postings.skip_pointers()
+        self._term_entries += _TERM_ENTRY.pack(
+            len(self._term_blob), len(term_bytes),
+            postings_off, len(data),
+            len(postings), postings.last_id,
+            len(self._skip_ids), len(skip_ids),
+            frequencies_off, len(frequencies_data),
+            positions_off, len(positions_data),
+            ENTRY_BITMAP if isinstance(postings, BitmapPostings) else 0
+        )
+        self._skip_ids.extend(skip_ids)
+        self._skip_offsets.extend(skip_offsets)
+        self._skip_indexes.extend(skip_indexes)
+        self._term_blob += term_bytes
+        self._n_terms += 1
+
+    def close(self, doc_ids: Iterable[str], doc_lengths: Iterable[int], config: dict | None = None) -> None:
+        """Write term dictionary, doc ID map (original IDs of internal IDs 1..N), doc lengths
+        (indexed by internal ID, entry 0 unused) and config and finish the file."""
+        # Align the skip arrays so they can be cast to uint32 in place
+        skips_off = self._postings_off + self._postings_size
+        padding = -skips_off % 4
+        self._file.write(bytes(padding))
+        skips_off += padding
+        self._file.write(self._skip_ids.tobytes())
+        self._file.write(self._skip_offsets.tobytes())
+        self._file.write(self._skip_indexes.tobytes())
+
+        term_blob_off = skips_off + 12 * len(self._skip_ids)
+        self._file.write(self._term_blob)
+        term_entries_off = term_blob_off + len(self._term_blob)
+        self._file.write(self._term_entries)
+
+        doc_blob = bytearray()
+        doc_offsets = bytearray(_DOC_OFFSET.pack(0))
+        n_docs = 0
+        for doc_id in doc_ids:
+            doc_blob += doc_id.encode("utf-8")
+            doc_offsets += _DOC_OFFSET.pack(len(doc_blob))
+            n_docs += 1
+
+        doc_blob_off = term_entries_off + len(self._term_entries)
+        self._file.write(doc_blob)
+        doc_offsets_off = doc_blob_off + len(doc_blob)
+        self._file.write(doc_offsets)
+
+        doc_lengths_off = doc_offsets_off + len(doc_offsets)
+        padding = -doc_lengths_off % 4
+        self._file.write(bytes(padding))
+        doc_lengths_off += padding
+        lengths_data = array("I", doc_lengths).tobytes()
+        self._file.write(lengths_data)
+
+        config_off = doc_lengths_off + len(lengths_data)
+        self._file.write(json.dumps(config or {}).encode("utf-8"))
+
+        self._file.seek(0)
+        self._file.write(_HEADER.pack(
+            MAGIC, FORMAT_VERSION, FLAG_POSITIONAL if self._positional else 0, self._n_terms, n_docs,
+            skips_off, term_blob_off, term_entries_off, doc_blob_off, doc_offsets_off, doc_lengths_off, config_off
+        ))
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._file.close()
+        os.replace(self._tmp_path, self._path)
+
+    def discard(self) -> None:
+        """Abandon an unfinished file (path is left as it was)."""
+        self._file.close()
+        if os.path.exists(self._tmp_path):
+            os.remove(self._tmp_path)
+
+
+class MappedIndex(Mapping):
+    """Read-only term -> PostingsList mapping over a memory-mapped index file."""
+
+    def __init__(self, buffer, n_terms: int, skips_off: int, n_skips: int, term_blob_off: int, term_entries_off: int):
+        self._buffer = buffer
+        self._n_terms = n_terms
+        # All skip IDs, then all skip offsets, then all skip indexes, viewed in place as uint32 arrays
+        skips = memoryview(buffer)[skips_off:skips_off + 12 * n_skips].cast("I")
+        self._skip_ids = skips[:n_skips]
+        self._skip_offsets = skips[n_skips:2 * n_skips]
+        self._skip_indexes = skips[2 * n_skips:]
+        self._term_blob_off = term_blob_off
+        self._term_entries_off = term_entries_off
+        # Posting lists decoded so far - {'term': PostingsList, ...}
+        self._cache: dict[str, PostingsList] = {}
+
+    def __entry(self, i: int) -> tuple[int, ...]:
+        return _TERM_ENTRY.unpack_from(self._buffer, self._term_entries_off + i * _TERM_ENTRY.size)
+
+    def __term_bytes(self, entry: tuple) -> bytes:
+        start = self._term_blob_off + entry[0]
+        return self._buffer[start:start + entry[1]]
+
+    def __postings(self, entry: tuple) -> PostingsList | BitmapPostings:
+        _, _, postings_off, nbytes, length, last_id, skips_index, n_skips, _, _, _, _, entry_flags = entry
+        data = memoryview(self._buffer)[postings_off:postings_off + nbytes]
+        if entry_flags & ENTRY_BITMAP:
+            return BitmapPostings.from_buffer(data, length)
+        skip_ids = self._skip_ids[skips_index:skips_index + n_skips]
+        skip_offsets = self._skip_offsets[skips_index:skips_index + n_skips]
+        skip_indexes = self._skip_indexes[skips_index:skips_index + n_skips]
+        return PostingsList.from_buffer(data, length, last_id, skip_ids, skip_offsets, skip_indexes)
+
+    def __find(self, term_bytes: bytes) -> tuple | None:
+        """Binary search the sorted term entries."""
+        lo, hi = 0, self._n_terms
+        while lo < hi:
+            mid = (lo + hi) // 2
+            entry = self.__entry(mid)
+            mid_term = self.__term_bytes(entry)
+            if mid_term == term_bytes:
+                return entry
+            if mid_term < term_bytes:
+                lo = mid + 1
+            else:
+                hi = mid
+        return None
+
+    def __getitem__(self, term: str) -> PostingsList | BitmapPostings:
+        postings = self._cache.get(term)
+        if postings is None:
+            entry = self.__find(term.encode("utf-8"))
+            if entry is None:
+                raise KeyError(term)
+            postings = self.__postings(entry)
+            self._cache[term] = postings
+        return postings
+
+    def __contains__(self, term: object) -> bool:
+        return isinstance(term, str) and (term in self._cache or self.__find(term.encode("utf-8")) is not None)
+
+    def __iter__(self) -> Iterator[str]:
+        for i in range(self._n_terms):
+            yield self.__term_bytes(self.__entry(i)).decode("utf-8")
+
+    def __len__(self) -> int:
+        return self._n_terms
+
+    def items(self) -> Iterator[tuple[str, PostingsList]]:
+        """Sequential scan of all terms (avoids a binary search per term)."""
+        for i in range(self._n_terms):
+            entry = self.__entry(i)
+            yield self.__term_bytes(entry).decode("utf-8"), self.__postings(entry)
+
+    def document_frequency(self, term: str) -> int:
+        """Posting list length of a term (0 if absent), read from its term entry."""
+        postings = self._cache.get(term)
+        if postings is not None:
+            return len(postings)
+        entry = self.__find(term.encode("utf-8"))
+        return 0 if entry is None else entry[4]
+
+    def document_frequencies(self) -> Iterator[tuple[str, int]]:
+        """Sequential scan of (term, posting list length) pairs, read from the term entries only."""
+        for i in range(self._n_terms):
+            entry = self.__entry(i)
+            yield self.__term_bytes(entry).decode("utf-8"), entry[4]
+
+    def frequencies(self, term: str) -> FrequencyList:
+        """Term frequencies of a term, read in place."""
+        entry = self.__find(term.encode("utf-8"))
+        if entry is None:
+            raise KeyError(term)
+        frequencies_off, frequencies_nbytes = entry[8], entry[9]
+        data = memoryview(self._buffer)[frequencies_off:frequencies_off + frequencies_nbytes]
+        return FrequencyList.from_buffer(data, entry[4])
+
+    def positions(self, term: str) -> PositionsList:
+        """Decode-on-demand positions of a term (empty lists if the file has no positions)."""
+        entry = self.__find(term.encode("utf-8"))
+        if entry is None:
+            raise KeyError(term)
+        positions_off, positions_nbytes = entry[10], entry[11]
+        data = memoryview(self._buffer)[positions_off:positions_off + positions_nbytes]
+        return PositionsList.from_buffer(data, entry[4] if positions_nbytes else 0)
+
+
+class MappedPositionalIndex(Mapping):
+    """Read-only term -> PositionsList mapping sharing the term dictionary of a MappedIndex."""
+
+    def __init__(self, index: MappedIndex):
+        self._index = index
+        self._cache: dict[str, PositionsList] = {}
+
+    def __getitem__(self, term: str) -> PositionsList:
+        positions = self._cache.get(term)
+        if positions is None:
+            positions = self._index.positions(term)
+            self._cache[term] = positions
+        return positions
+
+    def __contains__(self, term: object) -> bool:
+        return term in self._index
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._index)
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+
+class MappedFrequencyIndex(Mapping):
+    """Read-only term -> FrequencyList mapping sharing the term dictionary of a MappedIndex."""
+
+    def __init__(self, index: MappedIndex):
+        self._index = index
+        self._cache: dict[str, FrequencyList] = {}
+
+    def __getitem__(self, term: str) -> FrequencyList:
+        frequencies = self._cache.get(term)
+        if frequencies is None:
+            frequencies = self._index.frequencies(term)
+            self._cache[term] = frequencies
+        return frequencies
+
+    def __contains__(self, term: object) -> bool:
+        return term in self._index
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._index)
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+
+def write_index(
+    path: str,
+    inverted_index: Mapping[str, PostingsList],
+    frequency_index: Mapping[str, FrequencyList],
+    doc_id_map: Mapping[int, str],
+    doc_lengths: Sequence[int],
+    positional_index: Mapping[str, PositionsList] | None = None,
+    config: dict | None = None
+    ) -> None:
+    """Write an in-memory index (with positions if given) to path in the binary index format."""
+    writer = IndexWriter(path, positional=bool(positional_index))
+    try:
+        for term in sorted(inverted_index):  # str order == UTF-8 byte order
+            writer.add(
+                term, inverted_index[term], frequency_index[term], positional_index[term] if positional_index else None
+            )
+        writer.close((doc_id_map[internal_id] for internal_id in range(1, len(doc_id_map) + 1)), doc_lengths, config)
+    except BaseException:
+        writer.discard()
+        raise
+
+
+def load_index(path: str) -> tuple[
+    MappedIndex, MappedFrequencyIndex, MappedPositionalIndex | None, DocTable, Sequence[int], dict
+    ]:
+    """Memory-map an index file, posting lists are decoded lazily on first access."""
+    with open(path, "rb") as f:
+        # The mapping stays valid after the file object is closed
+        buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    magic, version = struct.unpack_from("<4sI", buffer, 0)
+    if magic != MAGIC:
+        raise ValueError(f"{path} is not an index file.")
+    if version != FORMAT_VERSION:
+        raise ValueError(f"Unsupported index format version {version} in {path}.")
+
+    (_, _, flags, n_terms, n_docs, skips_off, term_blob_off, term_entries_off, doc_blob_off, doc_offsets_off,
+     doc_lengths_off, config_off) = _HEADER.unpack_from(buffer, 0)
+    n_skips = (term_blob_off - skips_off) // 12
+
+    index = MappedIndex(buffer, n_terms, skips_off, n_skips, term_blob_off, term_entries_off)
+    return (
+        index,
+        MappedFrequencyIndex(index),
+        MappedPositionalIndex(index) if flags & FLAG_POSITIONAL else None,
+        DocTable.from_buffer(
+            memoryview(buffer)[doc_blob_off:doc_offsets_off],
+            memoryview(buffer)[doc_offsets_off:doc_offsets_off + _DOC_OFFSET.size * (n_docs + 1)].cast("Q")
+        ),
+        memoryview(buffer)[doc_lengths_off:doc_lengths_off + 4 * (n_docs + 1)].cast("I"),
+        json.loads(buffer[config_off:].decode("utf-8")),
+    )
@@ -0,0 +1,108 @@
+import json
+import threading
+import time
+from typing import Callable, Optional, Sequence
+
+# Receives each instrumentation record (a JSON-serializable dict with an "event" key)
+Sink = Callable[[dict], None]
+
+
+class JsonLinesSink:
+    """
+    Sink appending each record to a file as one JSON line
+    Writes are buffered (flushed on close) and serialized, so it can be shared between threads.
+    """
+    def __init__(self, path: str):
+        self.path = path
+        self._file = open(path, "a", encoding="utf-8")
+        self._lock = threading.Lock()
+
+    def __call__(self, record: dict) -> None:
+        line = json.dumps(record, separators=(",", ":"))
+        with self._lock:
+            self._file.write(line + "\n")
+
+    def close(self) -> None:
+        with self._lock:
+            self._file.close()
+
+    def __enter__(self) -> "JsonLinesSink":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+class QueryProfiler:
+    """
+    Collects the profile of each query and passes it to the sink when the query finishes:
+    posting list sizes of its terms, time / output size of each operator node, and algorithm,
+    input sizes, elements compared, time and output size of each pairwise AND / OR / NOT
+    Profiles are per thread, so batch queries on a thread pool are kept apart.
+    """
+    def __init__(self, sink: Sink):
+        self.sink = sink
+        # The profile being recorded on the current thread (None between queries)
+        self._local = threading.local()
+
+    def start(self, query: str) -> None:
+        self._local.profile = {
+            "event": "query",
+            "query": query,
+            "terms": {},
+            "nodes": [],
+            "operations": [],
+        }
+        self._local.start = time.perf_counter()
+
+    def __profile(self) -> Optional[dict]:
+        return getattr(self._local, "profile", None)
+
+    def term(self, term: str, size: int) -> None:
+        """A term's posting list was fetched."""
+        profile = self.__profile()
+        if profile is not None:
+            profile["terms"][term] = size
+
+    def node(self, query: str, seconds: float, output_size: int, cached: bool = False) -> None:
+        """An operator node was evaluated (seconds include its operands), or taken from a cache."""
+        profile = self.__profile()
+        if profile is not None:
+            profile["nodes"].append({
+                "node": query,
+                "seconds": seconds,
+                "output_size": output_size,
+                "cached": cached,
+            })
+
+    def operation(
+        self,
+        operator: str,
+        algorithm: str,
+        input_sizes: Sequence[int],
+        comparisons: int,
+        output_size: int,
+        seconds: float
+        ) -> None:
+        """A pairwise AND / OR / NOT was computed."""
+        profile = self.__profile()
+        if profile is not None:
+            profile["operations"].append({
+                "operator": operator,
+                "algorithm": algorithm,
+                "input_sizes": list(input_sizes),
+                "comparisons": comparisons,
+                "output_size": output_size,
+                "seconds": seconds,
+            })
+
+    def finish(self, result_size: int) -> None:
+        """Complete the current query's profile and emit it."""
+        profile = self.__profile()
+        if profile is None:
+            return
+        profile["seconds"] = time.perf_counter() - self._local.start
+        profile["result_size"] = result_size
+        profile["comparisons"] = sum(operation["comparisons"] for operation in profile["operations"])
+        self._local.profile = None
+        self.sink(profile)
@@ -1,158 +1,864 @@
-import os
-import re
-import random
-from typing import Optional
-import zipfile
-
-
-class InvertedIndex:
-    def __init__(self):
-        """Inverted index storing term -> posting list and ID mappings."""
-        # {'unique_term': [internal_id_1, internal_id_5,...], ...}
-        self._inverted_index: dict[str, list[int]] = {}
-        # {internal_doc_id_1: original_doc_id,...}
-        self._doc_id_map: dict[int, str] = {}
-        # counter for internal_id
-        self._next_internal_doc_id: int = 1
-        # A dict to store the frequency for each term - {'term': doc_frequency, ...}
-        self._docs_frequency: dict[str, int] = {}
-        # Doc patterns
-        self.doc_pattern = re.compile(r"<DOC>(.*?)</DOC>", re.DOTALL)
-        self.doc_id_pattern = re.compile(r"<DOCNO>\s*(.*?)\s*</DOCNO>", re.DOTALL)
-        self.text_pattern = re.compile(r"<TEXT>\s*(.*?)\s*</TEXT>", re.DOTALL)
-
-    def build_index(self, data_dir: str = "data") -> None:
-        """Build inverted index from AP data directory."""
-        # Iterate over all .zip files in the directory
-        for zip_name in os.listdir(data_dir):
-            zip_path = os.path.join(data_dir, zip_name)
-            print(f"Indexing file: {zip_name}")
-            # Open the zip file
-            with zipfile.ZipFile(zip_path, 'r') as zip_ref:
-                # Iterate over all files inside the zip
-                for file_name in zip_ref.namelist():
-                    with zip_ref.open(file_name) as file:
-                        content = file.read().decode('latin-1')
-                        docs = self.doc_pattern.findall(content)
-
-                        for block in docs:
-                            doc_id_match = self.doc_id_pattern.search(block)
-                            text_match = self.text_pattern.search(block)
-
-                            doc_id = doc_id_match.group(1).strip() if doc_id_match else None
-                            text = text_match.group(1).strip() if text_match else ""
-
-                            # Skip empty text
-                            if not text:
-                                continue
-
-                            internal_id = self.__update_doc_id_map(doc_id)
-                            tokens = text.split()  # simple whitespace tokenizer
-                            self.__update_inverted_index(tokens, internal_id)
-                    
-        print("Finished indexing")
-
-    def __update_doc_id_map(self, original_doc_id: Optional[str]) -> int:
-        """Map original AP doc ID to internal numeric ID."""
-        if original_doc_id is None:
-            raise ValueError("Missing <DOCNO> tag in document.")
-
-        assigned_id = self._next_internal_doc_id
-        self._doc_id_map[assigned_id] = original_doc_id
-        self._next_internal_doc_id += 1
-        return assigned_id
-
-    def __update_inverted_index(self, tokens: list[str], internal_id: int) -> None:
-        """Insert terms into inverted index and update posting lists."""
-        seen = set()
-
-        for term in tokens:
-            if term in seen:
-                continue # avoid duplicates inside the same document
-            seen.add(term)
-
-            if term in self._inverted_index:
-                self._inverted_index[term].append(internal_id)
-            else:
-                self._inverted_index[term] = [internal_id]
-
-    def get_index(self) -> dict[str, list[int]]:
-        """Return the inverted index."""
-        return self._inverted_index
-
-    def get_doc_id_map(self) -> dict[int, str]:
-        """Return internal -> original document ID mapping."""
-        return self._doc_id_map
-
-    def sort_docs_frequency(self) -> None:
-        """Sort term dictionary by document frequency (descending)."""
-        for term, postings_list in self._inverted_index.items():
-            self._docs_frequency[term] = len(postings_list)
-
-        self._docs_frequency = dict(
-            sorted(self._docs_frequency.items(), key=lambda x: x[1], reverse=True)
-        )
-
-    def get_top_10_terms(self) -> list[tuple[str, int]]:
-        """Return the top 10 highest-frequency terms."""
-        return list(self._docs_frequency.items())[:10]
-
-    def get_lowest_10_terms(self) -> list[tuple[str, int]]:
-        """Return the lowest 10 frequency terms."""
-        return list(self._docs_frequency.items())[-10:]
-
-    def find_similar_terms(self) -> dict | None:
-        """Find two alphabetic terms sharing the same postings list."""
-        # Use reversed inverted index (hashmap for quick lookup):
-        # Key = tuple(sorted doc_ids), Value = first found alphabetic term
-        reversed_inverted_index = {}
-
-        for term, postings_list in self._inverted_index.items():
-            if not term.isalpha():
-                continue  # skip non-alphabetic terms (for more meaningful results)
-
-            if len(postings_list) < 20 or len(postings_list) > 100:
-                continue  # skip too small or too large postings lists
-
-            postings_tuple = tuple(postings_list)  # lists not hashable -> use tuple
-
-            if postings_tuple not in reversed_inverted_index:
-                reversed_inverted_index[postings_tuple] = term
-
-            # Found a second term with the same postings list
-            elif term != reversed_inverted_index[postings_tuple]:
-                internal_ids = list(postings_tuple)
-                original_ids = [self._doc_id_map[i] for i in internal_ids]
-
-                return {
-                    "terms": (reversed_inverted_index[postings_tuple], term),
-                    "internal_ids": internal_ids,
-                    "original_ids": original_ids
-                }
-            
-        # If no pair found
-        return None
-
-
-if __name__ == "__main__":
-    # Build inverted index
-    index = InvertedIndex()
-    index.build_index()
-
-    # Retrieve data structures
-    revert_index = index.get_index()
-    doc_mapper = index.get_doc_id_map()
-
-    # Print first 10 terms for inspection
-    first_keys = list(revert_index.keys())[:10]
-    for key in first_keys:
-        values = revert_index[key]
-        print(key, values[:10])
-
-    # Collection statistics
-    index.sort_docs_frequency()
-    print(index.get_top_10_terms())
-    print(index.get_lowest_10_terms())
-
-    # Similar term detection
-    print(index.find_similar_terms())
+import os
+import heapq
+import logging
+import pickle
+import random
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from bisect import bisect_left
+from itertools import accumulate, groupby
+from typing import Callable, Iterable, Iterator, Optional
+import zipfile
+from array import array
+from collections import Counter
+
+from docTable import DocTable
+from indexStatistics import IndexStatistics, document_frequencies, document_frequency
+from indexStorage import IndexWriter, load_index, write_index
+from instrumentation import Sink
+from postingsList import BitmapPostings, FrequencyList, PositionsList, PostingsList, optimize_postings
+from segmentedIndex import DeletionBitmap, SegmentedIndexView, SegmentedPositionalView, compact_segments
+from sgmlReader import iter_documents
+from termDictionary import TermDictionary
+from textAnalyzer import Analyzer
+
+logger = logging.getLogger(__name__)
+
+# Rough in-memory cost used for the SPIMI memory budget: per distinct term in a block
+# (dict slot, term string, PostingsList + buffers) and per stored posting / position
+TERM_OVERHEAD_BYTES = 200
+POSTING_BYTES = 3
+# Postings buffered as plain arrays (8 bytes each) before they are varbyte encoded into the
+# lists in one pass per term (~32 MB)
+BUFFERED_POSTINGS = 1 << 22
+
+
+class InvertedIndex:
+    def __init__(self, positional: bool = False, analyzer: Optional[Analyzer] = None, sink: Optional[Sink] = None):
+        """Inverted index storing term -> posting list and ID mappings (+ term positions if positional)."""
+        # Opt-in build instrumentation: per-zip parse / tokenize / insert timings passed to sink(record)
+        self._sink = sink
+        # Text -> terms pipeline (plain whitespace split by default), queries must use the same one
+        self._analyzer = analyzer if analyzer is not None else Analyzer()
+        # {'unique_term': PostingsList([internal_id_1, internal_id_5,...]), ...}
+        # (terms in at least 1/16 of the documents become BitmapPostings when indexing finishes)
+        self._inverted_index: dict[str, PostingsList | BitmapPostings] = {}
+        # {'unique_term': FrequencyList([count in internal_id_1, count in internal_id_5,...]), ...}
+        self._frequency_index: dict[str, FrequencyList] = {}
+        # Number of tokens of each document, indexed by internal ID (entry 0 unused)
+        self._doc_lengths: array = array("I", [0])
+        # Record term positions for phrase / proximity queries
+        self._positional = positional
+        # {'unique_term': PositionsList([positions in internal_id_1, positions in internal_id_5,...]), ...}
+        self._positional_index: dict[str, PositionsList] = {}
+        # Postings (and positions) added since the last SPIMI block flush
+        self._n_postings: int = 0
+        # Incremental updates: documents added after the build go to a delta segment,
+        # deletions are marked in a bitmap over internal IDs until compact() folds them in
+        self._delta_index: dict[str, PostingsList] = {}
+        self._delta_frequency_index: dict[str, FrequencyList] = {}
+        self._delta_positional_index: dict[str, PositionsList] = {}
+        # Deltas frozen by a running compaction - [(delta_index, delta_frequency_index, delta_positional_index), ...]
+        self._frozen_deltas: list[
+            tuple[dict[str, PostingsList], dict[str, FrequencyList], dict[str, PositionsList]]
+        ] = []
+        self._deleted = DeletionBitmap()
+        # base + delta - deleted views handed to queries, rebuilt after each update
+        self._view: Optional[SegmentedIndexView] = None
+        self._frequency_view: Optional[SegmentedPositionalView] = None
+        self._positional_view: Optional[SegmentedPositionalView] = None
+        self._lock = threading.Lock()
+        self._compact_lock = threading.Lock()
+        # Callbacks run after every change to the indexed documents (e.g. to clear result caches)
+        self._listeners: list[Callable[[], None]] = []
+        # internal_doc_id (1..N) -> original_doc_id, with DOCNO -> internal ID lookups
+        self._doc_table: DocTable = DocTable()
+        # counter for internal_id
+        self._next_internal_doc_id: int = 1
+        # Collection statistics (document frequencies read from the posting lists), updated as documents
+        # are indexed (None for a loaded index until first needed)
+        self._statistics: Optional[IndexStatistics] = IndexStatistics(self)
+        # Postings indexed since the last flush, encoded into the posting lists and counted in the
+        # statistics once per term and batch
+        # ({'term': (array('I', [internal_id, ...]), array('I', [count, ...])), ...} and [doc_length, ...])
+        self._buffered_postings: dict[str, tuple[array, array]] = {}
+        self._n_buffered: int = 0
+        self._pending_lengths: list[int] = []
+        # Sorted vocabulary for prefix / wildcard lookups, built on first use after each change
+        self._term_dictionary: Optional[TermDictionary] = None
+
+    def build_index(
+        self,
+        data_dir: str = "data",
+        workers: Optional[int] = None,
+        memory_budget: Optional[int] = None,
+        index_path: Optional[str] = None,
+        members: Optional[list[tuple[str, list[str]]]] = None
+        ) -> None:
+        """Build inverted index from AP data directory.
+
+        members ([(zip_path, [file_name, ...]), ...], e.g. one shard of _plan_shards) restricts a serial
+        build to those zip members instead of the whole directory.
+
+        With workers > 1 the zip members are indexed in a process pool and the
+        partial indexes are merged back in order (same result as the serial build).
+        With a memory_budget (bytes) the build is SPIMI-style: sorted blocks are flushed
+        to temp files whenever the budget is hit and k-way merged into index_path (required,
+        an existing file is replaced), which is then memory-mapped (and, like a loaded index,
+        can't be built into again).
+        """
+        if not isinstance(self._inverted_index, dict):
+            raise RuntimeError(
+                "A memory-mapped index (InvertedIndex.load or a memory_budget build) is read-only: "
+                "index more documents with add_documents(), or build a new InvertedIndex."
+            )
+
+        start = time.perf_counter()
+        n_docs_before = self._next_internal_doc_id - 1
+        # Bitmaps of an earlier build can't be appended to, nor the doc lengths of a loaded (compacted) index
+        self.__expand_bitmaps()
+        self.__ensure_mutable_doc_lengths()
+        # Statistics not counted yet are counted from the lists before new documents go in
+        self.get_statistics()
+
+        if members is not None and (memory_budget is not None or (workers is not None and workers > 1)):
+            raise ValueError("members can only be indexed by a serial build.")
+
+        if memory_budget is not None:
+            if workers is not None and workers > 1:
+                raise ValueError("memory_budget and workers cannot be combined.")
+            if index_path is None:
+                raise ValueError("A memory_budget build is merged into a file: pass index_path.")
+            mode = "spimi"
+            self.__build_index_spimi(data_dir, memory_budget, index_path)
+        else:
+            if workers is not None and workers > 1:
+                mode = "parallel"
+                self.__build_index_parallel(data_dir, workers)
+            else:
+                mode = "serial"
+                # Iterate over all .zip files in the directory (all their members)
+                if members is None:
+                    members = [(os.path.join(data_dir, zip_name), None) for zip_name in os.listdir(data_dir)]
+                for zip_path, file_names in members:
+                    logger.info("Indexing file: %s", os.path.basename(zip_path))
+                    self._index_zip(zip_path, file_names)
+                self._flush_postings()
+            self.__optimize_postings()
+
+        self.__notify_listeners()
+        logger.info("Finished indexing")
+
+        if self._sink is not None:
+            seconds = time.perf_counter() - start
+            n_docs = self._next_internal_doc_id - 1 - n_docs_before
+            self._sink({
+                "event": "build",
+                "mode": mode,
+                "documents": n_docs,
+                "seconds": seconds,
+                "docs_per_second": n_docs / seconds if seconds else 0.0,
+            })
+
+    def _index_zip(
+        self,
+        zip_path: str,
+        file_names: Optional[list[str]] = None,
+        after_file: Optional[Callable[[], None]] = None
+        ) -> None:
+        """Index the given members of a zip file (all members by default).
+
+        Postings are buffered (up to BUFFERED_POSTINGS) until _flush_postings().
+        """
+        # Seconds spent parsing SGML, tokenizing and inserting postings (only with a sink)
+        timings = [0.0, 0.0, 0.0] if self._sink is not None else None
+        start = time.perf_counter()
+        n_docs = n_tokens = 0
+
+        # Open the zip file
+        with zipfile.ZipFile(zip_path, 'r') as zip_ref:
+            if file_names is None:
+                file_names = zip_ref.namelist()
+
+            # Iterate over the files inside the zip
+            for file_name in file_names:
+                with zip_ref.open(file_name) as file:
+                    # Streamed, one document at a time (text of all its <TEXT> sections)
+                    documents = iter_documents(file)
+                    if timings is not None:
+                        documents = _timed_iterator(documents, timings)
+
+                    for doc_id, text in documents:
+                        # Skip empty text
+                        if not text:
+                            continue
+
+                        if timings is not None:
+                            tokenize_start = time.perf_counter()
+                        internal_id = self.__update_doc_id_map(doc_id)
+                        tokens = self._analyzer.analyze(text)
+                        self._doc_lengths.append(len(tokens))
+                        self._pending_lengths.append(len(tokens))
+                        if timings is not None:
+                            insert_start = time.perf_counter()
+                            timings[1] += insert_start - tokenize_start
+                        self.__update_inverted_index(tokens, internal_id)
+                        if timings is not None:
+                            timings[2] += time.perf_counter() - insert_start
+                            n_docs += 1
+                            n_tokens += len(tokens)
+
+                if self._n_buffered >= BUFFERED_POSTINGS:
+                    self._flush_postings()
+                if after_file is not None:
+                    after_file()
+
+        if timings is not None:
+            seconds = time.perf_counter() - start
+            self._sink({
+                "event": "index_zip",
+                "zip": os.path.basename(zip_path),
+                "files": len(file_names),
+                "documents": n_docs,
+                "tokens": n_tokens,
+                "parse_seconds": timings[0],
+                "tokenize_seconds": timings[1],
+                "insert_seconds": timings[2],
+                "seconds": seconds,
+                "docs_per_second": n_docs / seconds if seconds else 0.0,
+            })
+
+    def __build_index_spimi(self, data_dir: str, memory_budget: int, index_path: str) -> None:
+        """Single-pass in-memory indexing with a memory budget, then an external k-way merge."""
+        # Keep the temp blocks next to the index so the merge doesn't cross disks
+        with tempfile.TemporaryDirectory(dir=os.path.dirname(os.path.abspath(index_path))) as tmp_dir:
+            block_paths = []
+
+            def flush_if_full() -> None:
+                # Buffered postings take more memory than encoded ones, encode them before measuring
+                self._flush_postings()
+                estimate = len(self._inverted_index) * TERM_OVERHEAD_BYTES + self._n_postings * POSTING_BYTES
+                if estimate >= memory_budget:
+                    block_paths.append(self.__flush_block(tmp_dir, len(block_paths)))
+
+            for zip_name in os.listdir(data_dir):
+                zip_path = os.path.join(data_dir, zip_name)
+                logger.info("Indexing file: %s", zip_name)
+                self._index_zip(zip_path, after_file=flush_if_full)
+
+            if self._inverted_index:
+                block_paths.append(self.__flush_block(tmp_dir, len(block_paths)))
+
+            logger.info("Merging %d blocks into %s", len(block_paths), index_path)
+            self.__merge_blocks(block_paths, index_path)
+
+        (self._inverted_index, self._frequency_index, positional_index,
+         self._doc_table, self._doc_lengths, _) = load_index(index_path)
+        if positional_index is not None:
+            self._positional_index = positional_index
+        # Counted per block while indexing, recount from the merged index
+        self._statistics = IndexStatistics.from_index(self, self._doc_lengths[1:])
+
+    def __flush_block(self, tmp_dir: str, block_number: int) -> str:
+        """Write the in-memory postings as a term-sorted block file and start a new block."""
+        block_path = os.path.join(tmp_dir, f"block_{block_number}.bin")
+        with open(block_path, "wb") as block_file:
+            for term in sorted(self._inverted_index):
+                record = (
+                    term, self._inverted_index[term], self._frequency_index[term], self._positional_index.get(term)
+                )
+                pickle.dump(record, block_file, protocol=pickle.HIGHEST_PROTOCOL)
+
+        self._inverted_index = {}
+        self._frequency_index = {}
+        self._positional_index = {}
+        self._n_postings = 0
+        return block_path
+
+    @staticmethod
+    def __read_block(block_path: str, block_number: int) -> Iterator[tuple]:
+        """Stream (term, block_number, postings, frequencies, positions) records of a block file."""
+        with open(block_path, "rb") as block_file:
+            while True:
+                try:
+                    term, postings, frequencies, positions = pickle.load(block_file)
+                except EOFError:
+                    return
+                yield term, block_number, postings, frequencies, positions
+
+    def __merge_blocks(self, block_paths: list[str], index_path: str) -> None:
+        """Heap-based k-way merge of the sorted blocks, streamed into an index file."""
+        readers = [self.__read_block(path, number) for number, path in enumerate(block_paths)]
+        writer = IndexWriter(index_path, positional=self._positional)
+
+        # Records arrive by term, then by block - blocks hold increasing doc IDs, so
+        # concatenating a term's lists in block order keeps them sorted
+        merged = heapq.merge(*readers, key=lambda record: (record[0], record[1]))
+        try:
+            for term, records in groupby(merged, key=lambda record: record[0]):
+                postings = PostingsList()
+                frequencies = FrequencyList()
+                positions = PositionsList() if self._positional else None
+                for _, _, block_postings, block_frequencies, block_positions in records:
+                    postings.concat(block_postings)
+                    frequencies.concat(block_frequencies)
+                    if positions is not None:
+                        positions.concat(block_positions)
+                writer.add(term, optimize_postings(postings, self._next_internal_doc_id - 1), frequencies, positions)
+
+            writer.close(self._doc_table.values(), self._doc_lengths, {"analyzer": self._analyzer.config()})
+        except BaseException:
+            writer.discard()
+            raise
+
+    def __build_index_parallel(self, data_dir: str, workers: int) -> None:
+        """Index contiguous shards of zip members in worker processes and merge them."""
+        # More shards than workers keeps all cores busy when shard sizes differ
+        shards = self._plan_shards(data_dir, workers * 4)
+
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            # map() yields the partial indexes in shard order, which keeps doc IDs sorted
+            index_shard = partial(
+                _index_shard, positional=self._positional, analyzer=self._analyzer, profile=self._sink is not None
+            )
+            for shard_number, (partial_index, partial_frequencies, partial_positions, doc_ids, doc_lengths, records) in (
+                enumerate(executor.map(index_shard, shards), start=1)
+            ):
+                self.__merge_partial_index(
+                    partial_index, partial_frequencies, partial_positions, doc_ids, doc_lengths,
+                    self._inverted_index, self._frequency_index, self._positional_index
+                )
+                # Worker records (per zip of the shard) are emitted here, the sink lives in this process
+                for record in records:
+                    self._sink({**record, "shard": shard_number})
+                logger.info("Merged shard %d/%d", shard_number, len(shards))
+
+    @staticmethod
+    def _plan_shards(data_dir: str, n_shards: int) -> list[list[tuple[str, list[str]]]]:
+        """Split all zip members (in serial build order) into contiguous, size-balanced shards.
+
+        Shard k ends at the member boundary closest to k / n_shards of the total size, and every
+        shard gets at least one member: min(n_shards, number of members) shards.
+        """
+        members = []  # [(zip_path, file_name, uncompressed_size), ...]
+        for zip_name in os.listdir(data_dir):
+            zip_path = os.path.join(data_dir, zip_name)
+            with zipfile.ZipFile(zip_path, 'r') as zip_ref:
+                for info in zip_ref.infolist():
+                    members.append((zip_path, info.filename, info.file_size))
+
+        n_shards = min(max(1, n_shards), len(members))
+        # Size before each member boundary (empty members: balance by count)
+        sizes = [size for _, _, size in members] if any(size for _, _, size in members) else [1] * len(members)
+        prefix = list(accumulate(sizes, initial=0))
+        total_size = prefix[-1]
+
+        cuts = [0]
+        for k in range(1, n_shards):
+            target = total_size * k / n_shards
+            cut = bisect_left(prefix, target)
+            if cut > 0 and target - prefix[cut - 1] <= prefix[cut] - target:
+                cut -= 1
+            # Leave at least one member for this shard and each one after it
+            cuts.append(min(max(cut, cuts[-1] + 1), len(members) - (n_shards - k)))
+        cuts.append(len(members))
+
+        shards = []
+        for start, end in zip(cuts, cuts[1:]):
+            shard = []  # [(zip_path, [file_name, ...]), ...]
+            for zip_path, file_name, _ in members[start:end]:
+                # Group consecutive members of the same zip so a worker opens it once
+                if shard and shard[-1][0] == zip_path:
+                    shard[-1][1].append(file_name)
+                else:
+                    shard.append((zip_path, [file_name]))
+            shards.append(shard)
+        return shards
+
+    def __merge_partial_index(
+        self,
+        partial_index: dict[str, PostingsList],
+        partial_frequencies: dict[str, FrequencyList],
+        partial_positions: dict[str, PositionsList],
+        doc_ids: DocTable,
+        doc_lengths: array,
+        inverted_index: dict[str, PostingsList],
+        frequency_index: dict[str, FrequencyList],
+        positional_index: dict[str, PositionsList]
+        ) -> None:
+        """Append a partial index with local doc IDs 1..n after the documents indexed so far."""
+        offset = self._next_internal_doc_id - 1
+
+        self._doc_table.extend(doc_ids)
+        self._next_internal_doc_id += len(doc_ids)
+        self._doc_lengths.extend(doc_lengths[1:])
+
+        # A loaded index counts its statistics on first use: before the new documents are in the lists
+        statistics = self.get_statistics()
+
+        # Local IDs are shifted past all earlier shards, so appending keeps the lists sorted
+        for term, postings_list in partial_index.items():
+            if term not in inverted_index:
+                inverted_index[term] = PostingsList()
+            inverted_index[term].concat(postings_list, offset)
+
+        # Frequencies and positions are per document, no renumbering needed
+        for term, frequency_list in partial_frequencies.items():
+            if term not in frequency_index:
+                frequency_index[term] = FrequencyList()
+            frequency_index[term].concat(frequency_list)
+
+        # Positions are relative to their document, no renumbering needed
+        for term, positions_list in partial_positions.items():
+            if term not in positional_index:
+                positional_index[term] = PositionsList()
+            positional_index[term].concat(positions_list)
+
+        # Counted once the lists hold the new documents (document frequencies are read from them)
+        statistics.add_terms(document_frequencies(partial_index))
+        statistics.add_documents(doc_lengths[1:])
+
+    def __update_doc_id_map(self, original_doc_id: Optional[str]) -> int:
+        """Map original AP doc ID to internal numeric ID."""
+        if original_doc_id is None:
+            raise ValueError("Missing <DOCNO> tag in document.")
+
+        assigned_id = self._doc_table.append(original_doc_id)
+        self._next_internal_doc_id += 1
+        return assigned_id
+
+    def __update_inverted_index(self, tokens: list[str], internal_id: int) -> None:
+        """Insert terms into inverted index and update posting lists."""
+        if self._positional:
+            self.__update_positional_index(tokens, internal_id)
+            return
+
+        # {'term': frequency in the document, ...} - one posting per distinct term
+        term_frequencies = Counter(tokens)
+
+        buffered_postings = self._buffered_postings
+        for term, frequency in term_frequencies.items():
+            buffers = buffered_postings.get(term)
+            if buffers is None:
+                buffered_postings[term] = (array("I", [internal_id]), array("I", [frequency]))
+            else:
+                buffers[0].append(internal_id)
+                buffers[1].append(frequency)
+
+        self._n_buffered += len(term_frequencies)
+        self._n_postings += len(term_frequencies)
+
+    def __update_positional_index(self, tokens: list[str], internal_id: int) -> None:
+        """Insert terms with their positions in the document (token offsets)."""
+        # {'term': [position_1, position_2,...], ...} in order of first occurrence
+        term_positions: dict[str, list[int]] = {}
+        for position, term in enumerate(tokens):
+            if term in term_positions:
+                term_positions[term].append(position)
+            else:
+                term_positions[term] = [position]
+
+        buffered_postings = self._buffered_postings
+        for term, positions in term_positions.items():
+            buffers = buffered_postings.get(term)
+            if buffers is None:
+                buffered_postings[term] = (array("I", [internal_id]), array("I", [len(positions)]))
+            else:
+                buffers[0].append(internal_id)
+                buffers[1].append(len(positions))
+            if term not in self._positional_index:
+                self._positional_index[term] = PositionsList()
+            self._positional_index[term].append(positions)
+
+        self._n_buffered += len(term_positions)
+        self._n_postings += len(term_positions) + len(tokens)
+
+    def _flush_postings(self) -> None:
+        """Encode the buffered postings into the posting lists and count them in the statistics.
+
+        Called when the buffer is full and after the last _index_zip() call of a build.
+        """
+        for term, (doc_ids, frequencies) in self._buffered_postings.items():
+            postings = self._inverted_index.get(term)
+            if postings is None:
+                self._inverted_index[term] = PostingsList(doc_ids)
+                self._frequency_index[term] = FrequencyList(frequencies)
+            else:
+                postings.extend(doc_ids)
+                self._frequency_index[term].extend(frequencies)
+
+        statistics = self.get_statistics()
+        statistics.add_terms((term, len(doc_ids)) for term, (doc_ids, _) in self._buffered_postings.items())
+        statistics.add_documents(self._pending_lengths)
+        self._buffered_postings = {}
+        self._n_buffered = 0
+        self._pending_lengths = []
+
+    def add_documents(self, zip_path: str, file_names: Optional[list[str]] = None) -> int:
+        """Index the documents of a zip (all members by default) into the delta segment, return how many."""
+        # Index with local IDs first, so queries never see a half-indexed document
+        partial_index = InvertedIndex(self._positional, self._analyzer, self._sink)
+        partial_index._index_zip(zip_path, file_names)
+        partial_index._flush_postings()
+        doc_ids = partial_index.get_doc_id_map()
+
+        with self._lock:
+            self.__ensure_mutable_doc_lengths()
+            self.__merge_partial_index(
+                partial_index.get_index(), partial_index.get_frequency_index(), partial_index.get_positional_index(),
+                doc_ids, partial_index.get_doc_lengths(),
+                self._delta_index, self._delta_frequency_index, self._delta_positional_index
+            )
+            self.__invalidate_views()
+
+        self.__notify_listeners()
+        return len(doc_ids)
+
+    def delete_documents(self, original_doc_ids: Iterable[str]) -> int:
+        """Hide documents (by original AP doc ID) from queries, return how many were newly deleted."""
+        with self._lock:
+            deleted_count = 0
+            for internal_id in self._doc_table.to_internal(original_doc_ids):
+                if internal_id is not None and self._deleted.add(internal_id):
+                    deleted_count += 1
+
+            if deleted_count:
+                self.get_statistics().mark_deleted(deleted_count)
+                self.__invalidate_views()
+
+        if deleted_count:
+            self.__notify_listeners()
+        return deleted_count
+
+    def compact(self, background: bool = False) -> Optional[threading.Thread]:
+        """Fold the delta segment into the base and drop deleted documents.
+
+        With background=True the work runs in a (returned) thread; queries and updates keep
+        using the old segments until the new base is swapped in.
+        """
+        if background:
+            thread = threading.Thread(target=self.compact, name="index-compaction", daemon=True)
+            thread.start()
+            return thread
+
+        # One compaction at a time
+        with self._compact_lock:
+            with self._lock:
+                if not self.__has_updates():
+                    return None
+                # Freeze the current delta, documents added from now on go to a fresh one
+                self._frozen_deltas.append((self._delta_index, self._delta_frequency_index, self._delta_positional_index))
+                self._delta_index = {}
+                self._delta_frequency_index = {}
+                self._delta_positional_index = {}
+                frozen_count = len(self._frozen_deltas)
+                frozen_next_id = self._next_internal_doc_id
+                view, frequency_view, positional_view = self.__build_views(self._frozen_deltas, self._deleted.copy())
+
+            base_index, base_frequency_index, base_positional_index = compact_segments(
+                view, frequency_view, positional_view
+            )
+            n_docs = self._next_internal_doc_id - 1
+            for term, postings in base_index.items():
+                base_index[term] = optimize_postings(postings, n_docs)
+
+            applied = view._deleted
+            doc_lengths = [
+                length for internal_id, length in enumerate(self._doc_lengths[:frozen_next_id])
+                if internal_id and internal_id not in applied
+            ]
+
+            with self._lock:
+                self._inverted_index = base_index
+                self._frequency_index = base_frequency_index
+                if self._positional:
+                    self._positional_index = base_positional_index
+                del self._frozen_deltas[:frozen_count]
+
+                # Deleted documents are gone from the postings now, forget them
+                self._doc_table.forget(applied)
+                self._deleted.difference_update(applied)
+
+                # Recount the statistics without the deleted documents, documents added / deleted
+                # while compacting are in the new delta / bitmap
+                doc_lengths += self._doc_lengths[frozen_next_id:]
+                statistics = IndexStatistics.from_index(self, doc_lengths)
+                statistics.mark_deleted(len(self._deleted))
+                self._statistics = statistics
+                self.__invalidate_views()
+
+        return None
+
+    def add_listener(self, callback: Callable[[], None]) -> None:
+        """Call callback() after each build, addition or deletion of documents."""
+        self._listeners.append(callback)
+
+    def remove_listener(self, callback: Callable[[], None]) -> None:
+        self._listeners.remove(callback)
+
+    def __notify_listeners(self) -> None:
+        # New terms may have been indexed, the term dictionary is rebuilt on next use
+        self._term_dictionary = None
+        # Compaction only changes the representation, query results stay the same
+        for callback in self._listeners:
+            callback()
+
+    def __optimize_postings(self) -> None:
+        """Switch dense posting lists to bitmaps once the collection size is known."""
+        n_docs = self._next_internal_doc_id - 1
+        for term, postings in self._inverted_index.items():
+            self._inverted_index[term] = optimize_postings(postings, n_docs)
+
+    def __expand_bitmaps(self) -> None:
+        """Turn bitmaps back into appendable posting lists."""
+        for term, postings in self._inverted_index.items():
+            if isinstance(postings, BitmapPostings):
+                self._inverted_index[term] = PostingsList(postings)
+
+    def __has_updates(self) -> bool:
+        return bool(self._delta_index or self._frozen_deltas or self._deleted)
+
+    def __build_views(
+        self,
+        deltas: list[tuple[dict[str, PostingsList], dict[str, FrequencyList], dict[str, PositionsList]]],
+        deleted: DeletionBitmap
+        ) -> tuple[SegmentedIndexView, SegmentedPositionalView, Optional[SegmentedPositionalView]]:
+        """base + deltas - deleted views (positional one only for a positional index)."""
+        view = SegmentedIndexView(self._inverted_index, [delta for delta, _, _ in deltas], deleted)
+        frequency_view = SegmentedPositionalView(
+            view, self._frequency_index, [delta_frequencies for _, delta_frequencies, _ in deltas], FrequencyList
+        )
+        positional_view = None
+        if self._positional:
+            positional_view = SegmentedPositionalView(
+                view, self._positional_index, [delta_positions for _, _, delta_positions in deltas]
+            )
+        return view, frequency_view, positional_view
+
+    def __invalidate_views(self) -> None:
+        self._view = None
+        self._frequency_view = None
+        self._positional_view = None
+
+    def __ensure_mutable_doc_lengths(self) -> None:
+        """Memory-mapped doc lengths are read-only, copy them before adding documents."""
+        if not isinstance(self._doc_lengths, array):
+            self._doc_lengths = array("I", self._doc_lengths)
+
+    def save(self, index_path: str) -> None:
+        """Serialize the index (sorted term dictionary, postings, doc ID map) to a binary file."""
+        # Pending additions / deletions are folded in first
+        self.compact()
+        write_index(
+            index_path, self._inverted_index, self._frequency_index, self._doc_table, self._doc_lengths,
+            self._positional_index, {"analyzer": self._analyzer.config()}
+        )
+
+    @classmethod
+    def load(cls, index_path: str) -> "InvertedIndex":
+        """Memory-map a saved index, posting lists are decoded lazily on first access."""
+        (inverted_index, frequency_index, positional_index,
+         doc_table, doc_lengths, config) = load_index(index_path)
+        index = cls(analyzer=Analyzer(**config["analyzer"]))
+        index._inverted_index, index._frequency_index = inverted_index, frequency_index
+        index._doc_table, index._doc_lengths = doc_table, doc_lengths
+        if positional_index is not None:
+            index._positional = True
+            index._positional_index = positional_index
+        index._next_internal_doc_id = len(index._doc_table) + 1
+        index._statistics = None
+        return index
+
+    def get_index(self) -> dict[str, PostingsList]:
+        """Return the inverted index (a base + delta - deleted view while updates are pending)."""
+        with self._lock:
+            if not self.__has_updates():
+                return self._inverted_index
+            if self._view is None:
+                deltas = self._frozen_deltas + [
+                    (self._delta_index, self._delta_frequency_index, self._delta_positional_index)
+                ]
+                self._view, self._frequency_view, self._positional_view = self.__build_views(
+                    deltas, self._deleted.copy()
+                )
+            return self._view
+
+    def get_positional_index(self) -> dict[str, PositionsList]:
+        """Return term -> positions lists (empty unless built with positional=True)."""
+        if not self._positional:
+            return self._positional_index
+        view = self.get_index()
+        with self._lock:
+            if view is self._view and self._positional_view is not None:
+                return self._positional_view
+            return self._positional_index
+
+    def get_frequency_index(self) -> dict[str, FrequencyList]:
+        """Return term -> frequency lists, aligned with the posting lists of get_index()."""
+        view = self.get_index()
+        with self._lock:
+            if view is self._view and self._frequency_view is not None:
+                return self._frequency_view
+            return self._frequency_index
+
+    def get_doc_lengths(self) -> array:
+        """Return the number of tokens of each document, indexed by internal ID."""
+        return self._doc_lengths
+
+    def get_analyzer(self) -> Analyzer:
+        """Return the analyzer the index was built with (for query parsing)."""
+        return self._analyzer
+
+    def get_doc_id_map(self) -> DocTable:
+        """Return internal -> original document ID mapping (DocTable.to_original / to_internal for bulk lookups)."""
+        return self._doc_table
+
+    def get_term_dictionary(self, kgrams: bool = False) -> TermDictionary:
+        """Return the sorted term dictionary (with a k-gram index for infix wildcards if kgrams)."""
+        term_dictionary = self._term_dictionary
+        if term_dictionary is None or (kgrams and not term_dictionary.has_kgrams):
+            term_dictionary = self._term_dictionary = TermDictionary(self.get_index(), kgrams)
+        return term_dictionary
+
+    def get_statistics(self) -> IndexStatistics:
+        """Return the collection statistics (counted from the index file on first use after load())."""
+        if self._statistics is None:
+            self._statistics = IndexStatistics.from_index(self, self._doc_lengths[1:])
+        return self._statistics
+
+    def document_frequency(self, term: str) -> int:
+        """Number of documents containing a term (deleted ones included until compaction)."""
+        # Called for every term of every indexed batch: dict lookups first, no delta lists while there are none
+        inverted_index = self._inverted_index
+        if isinstance(inverted_index, dict):
+            postings = inverted_index.get(term)
+            frequency = 0 if postings is None else len(postings)
+        else:
+            frequency = document_frequency(inverted_index, term)
+        if self._delta_index or self._frozen_deltas:
+            for delta_index in self.__delta_indexes():
+                postings = delta_index.get(term)
+                if postings is not None:
+                    frequency += len(postings)
+        return frequency
+
+    def document_frequencies(self) -> Iterator[tuple[str, int]]:
+        """(term, document frequency) of every term, read from the posting list lengths."""
+        delta_indexes = [delta_index for delta_index in self.__delta_indexes() if delta_index]
+        inverted_index = self._inverted_index
+        if not delta_indexes:
+            if isinstance(inverted_index, dict):
+                # A snapshot of the terms: indexing may add terms while this is consumed
+                return ((term, len(inverted_index[term])) for term in list(inverted_index))
+            return document_frequencies(inverted_index)
+
+        frequencies = Counter(dict(document_frequencies(inverted_index)))
+        for delta_index in delta_indexes:
+            frequencies.update(dict(document_frequencies(delta_index)))
+        return iter(frequencies.items())
+
+    def __delta_indexes(self) -> list[dict[str, PostingsList]]:
+        # No lock: also called by the statistics while an update holds it
+        return [delta_index for delta_index, _, _ in self._frozen_deltas] + [self._delta_index]
+
+    def sort_docs_frequency(self) -> None:
+        """Kept for compatibility: the statistics are maintained while indexing."""
+        self.get_statistics()
+
+    def get_top_10_terms(self) -> list[tuple[str, int]]:
+        """Return the top 10 highest-frequency terms."""
+        return self.get_statistics().top_terms(10)
+
+    def get_lowest_10_terms(self) -> list[tuple[str, int]]:
+        """Return the lowest 10 frequency terms (highest of them first)."""
+        return self.get_statistics().bottom_terms(10)[::-1]
+
+    def find_similar_terms(self) -> dict | None:
+        """Find two alphabetic terms sharing the same postings list."""
+        # Terms with 20-100 documents (more meaningful results), compared by postings fingerprint
+        pair = next(self.get_statistics().duplicate_terms(self.get_index(), min_df=20, max_df=100), None)
+
+        # If no pair found
+        if pair is None:
+            return None
+
+        internal_ids = self.get_index()[pair[1]].to_list()
+        original_ids = self._doc_table.to_original(internal_ids)
+        return {
+            "terms": pair,
+            "internal_ids": internal_ids,
+            "original_ids": original_ids
+        }
+
+    def find_near_duplicate_terms(self, threshold: float = 0.8) -> list[tuple[str, str, float]]:
+        """Pairs of alphabetic terms whose postings lists overlap by Jaccard >= threshold, most similar first."""
+        return self.get_statistics().near_duplicate_terms(self.get_index(), threshold)
+
+
+def _index_shard(
+    shard: list[tuple[str, list[str]]],
+    positional: bool = False,
+    analyzer: Optional[Analyzer] = None,
+    profile: bool = False
+    ) -> tuple[dict[str, PostingsList], dict[str, FrequencyList], dict[str, PositionsList], DocTable, array, list[dict]]:
+    """Worker: index a shard of zip members into a partial index with local doc IDs (+ instrumentation records)."""
+    records = []
+    partial_index = InvertedIndex(positional, analyzer, records.append if profile else None)
+    for zip_path, file_names in shard:
+        partial_index._index_zip(zip_path, file_names)
+    partial_index._flush_postings()
+
+    # Local doc IDs are 1..n in insertion order, the doc table is appended as a whole (and pickled as two buffers)
+    return (
+        partial_index.get_index(),
+        partial_index.get_frequency_index(),
+        partial_index.get_positional_index(),
+        partial_index.get_doc_id_map(),
+        partial_index.get_doc_lengths(),
+        records
+    )
+
+
+def _timed_iterator(iterator: Iterator[tuple], timings: list[float]) -> Iterator[tuple]:
+    """Yield the items of an iterator, adding the time spent producing them to timings[0]."""
+    while True:
+        start = time.perf_counter()
+        item = next(iterator, None)
+        timings[0] += time.perf_counter() - start
+        if item is None:
+            return
+        yield item
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+
+    # Load a saved index, or build inverted index and save it for the next run
+    index_path = "index.bin"
+    if os.path.exists(index_path):
+        index = InvertedIndex.load(index_path)
+    else:
+        index = InvertedIndex()
+        index.build_index(workers=os.cpu_count())
+        index.save(index_path)
+
+    # Retrieve data structures
+    revert_index = index.get_index()
+    doc_mapper = index.get_doc_id_map()
+
+    # Print first 10 terms for inspection
+    first_keys = list(revert_index.keys())[:10]
+    for key in first_keys:
+        values = revert_index[key]
+        print(key, values.to_list()[:10])
+
+    # Collection statistics
+    print(index.get_statistics().summary())
+    print(index.get_top_10_terms())
+    print(index.get_lowest_10_terms())
+
+    # Similar term detection
+    print(index.find_similar_terms())
@@ -0,0 +1,124 @@
+from typing import Sequence
+
+from postingsList import BitmapPostings, PostingsList
+
+try:
+    import numpy as np
+except ImportError:  # optional dependency, BooleanRetrieval falls back to pure Python
+    np = None
+
+
+def numpy_available() -> bool:
+    """Whether NumPy can be imported."""
+    return np is not None
+
+
+def to_array(postings: Sequence[int]) -> "np.ndarray":
+    """Decode postings into a sorted numpy.int32 array (vectorized for compressed lists and bitmaps)."""
+    if isinstance(postings, np.ndarray):
+        return postings
+
+    if isinstance(postings, PostingsList):
+        raw = np.frombuffer(postings._data, dtype=np.uint8)
+        if not len(raw):
+            return np.empty(0, dtype=np.int32)
+        # A varbyte code ends at a byte without the high bit, the next code starts right after
+        ends = raw < 0x80
+        starts = np.flatnonzero(np.concatenate(([True], ends[:-1])))
+        code = np.cumsum(ends) - ends  # code number of each byte
+        shift = 7 * (np.arange(len(raw)) - starts[code])
+        gaps = np.add.reduceat((raw & 0x7F).astype(np.int64) << shift, starts)
+        return np.cumsum(gaps).astype(np.int32)
+
+    if isinstance(postings, BitmapPostings):
+        # Bit i of the little-endian bitmap is doc ID i
+        bits = np.unpackbits(np.frombuffer(postings.to_bytes(), dtype=np.uint8), bitorder="little")
+        return np.flatnonzero(bits).astype(np.int32)
+
+    return np.asarray(postings, dtype=np.int32)
+
+
+class NumpyBackend:
+    """
+    Posting lists as sorted numpy.int32 arrays with vectorized AND / OR / AND-NOT
+    A term's list is decoded once and kept until queries run on another index mapping.
+    """
+    def __init__(self):
+        if np is None:
+            raise ImportError("The numpy backend needs NumPy installed.")
+        # The index mapping the decoded arrays belong to
+        self._source: object | None = None
+        # {'term': np.ndarray([internal_id_1, internal_id_5,...]), ...}
+        self._arrays: dict[str, np.ndarray] = {}
+
+    def check_source(self, inverted_index: object) -> None:
+        """Drop decoded arrays if queries now run on a different (reloaded or updated) index mapping."""
+        if inverted_index is not self._source:
+            self._arrays = {}
+            self._source = inverted_index
+
+    def postings(self, term: str, inverted_index: dict[str, PostingsList]) -> "np.ndarray | BitmapPostings":
+        """The term's posting list as an array (empty if the term is unknown).
+
+        Bitmaps are returned as they are: bitmap x bitmap operations are faster on big-int words,
+        and decoding one for an operation with an array is a cheap np.unpackbits.
+        """
+        array = self._arrays.get(term)
+        if array is None:
+            postings = inverted_index.get(term, ())
+            if isinstance(postings, BitmapPostings):
+                return postings
+            array = to_array(postings)
+            self._arrays[term] = array
+        return array
+
+    @staticmethod
+    def intersect(r1: Sequence[int], r2: Sequence[int], search: bool = False) -> "np.ndarray":
+        """r1 AND r2 - with search=True each doc ID of the shorter list is binary searched in the longer one."""
+        a1, a2 = to_array(r1), to_array(r2)
+        if search:
+            short, long = (a1, a2) if len(a1) <= len(a2) else (a2, a1)
+            return short[_member_mask(short, long)]
+        return np.intersect1d(a1, a2, assume_unique=True)
+
+    @staticmethod
+    def union(r1: Sequence[int], r2: Sequence[int]) -> "np.ndarray":
+        """r1 OR r2"""
+        # Both inputs are sorted runs: a stable sort merges them, then drop adjacent duplicates
+        # (much cheaper than np.union1d, which sorts via np.unique)
+        merged = np.concatenate((to_array(r1), to_array(r2)))
+        merged.sort(kind="stable")
+        if len(merged) < 2:
+            return merged
+        return merged[np.concatenate(([True], merged[1:] != merged[:-1]))]
+
+    @staticmethod
+    def union_many(results: Sequence[Sequence[int]]) -> "np.ndarray":
+        """OR of many lists in one sort"""
+        merged = np.concatenate([to_array(result) for result in results])
+        merged.sort(kind="stable")
+        if len(merged) < 2:
+            return merged
+        return merged[np.concatenate(([True], merged[1:] != merged[:-1]))]
+
+    @staticmethod
+    def difference(r1: Sequence[int], r2: Sequence[int], search: bool = False) -> "np.ndarray":
+        """r1 AND NOT r2 - with search=True each doc ID of r1 is binary searched in r2."""
+        a1, a2 = to_array(r1), to_array(r2)
+        if search:
+            return a1[~_member_mask(a1, a2)]
+        return np.setdiff1d(a1, a2, assume_unique=True)
+
+    @staticmethod
+    def to_list(result: Sequence[int]) -> list[int]:
+        """Result doc IDs as a list of Python ints."""
+        return to_array(result).tolist()
+
+
+def _member_mask(values: "np.ndarray", sorted_array: "np.ndarray") -> "np.ndarray":
+    """Boolean mask of the values present in sorted_array (searchsorted membership)."""
+    if not len(sorted_array):
+        return np.zeros(len(values), dtype=bool)
+    positions = np.searchsorted(sorted_array, values)
+    positions[positions == len(sorted_array)] = 0
+    return sorted_array[positions] == values
@@ -0,0 +1,566 @@
+from array import array
+from bisect import bisect_left
+from itertools import chain
+from operator import sub
+from typing import Iterable, Iterator, Optional, Sequence
+
+# A skip pointer is recorded every SKIP_INTERVAL postings
+SKIP_INTERVAL = 64
+# Terms in at least 1 / BITMAP_DENSITY of the documents are stored as bitmaps
+# (the bitmap then takes at most ~2 bytes per posting, about the size of the varbyte list)
+BITMAP_DENSITY = 16
+# Set bit numbers of every byte value, for iterating a bitmap byte by byte
+_BYTE_BITS = tuple(tuple(bit for bit in range(8) if byte & (1 << bit)) for byte in range(256))
+# Variable-byte codes of the values below 2^14 (1 or 2 bytes), so a block of small gaps is encoded by a join
+_SHORT_CODES = tuple(
+    bytes([value]) if value < 0x80 else bytes([(value & 0x7F) | 0x80, value >> 7]) for value in range(1 << 14)
+)
+
+
+def encode_varbyte(value: int, out: bytearray) -> None:
+    """Append a non-negative int as variable-byte code (7 bits per byte, high bit = more bytes)."""
+    while value >= 0x80:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def decode_varbyte(data, pos: int) -> tuple[int, int]:
+    """Decode one variable-byte code starting at pos, return (value, next_pos)."""
+    value = 0
+    shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        value |= (byte & 0x7F) << shift
+        if not byte & 0x80:
+            return value, pos
+        shift += 7
+
+
+class PostingsList:
+    """
+    Sorted posting list of internal doc IDs, stored as delta (gap) + variable-byte codes
+    Memory: ~1-2 bytes per posting instead of a Python list slot + int object
+    Skip pointers (every SKIP_INTERVAL postings) let a cursor jump over whole blocks
+    """
+    __slots__ = ("_data", "_length", "_last_id", "_skip_ids", "_skip_offsets", "_skip_indexes")
+
+    def __init__(self, doc_ids: Iterable[int] = ()):
+        # Encoded gaps between consecutive doc IDs (the first gap is from 0)
+        self._data = bytearray()
+        # Number of postings stored
+        self._length: int = 0
+        # Last doc ID appended, the base for the next gap
+        self._last_id: int = 0
+        # Skip pointers - skip_ids[k] is the doc ID just before a block, skip_offsets[k] the block's
+        # byte offset in _data and skip_indexes[k] the number of postings before the block
+        # (created on the first skip, most lists are too short to need one)
+        self._skip_ids: Optional[Sequence[int]] = None
+        self._skip_offsets: Optional[Sequence[int]] = None
+        self._skip_indexes: Optional[Sequence[int]] = None
+        self.extend(doc_ids)
+
+    @classmethod
+    def from_buffer(
+        cls,
+        data,
+        length: int,
+        last_id: int,
+        skip_ids: Optional[Sequence[int]] = None,
+        skip_offsets: Optional[Sequence[int]] = None,
+        skip_indexes: Optional[Sequence[int]] = None
+        ) -> "PostingsList":
+        """Wrap already encoded postings (e.g. a memoryview into a mapped index file) without copying."""
+        postings = cls()
+        postings._data = data
+        postings._length = length
+        postings._last_id = last_id
+        if skip_ids:
+            postings._skip_ids = skip_ids
+            postings._skip_offsets = skip_offsets
+            postings._skip_indexes = skip_indexes
+        return postings
+
+    def owned(self) -> "PostingsList":
+        """This list if it owns its buffers, else a copy (e.g. of a list read from a mapped index file)."""
+        if isinstance(self._data, bytearray):
+            return self
+        skip_ids, skip_offsets, skip_indexes = self.skip_pointers()
+        return PostingsList.from_buffer(
+            bytearray(self._data), self._length, self._last_id,
+            array("I", skip_ids), array("I", skip_offsets), array("I", skip_indexes)
+        )
+
+    def append(self, doc_id: int) -> None:
+        """Append a doc ID, must be greater than the last one."""
+        if doc_id <= self._last_id and self._length:
+            raise ValueError(f"Doc ID {doc_id} is not greater than last doc ID {self._last_id}.")
+
+        if self._length and self._length % SKIP_INTERVAL == 0:
+            self.__add_skip(self._last_id, len(self._data), self._length)
+
+        encode_varbyte(doc_id - self._last_id, self._data)
+        self._last_id = doc_id
+        self._length += 1
+
+    def extend(self, doc_ids: Iterable[int]) -> None:
+        """Append sorted doc IDs, encoded a skip block at a time (bulk appends, e.g. buffered build postings)."""
+        doc_ids = doc_ids if isinstance(doc_ids, (array, list)) else list(doc_ids)
+        if not doc_ids:
+            return
+        # gaps[i] = doc_ids[i] - the doc ID before it
+        gaps = list(map(sub, doc_ids, chain((self._last_id,), doc_ids)))
+        if (self._length and gaps[0] <= 0) or min(gaps[1:], default=1) <= 0:
+            raise ValueError(f"Doc IDs must be sorted and greater than last doc ID {self._last_id}.")
+
+        data = self._data
+        start = 0
+        while start < len(gaps):
+            if self._length and self._length % SKIP_INTERVAL == 0:
+                self.__add_skip(self._last_id, len(data), self._length)
+            end = min(len(gaps), start + SKIP_INTERVAL - self._length % SKIP_INTERVAL)
+            block = gaps[start:end]
+            largest = max(block)
+            if largest < 0x80:
+                data += bytes(block)  # one byte per gap
+            elif largest < 1 << 14:
+                data += b"".join(map(_SHORT_CODES.__getitem__, block))
+            else:
+                for gap in block:
+                    encode_varbyte(gap, data)
+            self._length += end - start
+            self._last_id = doc_ids[end - 1]
+            start = end
+
+    def concat(self, other: "PostingsList", offset: int = 0) -> None:
+        """Append another postings list with its doc IDs shifted by offset."""
+        if not other._length:
+            return
+
+        # Only the first gap depends on what precedes it, the rest is copied as-is
+        index_base = self._length
+        first_id, first_end = decode_varbyte(other._data, 0)
+        self.append(first_id + offset)
+        base = len(self._data) - first_end
+        self._data += memoryview(other._data)[first_end:]
+
+        # The other list's skips keep pointing at the same postings, shifted by the concat
+        if other._skip_ids:
+            for skip_id, skip_offset, skip_index in zip(other._skip_ids, other._skip_offsets, other._skip_indexes):
+                self.__add_skip(skip_id + offset, skip_offset + base, skip_index + index_base)
+        self._length += other._length - 1
+        self._last_id = other._last_id + offset
+
+    def __add_skip(self, skip_id: int, skip_offset: int, skip_index: int) -> None:
+        if self._skip_ids is None:
+            self._skip_ids = array("I")
+            self._skip_offsets = array("I")
+            self._skip_indexes = array("I")
+        self._skip_ids.append(skip_id)
+        self._skip_offsets.append(skip_offset)
+        self._skip_indexes.append(skip_index)
+
+    def __iter__(self) -> Iterator[int]:
+        """Decode doc IDs lazily in ascending order."""
+        doc_id = 0
+        gap = 0
+        shift = 0
+        for byte in self._data:
+            if byte & 0x80:
+                gap |= (byte & 0x7F) << shift
+                shift += 7
+            else:
+                doc_id += gap | (byte << shift)
+                yield doc_id
+                gap = 0
+                shift = 0
+
+    def __len__(self) -> int:
+        return self._length
+
+    def __repr__(self) -> str:
+        return f"PostingsList(len={self._length}, nbytes={self.nbytes})"
+
+    @property
+    def last_id(self) -> int:
+        """Largest doc ID in the list (0 when empty)."""
+        return self._last_id
+
+    @property
+    def nbytes(self) -> int:
+        """Size of the encoded postings in bytes."""
+        return len(self._data)
+
+    def to_list(self) -> list[int]:
+        """Decode all doc IDs into a list."""
+        return list(self)
+
+    def to_bytes(self) -> bytes:
+        """Return the encoded postings (equal lists have equal encodings)."""
+        return bytes(self._data)
+
+    def skip_pointers(self) -> tuple[Sequence[int], Sequence[int], Sequence[int]]:
+        """Return (skip_ids, skip_offsets, skip_indexes)."""
+        if self._skip_ids is None:
+            return (), (), ()
+        return self._skip_ids, self._skip_offsets, self._skip_indexes
+
+    def cursor(self) -> "PostingsCursor":
+        """Return a forward-only cursor supporting skip-ahead."""
+        return PostingsCursor(self)
+
+
+class PostingsCursor:
+    """Forward-only cursor over a PostingsList, advance() jumps whole blocks via skip pointers."""
+    __slots__ = ("_data", "_skip_ids", "_skip_offsets", "_skip_indexes", "_skip_lo", "_pos", "_doc_id", "_index", "_exhausted")
+
+    def __init__(self, postings: PostingsList):
+        self._data = postings._data
+        self._skip_ids, self._skip_offsets, self._skip_indexes = postings.skip_pointers()
+        # First skip pointer that may still be ahead of the cursor
+        self._skip_lo = 0
+        # Byte offset of the next encoded gap
+        self._pos = 0
+        # Last decoded doc ID (0 before the first one) and its position in the list
+        self._doc_id = 0
+        self._index = -1
+        self._exhausted = False
+
+    @property
+    def index(self) -> int:
+        """Position of the current doc ID in the list (e.g. to look up its term frequency)."""
+        return self._index
+
+    def advance(self, target: int) -> Optional[int]:
+        """Move to the first doc ID >= target (never backwards), None when exhausted."""
+        if self._exhausted:
+            return None
+        if self._index >= 0 and self._doc_id >= target:
+            return self._doc_id  # the current doc ID (none before the first advance)
+
+        # Jump to the last block that starts after a doc ID smaller than target
+        skip_ids = self._skip_ids
+        if skip_ids:
+            k = bisect_left(skip_ids, target, self._skip_lo) - 1
+            if k >= self._skip_lo:
+                self._skip_lo = k + 1
+                if self._skip_offsets[k] > self._pos:
+                    self._pos = self._skip_offsets[k]
+                    self._doc_id = skip_ids[k]
+                    self._index = self._skip_indexes[k] - 1
+
+        # Decode forward inside the block
+        data = self._data
+        pos = self._pos
+        doc_id = self._doc_id
+        index = self._index
+        end = len(data)
+        while pos < end:
+            gap = 0
+            shift = 0
+            while True:
+                byte = data[pos]
+                pos += 1
+                gap |= (byte & 0x7F) << shift
+                if not byte & 0x80:
+                    break
+                shift += 7
+            doc_id += gap
+            index += 1
+            if doc_id >= target:
+                self._pos = pos
+                self._doc_id = doc_id
+                self._index = index
+                return doc_id
+
+        self._pos = end
+        self._exhausted = True
+        return None
+
+
+class BitmapPostings:
+    """
+    Dense posting list as a bitset over internal doc IDs (doc ID i = bit i % 8 of byte i // 8)
+    O(1) membership probes, word-level AND / OR / AND NOT between two bitmaps
+    """
+    __slots__ = ("_bits", "_length")
+
+    def __init__(self, doc_ids: Iterable[int] = ()):
+        bits = bytearray()
+        length = 0
+        for doc_id in doc_ids:
+            byte = doc_id >> 3
+            if byte >= len(bits):
+                bits.extend(bytes(byte - len(bits) + 1))
+            bits[byte] |= 1 << (doc_id & 7)
+            length += 1
+        self._bits = bytes(bits)
+        # Number of set bits (doc IDs)
+        self._length: int = length
+
+    @classmethod
+    def from_buffer(cls, data, length: int) -> "BitmapPostings":
+        """Wrap bitmap bytes (e.g. a memoryview into a mapped index file) without copying."""
+        bitmap = cls()
+        bitmap._bits = data
+        bitmap._length = length
+        return bitmap
+
+    def owned(self) -> "BitmapPostings":
+        """This bitmap if it owns its bytes, else a copy (e.g. of a bitmap read from a mapped index file)."""
+        if isinstance(self._bits, bytes):
+            return self
+        return BitmapPostings.from_buffer(bytes(self._bits), self._length)
+
+    @classmethod
+    def from_int(cls, value: int) -> "BitmapPostings":
+        """Bitmap of the set bits of a Python int."""
+        return cls.from_buffer(value.to_bytes((value.bit_length() + 7) // 8, "little"), value.bit_count())
+
+    def to_int(self) -> int:
+        """The bitmap as a Python int, for word-level operations."""
+        return int.from_bytes(self._bits, "little")
+
+    def __contains__(self, doc_id: int) -> bool:
+        byte = doc_id >> 3
+        return byte < len(self._bits) and bool(self._bits[byte] & (1 << (doc_id & 7)))
+
+    def __iter__(self) -> Iterator[int]:
+        """Set doc IDs in ascending order."""
+        for byte_index, byte in enumerate(self._bits):
+            if byte:
+                base = byte_index << 3
+                for bit in _BYTE_BITS[byte]:
+                    yield base + bit
+
+    def __len__(self) -> int:
+        return self._length
+
+    def __repr__(self) -> str:
+        return f"BitmapPostings(len={self._length}, nbytes={self.nbytes})"
+
+    @property
+    def last_id(self) -> int:
+        """Largest doc ID in the bitmap (0 when empty)."""
+        for byte_index in range(len(self._bits) - 1, -1, -1):
+            if self._bits[byte_index]:
+                return (byte_index << 3) + self._bits[byte_index].bit_length() - 1
+        return 0
+
+    @property
+    def nbytes(self) -> int:
+        """Size of the bitmap in bytes."""
+        return len(self._bits)
+
+    def to_list(self) -> list[int]:
+        """Decode all doc IDs into a list."""
+        return list(self)
+
+    def to_bytes(self) -> bytes:
+        """Return the raw bitmap."""
+        return bytes(self._bits)
+
+    def skip_pointers(self) -> tuple[Sequence[int], Sequence[int], Sequence[int]]:
+        """Bitmaps are random access, no skip pointers."""
+        return (), (), ()
+
+    # Bitmap x bitmap - one big-int operation each
+    def intersection(self, other: "BitmapPostings") -> "BitmapPostings":
+        return BitmapPostings.from_int(self.to_int() & other.to_int())
+
+    def union(self, other: "BitmapPostings") -> "BitmapPostings":
+        return BitmapPostings.from_int(self.to_int() | other.to_int())
+
+    def difference(self, other: "BitmapPostings") -> "BitmapPostings":
+        return BitmapPostings.from_int(self.to_int() & ~other.to_int())
+
+    # Bitmap x sparse list - probe / update one bit per listed doc ID
+    def select(self, doc_ids: Iterable[int], present: bool = True) -> list[int]:
+        """Doc IDs from a sorted list that are (present=True) or are not (present=False) in the bitmap."""
+        bits = self._bits
+        n_bytes = len(bits)
+        selected = []
+        for doc_id in doc_ids:
+            byte = doc_id >> 3
+            if (byte < n_bytes and bits[byte] & (1 << (doc_id & 7)) != 0) == present:
+                selected.append(doc_id)
+        return selected
+
+    def with_ids(self, doc_ids: Iterable[int]) -> "BitmapPostings":
+        """A copy with the given doc IDs added."""
+        bits = bytearray(self._bits)
+        length = self._length
+        for doc_id in doc_ids:
+            byte, mask = doc_id >> 3, 1 << (doc_id & 7)
+            if byte >= len(bits):
+                bits.extend(bytes(byte - len(bits) + 1))
+            if not bits[byte] & mask:
+                bits[byte] |= mask
+                length += 1
+        return BitmapPostings.from_buffer(bytes(bits), length)
+
+    def without_ids(self, doc_ids: Iterable[int]) -> "BitmapPostings":
+        """A copy with the given doc IDs removed."""
+        bits = bytearray(self._bits)
+        length = self._length
+        for doc_id in doc_ids:
+            byte, mask = doc_id >> 3, 1 << (doc_id & 7)
+            if byte < len(bits) and bits[byte] & mask:
+                bits[byte] &= ~mask & 0xFF
+                length -= 1
+        return BitmapPostings.from_buffer(bytes(bits), length)
+
+
+def optimize_postings(postings: PostingsList, n_docs: int) -> "PostingsList | BitmapPostings":
+    """Store a posting list as a bitmap when its term is dense enough."""
+    if isinstance(postings, PostingsList) and len(postings) * BITMAP_DENSITY >= n_docs > 0:
+        return BitmapPostings(postings)
+    return postings
+
+
+class PositionsList:
+    """
+    Term positions of each document in a PostingsList (same order), stored per document as
+    varbyte(count) followed by the delta-encoded positions
+    """
+    __slots__ = ("_data", "_length")
+
+    def __init__(self):
+        self._data = bytearray()
+        # Number of documents stored
+        self._length: int = 0
+
+    @classmethod
+    def from_buffer(cls, data, length: int) -> "PositionsList":
+        """Wrap already encoded positions without copying."""
+        positions = cls()
+        positions._data = data
+        positions._length = length
+        return positions
+
+    def append(self, positions: Sequence[int]) -> None:
+        """Append the ascending positions of the term in the next document."""
+        encode_varbyte(len(positions), self._data)
+        last = 0
+        for position in positions:
+            encode_varbyte(position - last, self._data)
+            last = position
+        self._length += 1
+
+    def concat(self, other: "PositionsList") -> None:
+        """Append the documents of another positions list (positions need no shifting)."""
+        self._data += memoryview(other._data)[:]
+        self._length += other._length
+
+    def __iter__(self) -> Iterator[list[int]]:
+        """Decode the positions list of each document in order."""
+        data = self._data
+        pos = 0
+        for _ in range(self._length):
+            count, pos = decode_varbyte(data, pos)
+            positions = []
+            position = 0
+            for _ in range(count):
+                gap, pos = decode_varbyte(data, pos)
+                position += gap
+                positions.append(position)
+            yield positions
+
+    def __len__(self) -> int:
+        return self._length
+
+    def __repr__(self) -> str:
+        return f"PositionsList(len={self._length}, nbytes={self.nbytes})"
+
+    @property
+    def nbytes(self) -> int:
+        """Size of the encoded positions in bytes."""
+        return len(self._data)
+
+    def to_bytes(self) -> bytes:
+        """Return the encoded positions."""
+        return bytes(self._data)
+
+
+class FrequencyList:
+    """
+    Term frequency of each document in a PostingsList (same order), stored as a fixed-width
+    unsigned array (1, 2 or 4 bytes per document, widened when a larger count arrives)
+    so the frequency of the n-th posting is a direct lookup
+    """
+    __slots__ = ("_data",)
+
+    # Array type codes by increasing width
+    _TYPECODES = ("B", "H", "I")
+
+    def __init__(self, frequencies: Iterable[int] = ()):
+        self._data = array("B")
+        self.extend(frequencies)
+
+    @classmethod
+    def from_buffer(cls, data, length: int) -> "FrequencyList":
+        """Wrap already encoded frequencies (width = nbytes / length) without copying."""
+        frequencies = cls()
+        if length:
+            typecode = {1: "B", 2: "H", 4: "I"}[len(data) // length]
+            frequencies._data = memoryview(data).cast(typecode)
+        return frequencies
+
+    def append(self, frequency: int) -> None:
+        """Append the frequency of the term in the next document."""
+        if frequency >= 1 << (8 * self._data.itemsize):
+            self.__widen(frequency)
+        self._data.append(frequency)
+
+    def extend(self, frequencies: Iterable[int]) -> None:
+        """Append the frequencies of the term in the next documents (widened at most once)."""
+        if not isinstance(frequencies, (array, list)):
+            frequencies = list(frequencies)
+        largest = max(frequencies, default=0)
+        if largest >= 1 << (8 * self._data.itemsize):
+            self.__widen(largest)
+        # array.extend only takes an array of its own type code
+        if isinstance(frequencies, array) and frequencies.typecode != self._data.typecode:
+            frequencies = array(self._data.typecode, frequencies)
+        self._data.extend(frequencies)
+
+    def concat(self, other: "FrequencyList") -> None:
+        """Append the documents of another frequency list."""
+        data = other._data
+        if data.itemsize > self._data.itemsize:
+            largest = max(data, default=0)
+            if largest >= 1 << (8 * self._data.itemsize):
+                self.__widen(largest)
+        # array.extend only takes an array of its own type code
+        if not isinstance(data, array) or data.typecode != self._data.typecode:
+            data = array(self._data.typecode, data)
+        self._data.extend(data)
+
+    def __widen(self, frequency: int) -> None:
+        """Switch to the narrowest array type holding frequency."""
+        for typecode in self._TYPECODES:
+            if frequency < 1 << (8 * array(typecode).itemsize):
+                break
+        self._data = array(typecode, self._data)
+
+    def __getitem__(self, index: int) -> int:
+        return self._data[index]
+
+    def __iter__(self) -> Iterator[int]:
+        return iter(self._data)
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __repr__(self) -> str:
+        return f"FrequencyList(len={len(self._data)}, nbytes={self.nbytes})"
+
+    @property
+    def nbytes(self) -> int:
+        """Size of the stored frequencies in bytes."""
+        return len(self._data) * self._data.itemsize
+
+    def to_bytes(self) -> bytes:
+        """Return the frequencies as little-endian fixed-width integers."""
+        return bytes(self._data)
@@ -0,0 +1,163 @@
+import argparse
+import asyncio
+import json
+import statistics
+import time
+from typing import Optional
+
+from queryServer import DEFAULT_PORT
+
+
+class QueryError(Exception):
+    """The server answered a query with ERR (e.g. a malformed query)."""
+
+
+class QueryClient:
+    """Client of the query server line protocol over one connection (queries can be pipelined)."""
+    def __init__(self, host: str = "127.0.0.1", port: int = DEFAULT_PORT):
+        self.host = host
+        self.port = port
+        self._reader: Optional[asyncio.StreamReader] = None
+        self._writer: Optional[asyncio.StreamWriter] = None
+        # One request / pipeline at a time per connection, so responses match their queries
+        self._lock = asyncio.Lock()
+
+    async def connect(self) -> None:
+        self._reader, self._writer = await asyncio.open_connection(self.host, self.port)
+
+    async def close(self) -> None:
+        if self._writer is not None:
+            self._writer.close()
+            await self._writer.wait_closed()
+            self._writer = None
+
+    async def __aenter__(self) -> "QueryClient":
+        await self.connect()
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.close()
+
+    async def query(self, query: str) -> list[str]:
+        """DOCNOs matching an RPN query (raises QueryError if the server rejects it)."""
+        result = (await self.pipeline([query]))[0]
+        if isinstance(result, QueryError):
+            raise result
+        return result
+
+    async def pipeline(self, queries: list[str]) -> list[list[str] | QueryError]:
+        """Send all queries without waiting, then collect the answers in order (QueryError for failed ones)."""
+        async with self._lock:
+            # Write while reading: a long pipeline would otherwise fill both socket buffers
+            sender = asyncio.create_task(self._send(queries))
+            try:
+                return [await self._read_response() for _ in queries]
+            finally:
+                await sender
+
+    async def _send(self, queries: list[str]) -> None:
+        for query in queries:
+            self._writer.write((" ".join(query.split()) + "\n").encode("utf-8"))
+            await self._writer.drain()
+
+    async def _read_response(self) -> list[str] | QueryError:
+        header = (await self._reader.readline()).decode("utf-8").rstrip("\n")
+        if not header:
+            raise ConnectionError("Connection closed by the server.")
+        if header.startswith("ERR "):
+            return QueryError(header[4:])
+
+        count = int(header.split()[1])
+        doc_ids: list[str] = []
+        # Streamed in chunk lines
+        while len(doc_ids) < count:
+            line = await self._reader.readline()
+            if not line:
+                raise ConnectionError(f"Connection closed after {len(doc_ids)} of {count} doc IDs.")
+            doc_ids.extend(line.decode("utf-8").split())
+        return doc_ids
+
+
+async def load_test(
+    queries: list[str],
+    host: str = "127.0.0.1",
+    port: int = DEFAULT_PORT,
+    connections: int = 8,
+    pipeline: int = 16,
+    repeat: int = 1
+    ) -> dict:
+    """Replay queries over concurrent pipelined connections and report throughput and latency.
+
+    The workload (queries * repeat) is split round-robin between the connections, each sending
+    windows of pipeline queries; a query's latency runs from its window's send to its answer.
+    """
+    workload = queries * repeat
+    latencies: list[float] = []
+    errors = 0
+    doc_ids = 0
+
+    async def run_connection(share: list[str]) -> None:
+        nonlocal errors, doc_ids
+        async with QueryClient(host, port) as client:
+            for start in range(0, len(share), pipeline):
+                window = share[start:start + pipeline]
+                sent = time.perf_counter()
+                sender = asyncio.create_task(client._send(window))
+                for _ in window:
+                    result = await client._read_response()
+                    latencies.append(time.perf_counter() - sent)
+                    if isinstance(result, QueryError):
+                        errors += 1
+                    else:
+                        doc_ids += len(result)
+                await sender
+
+    start = time.perf_counter()
+    await asyncio.gather(*(run_connection(workload[i::connections]) for i in range(connections)))
+    seconds = time.perf_counter() - start
+
+    latencies.sort()
+    millis = [latency * 1000 for latency in latencies] or [0.0]
+    return {
+        "queries": len(workload),
+        "errors": errors,
+        "doc_ids": doc_ids,
+        "connections": connections,
+        "pipeline": pipeline,
+        "seconds": round(seconds, 3),
+        "qps": round(len(workload) / seconds, 1) if seconds else 0.0,
+        "latency_ms": {
+            "p50": round(statistics.median(millis), 3),
+            "p95": round(millis[min(len(millis) - 1, int(len(millis) * 0.95))], 3),
+            "p99": round(millis[min(len(millis) - 1, int(len(millis) * 0.99))], 3),
+            "max": round(millis[-1], 3),
+        },
+    }
+
+
+def main(argv: Optional[list[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Query the index server, or load test it with a query file.")
+    parser.add_argument("query", nargs="?", help="a single RPN query (prints the matching DOCNOs)")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--queries", default="BooleanQueries.txt", help="query file (one RPN query per line)")
+    parser.add_argument("--connections", type=int, default=8)
+    parser.add_argument("--pipeline", type=int, default=16, help="queries in flight per connection")
+    parser.add_argument("--repeat", type=int, default=10, help="times the query file is replayed")
+    args = parser.parse_args(argv)
+
+    if args.query is not None:
+        async def single() -> list[str]:
+            async with QueryClient(args.host, args.port) as client:
+                return await client.query(args.query)
+        print(" ".join(asyncio.run(single())))
+        return
+
+    with open(args.queries, "r", encoding="utf-8") as in_f:
+        queries = [line.strip() for line in in_f if line.strip()]
+    results = asyncio.run(load_test(queries, args.host, args.port, args.connections, args.pipeline, args.repeat))
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
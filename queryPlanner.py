@@ -0,0 +1,202 @@
+import re
+from dataclasses import dataclass
+from typing import Callable, Optional, Union
+
+from termDictionary import is_pattern
+
+
+# Expression tree nodes (immutable and hashable, so equal sub-queries compare equal)
+@dataclass(frozen=True)
+class Term:
+    term: str
+
+
+@dataclass(frozen=True)
+class And:
+    operands: tuple["Node", ...]
+
+
+@dataclass(frozen=True)
+class Or:
+    operands: tuple["Node", ...]
+
+
+@dataclass(frozen=True)
+class Not:
+    """include AND NOT exclude"""
+    include: "Node"
+    exclude: "Node"
+
+
+@dataclass(frozen=True)
+class Phrase:
+    """right occurs at the position right after left"""
+    left: "Node"
+    right: "Node"
+
+
+@dataclass(frozen=True)
+class Near:
+    """right occurs within distance positions of left (either side)"""
+    left: "Node"
+    right: "Node"
+    distance: int
+
+
+Node = Union[Term, And, Or, Not, Phrase, Near]
+PositionalNode = (Term, Phrase, Near)
+
+
+class QueryPlanner:
+    """
+    Turns an RPN Boolean query into an expression tree (AND / OR chains as n-ary nodes) and optimizes it:
+    - flattens nested AND / OR nodes into n-ary nodes
+    - merges NOT chains into one difference against the union of the excluded operands
+    - orders operands by estimated result size (smallest first)
+    PHRASE / NEAR/k sub-trees are positional and kept as written.
+    """
+    def __init__(self):
+        self.operators = {"AND": And, "OR": Or, "NOT": Not, "PHRASE": Phrase}
+        self.near_pattern = re.compile(r"NEAR/(\d+)")
+
+    def parse(
+        self,
+        tokens: list[str],
+        analyze: Optional[Callable[[str], Optional[str]]] = None,
+        expand: Optional[Callable[[str], list[str]]] = None
+        ) -> Optional[Node]:
+        """Build the expression tree of an RPN token list (operands in the order written).
+
+        Chains of the same operator (a b AND c AND) collapse into one n-ary AND / OR node.
+
+        analyze maps each operand token to its index term; operands it drops (e.g. stopwords)
+        are left out of their operator, None if the whole query is dropped.
+        expand maps a wildcard operand (comput*, *ing) to the index terms it matches, which become
+        one n-ary OR; without it wildcard operands are plain terms.
+        """
+        stack = []
+
+        for token in tokens:
+            near_match = self.near_pattern.fullmatch(token)
+            if expand is not None and is_pattern(token):
+                # No match: the pattern itself, which isn't an index term and matches nothing
+                terms = expand(token) or [token]
+                stack.append(Term(terms[0]) if len(terms) == 1 else Or(tuple(Term(term) for term in terms)))
+                continue
+            if token not in self.operators and not near_match:
+                term = analyze(token) if analyze is not None else token
+                stack.append(Term(term) if term is not None else None)
+                continue
+
+            if len(stack) < 2:
+                raise ValueError(f"Operator {token} is missing an operand in query: {' '.join(tokens)}")
+            right = stack.pop()
+            left = stack.pop()
+
+            # A dropped operand is neutral: x AND -, x OR -, x NOT - are x ('- NOT x' is dropped too)
+            if left is None or right is None:
+                stack.append(left if token == "NOT" or right is None else right)
+                continue
+
+            if token == "PHRASE" or near_match:
+                # Positional operators need positions on both sides
+                if not isinstance(left, PositionalNode) or not isinstance(right, PositionalNode):
+                    raise ValueError(f"{token} operands must be terms, phrases or NEAR expressions: {' '.join(tokens)}")
+                stack.append(Phrase(left, right) if token == "PHRASE" else Near(left, right, int(near_match.group(1))))
+            elif token == "NOT":
+                stack.append(Not(left, right))
+            else:
+                node_type = self.operators[token]
+                # Collapse into an operand of the same operator: (a AND b) AND c -> AND(a, b, c)
+                operands = left.operands if type(left) is node_type else (left,)
+                operands += right.operands if type(right) is node_type else (right,)
+                stack.append(node_type(operands))
+
+        if len(stack) != 1:
+            raise ValueError(f"Malformed query: {' '.join(tokens)}")
+        return stack.pop()
+
+    def optimize(self, node: Node, doc_frequency: Callable[[str], int]) -> Node:
+        """Rewrite the tree bottom-up and order operands by estimated size."""
+        if isinstance(node, PositionalNode):
+            return node
+
+        if isinstance(node, Not):
+            include = self.optimize(node.include, doc_frequency)
+            exclude = self.optimize(node.exclude, doc_frequency)
+            # (a NOT b) NOT c -> a NOT (b OR c)
+            if isinstance(include, Not):
+                exclude = self.__build(Or, [include.exclude, exclude], doc_frequency)
+                include = include.include
+            return Not(include, exclude)
+
+        node_type = type(node)
+        operands = []
+        for operand in node.operands:
+            operand = self.optimize(operand, doc_frequency)
+            # Flatten (a AND b) AND c -> AND(a, b, c)
+            if type(operand) is node_type:
+                operands.extend(operand.operands)
+            else:
+                operands.append(operand)
+
+        # AND(x, a NOT b, c NOT d) -> AND(x, a, c) NOT (b OR d)
+        if node_type is And and any(isinstance(operand, Not) for operand in operands):
+            included = []
+            excluded = []
+            for operand in operands:
+                if isinstance(operand, Not):
+                    included.append(operand.include)
+                    excluded.append(operand.exclude)
+                else:
+                    included.append(operand)
+            include = self.__build(And, included, doc_frequency)
+            exclude = self.__build(Or, excluded, doc_frequency)
+            return Not(include, exclude)
+
+        return self.__build(node_type, operands, doc_frequency)
+
+    def __build(self, node_type: type, operands: list[Node], doc_frequency: Callable[[str], int]) -> Node:
+        """Create a flattened AND / OR node with operands sorted smallest-first."""
+        flat = []
+        for operand in operands:
+            if type(operand) is node_type:
+                flat.extend(operand.operands)
+            else:
+                flat.append(operand)
+
+        if len(flat) == 1:
+            return flat[0]
+        # Ties broken by the operand's text, so equivalent queries get identical trees
+        flat.sort(key=lambda operand: (self.estimate(operand, doc_frequency), to_rpn(operand)))
+        return node_type(tuple(flat))
+
+    def estimate(self, node: Node, doc_frequency: Callable[[str], int]) -> int:
+        """Upper bound on the number of documents a node can match."""
+        if isinstance(node, Term):
+            return doc_frequency(node.term)
+        if isinstance(node, And):
+            return min(self.estimate(operand, doc_frequency) for operand in node.operands)
+        if isinstance(node, Or):
+            return sum(self.estimate(operand, doc_frequency) for operand in node.operands)
+        if isinstance(node, (Phrase, Near)):
+            return min(self.estimate(node.left, doc_frequency), self.estimate(node.right, doc_frequency))
+        return self.estimate(node.include, doc_frequency)
+
+
+def to_rpn(node: Node) -> str:
+    """Write a tree back as an RPN query (n-ary nodes as chains of binary operators)."""
+    if isinstance(node, Term):
+        return node.term
+    if isinstance(node, Not):
+        return f"{to_rpn(node.include)} {to_rpn(node.exclude)} NOT"
+    if isinstance(node, Phrase):
+        return f"{to_rpn(node.left)} {to_rpn(node.right)} PHRASE"
+    if isinstance(node, Near):
+        return f"{to_rpn(node.left)} {to_rpn(node.right)} NEAR/{node.distance}"
+
+    operator = "AND" if isinstance(node, And) else "OR"
+    parts = [to_rpn(node.operands[0])]
+    for operand in node.operands[1:]:
+        parts.append(f"{to_rpn(operand)} {operator}")
+    return " ".join(parts)
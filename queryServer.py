@@ -0,0 +1,235 @@
+import argparse
+import asyncio
+import logging
+import os
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from itertools import chain
+from typing import Iterable, Optional
+
+from booleanRetrieval import BooleanRetrieval
+from invertedIndex import InvertedIndex
+
+logger = logging.getLogger(__name__)
+
+# Line protocol (UTF-8): the client sends one RPN query per line and may pipeline many before
+# reading; responses come back in request order:
+#   OK <n>\n followed by the n DOCNOs, space separated, in lines of at most CHUNK_SIZE
+#   ERR <message>\n  (also for a blank line)
+DEFAULT_PORT = 8765
+# DOCNOs per response line (a large result is streamed line by line with backpressure)
+CHUNK_SIZE = 1000
+# Queries evaluated at the same time over all connections
+MAX_CONCURRENCY = 64
+# Queries a connection may have in flight before the server stops reading from it
+MAX_PIPELINE = 128
+# Longest accepted query line in bytes
+MAX_LINE_BYTES = 64 * 1024
+
+# Per-process state of the process pool workers (each memory-maps the same index file)
+_worker_index: Optional[InvertedIndex] = None
+_worker_retrieval: Optional[BooleanRetrieval] = None
+
+
+def run_query(index: InvertedIndex, retrieval: BooleanRetrieval, query: str) -> list[str]:
+    """Evaluate an RPN query and return the matching original doc IDs."""
+    internal_ids = retrieval._execute_query_retrieval(query.split(), index.get_index(), index.get_positional_index())
+    return index.get_doc_id_map().to_original(internal_ids)
+
+
+def _init_worker(index_path: str) -> None:
+    global _worker_index, _worker_retrieval
+    _worker_index = InvertedIndex.load(index_path)
+    _worker_retrieval = BooleanRetrieval(
+        analyzer=_worker_index.get_analyzer(), term_dictionary=_worker_index.get_term_dictionary
+    )
+
+
+def _run_worker_query(query: str) -> list[str]:
+    return run_query(_worker_index, _worker_retrieval, query)
+
+
+class QueryServer:
+    """
+    asyncio TCP server answering Boolean RPN queries over one resident index
+    Queries are evaluated on a worker pool so the event loop keeps serving other connections:
+    threads sharing the in-memory index by default, or (with index_path) processes that each
+    memory-map the saved index file and evaluate in parallel. Process workers see the file, not
+    later add_documents / delete_documents on the resident index.
+    """
+    def __init__(
+        self,
+        index: InvertedIndex,
+        host: str = "127.0.0.1",
+        port: int = DEFAULT_PORT,
+        workers: Optional[int] = None,
+        index_path: Optional[str] = None,
+        max_concurrency: int = MAX_CONCURRENCY,
+        max_pipeline: int = MAX_PIPELINE,
+        chunk_size: int = CHUNK_SIZE
+        ):
+        self.index = index
+        self.host = host
+        self.port = port
+        self.workers = workers or os.cpu_count() or 1
+        self.index_path = index_path
+        self.max_concurrency = max_concurrency
+        self.max_pipeline = max_pipeline
+        self.chunk_size = chunk_size
+        self.retrieval = BooleanRetrieval(analyzer=index.get_analyzer(), term_dictionary=index.get_term_dictionary)
+        self._executor: Optional[Executor] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._server: Optional[asyncio.AbstractServer] = None
+        # Connection handler tasks, cancelled on close
+        self._handlers: set[asyncio.Task] = set()
+        # Counters
+        self.connections: int = 0
+        self.queries: int = 0
+        self.errors: int = 0
+
+    async def start(self) -> None:
+        """Start the worker pool and listen (port 0 picks a free port, see self.port)."""
+        if self.index_path is not None:
+            self._executor = ProcessPoolExecutor(self.workers, initializer=_init_worker, initargs=(self.index_path,))
+        else:
+            self._executor = ThreadPoolExecutor(self.workers, thread_name_prefix="query")
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        self._server = await asyncio.start_server(self.__handle, self.host, self.port, limit=MAX_LINE_BYTES)
+        self.port = self._server.sockets[0].getsockname()[1]
+        logger.info("Serving queries on %s:%d (%d workers)", self.host, self.port, self.workers)
+
+    async def serve_forever(self) -> None:
+        if self._server is None:
+            await self.start()
+        async with self._server:
+            await self._server.serve_forever()
+
+    async def close(self) -> None:
+        if self._server is not None:
+            self._server.close()
+        for handler in list(self._handlers):
+            handler.cancel()
+        await asyncio.gather(*self._handlers, return_exceptions=True)
+        if self._server is not None:
+            await self._server.wait_closed()
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+
+    async def __handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        """Read pipelined queries of a connection, answering them in order."""
+        self.connections += 1
+        handler = asyncio.current_task()
+        self._handlers.add(handler)
+        # Futures of the queries in flight, oldest first (bounded: reading pauses when full)
+        pending: asyncio.Queue = asyncio.Queue(self.max_pipeline)
+        responder = asyncio.create_task(self.__respond(pending, writer))
+
+        try:
+            try:
+                while True:
+                    try:
+                        line = await reader.readline()
+                    except ValueError:  # line over the reader limit
+                        await pending.put(_failed(ValueError(f"Query longer than {MAX_LINE_BYTES} bytes.")))
+                        break
+                    if not line:
+                        break  # client closed its side
+                    query = line.decode("utf-8", errors="replace").strip()
+                    if query:
+                        await pending.put(asyncio.ensure_future(self.__evaluate(query)))
+                    else:  # still answered, the client waits for one response per line
+                        await pending.put(_failed(ValueError("Empty query.")))
+            except ConnectionError:
+                pass  # the responder finds out too and drops the remaining answers
+            await pending.put(None)
+            await responder
+        except asyncio.CancelledError:  # server closing
+            responder.cancel()
+            while not pending.empty():
+                future = pending.get_nowait()
+                if future is not None:
+                    future.cancel()
+        finally:
+            writer.close()
+            self._handlers.discard(handler)
+
+    async def __evaluate(self, query: str) -> list[str]:
+        async with self._semaphore:
+            loop = asyncio.get_running_loop()
+            if self.index_path is not None:
+                return await loop.run_in_executor(self._executor, _run_worker_query, query)
+            return await loop.run_in_executor(self._executor, run_query, self.index, self.retrieval, query)
+
+    async def __respond(self, pending: asyncio.Queue, writer: asyncio.StreamWriter) -> None:
+        """Write the responses in request order, streaming large results in chunks.
+
+        After the client goes away the remaining queries are still consumed (and cancelled),
+        so the reading side never blocks on a full queue.
+        """
+        connected = True
+        while True:
+            future = await pending.get()
+            if future is None:
+                return
+            if not connected:
+                future.cancel()
+                continue
+            try:
+                doc_ids = await future
+            except Exception as error:  # a bad query only fails its own response
+                self.errors += 1
+                message = " ".join(str(error).split()) or type(error).__name__
+                lines: Iterable[str] = (f"ERR {message}",)
+            else:
+                self.queries += 1
+                # Chunk lines are joined one at a time, as the client reads them
+                lines = chain((f"OK {len(doc_ids)}",), (
+                    " ".join(doc_ids[start:start + self.chunk_size])
+                    for start in range(0, len(doc_ids), self.chunk_size)
+                ))
+
+            try:
+                for line in lines:
+                    writer.write((line + "\n").encode("utf-8"))
+                    await writer.drain()  # wait for a slow reader instead of buffering the whole result
+            except ConnectionError:
+                connected = False
+
+
+def _failed(error: Exception) -> asyncio.Future:
+    future = asyncio.get_running_loop().create_future()
+    future.set_exception(error)
+    return future
+
+
+def main(argv: Optional[list[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Serve Boolean RPN queries over TCP.")
+    parser.add_argument("--index", default="index.bin", help="saved index (built from --data and saved if missing)")
+    parser.add_argument("--data", default="data", help="AP data directory to build the index from")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--processes", action="store_true", help="evaluate in worker processes (parallel)")
+    parser.add_argument("--max-concurrency", type=int, default=MAX_CONCURRENCY)
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+
+    # Load a saved index, or build inverted index and save it for the next run
+    if os.path.exists(args.index):
+        index = InvertedIndex.load(args.index)
+    else:
+        index = InvertedIndex()
+        index.build_index(args.data, workers=args.workers)
+        index.save(args.index)
+
+    server = QueryServer(
+        index, args.host, args.port, args.workers,
+        index_path=args.index if args.processes else None, max_concurrency=args.max_concurrency
+    )
+    try:
+        asyncio.run(server.serve_forever())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
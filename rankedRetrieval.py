@@ -0,0 +1,251 @@
+import heapq
+import logging
+import math
+import os
+from bisect import bisect_left
+from typing import Optional, Sequence
+
+from invertedIndex import InvertedIndex
+from postingsList import FrequencyList, PostingsCursor, PostingsList
+from resultWriter import read_queries
+from textAnalyzer import Analyzer
+
+logger = logging.getLogger(__name__)
+
+
+class _ListCursor:
+    """PostingsCursor interface over a decoded (sorted) doc ID list, e.g. of a bitmap term."""
+    __slots__ = ("_doc_ids", "_index")
+
+    def __init__(self, doc_ids: list[int]):
+        self._doc_ids = doc_ids
+        self._index = -1
+
+    @property
+    def index(self) -> int:
+        return self._index
+
+    def advance(self, target: int) -> Optional[int]:
+        """Move to the first doc ID >= target (never backwards), None when exhausted."""
+        if self._index >= len(self._doc_ids):
+            return None
+        if self._index >= 0 and self._doc_ids[self._index] >= target:
+            return self._doc_ids[self._index]
+        self._index = bisect_left(self._doc_ids, target, max(self._index, 0))
+        if self._index >= len(self._doc_ids):
+            return None
+        return self._doc_ids[self._index]
+
+
+class _TermCursor:
+    """A query term's postings cursor with its frequencies, BM25 idf and max score."""
+    __slots__ = ("cursor", "frequencies", "idf", "upper_bound", "doc_id")
+
+    def __init__(self, cursor: PostingsCursor | _ListCursor, frequencies: FrequencyList, idf: float, upper_bound: float):
+        self.cursor = cursor
+        self.frequencies = frequencies
+        self.idf = idf
+        self.upper_bound = upper_bound
+        # Current doc ID (None when exhausted)
+        self.doc_id: Optional[int] = cursor.advance(1)
+
+    def advance(self, target: int) -> Optional[int]:
+        self.doc_id = self.cursor.advance(target)
+        return self.doc_id
+
+    def frequency(self) -> int:
+        """Term frequency in the current document."""
+        return self.frequencies[self.cursor.index]
+
+
+class RankedRetrieval:
+    """
+    BM25 ranked retrieval over term frequencies and document lengths
+    Top-k by MaxScore: query terms are ordered by their maximum possible score, and documents
+    found only in terms whose summed maxima can't beat the current k-th score are never scored
+    (those terms are only probed, skipping blocks of postings, for candidates from the other terms)
+    """
+    def __init__(self, k1: float = 1.2, b: float = 0.75, prune: bool = True, analyzer: Optional[Analyzer] = None):
+        self.k1 = k1  # term frequency saturation
+        self.b = b  # document length normalization
+        self.prune = prune  # MaxScore pruning (False scores every posting of the query terms)
+        # Query text goes through the analyzer the index was built with (InvertedIndex.get_analyzer())
+        self.analyzer = analyzer if analyzer is not None else Analyzer()
+        # Per-index statistics, reset when queries run on another index mapping
+        self._source: Optional[object] = None
+        self._average_length: float = 0.0
+        # {'term': max BM25 score over its postings, ...}
+        self._upper_bounds: dict[str, float] = {}
+
+    def retrieve(
+        self,
+        inverted_index: dict[str, PostingsList],
+        frequency_index: dict[str, FrequencyList],
+        doc_lengths: Sequence[int],
+        doc_map: dict[int, str],
+        query_file_path: str = "RankedQueries.txt",
+        output_file_path: str = "Ranked_results.txt",
+        k: int = 10
+        ) -> None:
+        """Rank documents for free-text queries (one per line) and write the top-k doc IDs, best first."""
+        with open(output_file_path, "w", encoding="utf-8") as out_f:
+
+            for line in read_queries(query_file_path):
+                logger.debug("Processing ranked retrieval for query: %s", line)
+                results = self.search(line.split(), inverted_index, frequency_index, doc_lengths, doc_map, k)
+                out_f.write(" ".join(doc_id for doc_id, _ in results) + "\n")
+
+            logger.info("Ranked retrieval results written to %s", output_file_path)
+
+    def search(
+        self,
+        terms: list[str],
+        inverted_index: dict[str, PostingsList],
+        frequency_index: dict[str, FrequencyList],
+        doc_lengths: Sequence[int],
+        doc_map: dict[int, str],
+        k: int = 10
+        ) -> list[tuple[str, float]]:
+        """Return the k best (original doc ID, BM25 score) pairs for the query terms, best first."""
+        # Index terms of the query tokens (dropped ones, e.g. stopwords, are skipped)
+        terms = [term for term in map(self.analyzer.analyze_term, terms) if term is not None]
+        top = self._top_k(terms, inverted_index, frequency_index, doc_lengths, k)
+        return [(doc_map[internal_id], score) for internal_id, score in top]
+
+    def _top_k(
+        self,
+        terms: list[str],
+        inverted_index: dict[str, PostingsList],
+        frequency_index: dict[str, FrequencyList],
+        doc_lengths: Sequence[int],
+        k: int
+        ) -> list[tuple[int, float]]:
+        """Return the k best (internal doc ID, score) pairs, ties broken by lower doc ID."""
+        n_docs = len(doc_lengths) - 1
+        if k <= 0 or n_docs <= 0:
+            return []
+        self.__check_source(inverted_index, doc_lengths)
+
+        # BM25 denominator: tf + k1 * (1 - b + b * doc_length / average_length)
+        length_base = self.k1 * (1 - self.b)
+        length_weight = self.k1 * self.b / self._average_length
+        k1_plus_1 = self.k1 + 1
+
+        cursors = []
+        for term in dict.fromkeys(terms):  # repeated query terms count once
+            postings = inverted_index.get(term)
+            if not postings:
+                continue
+            frequencies = frequency_index[term]
+            idf = self.__idf(len(postings), n_docs)
+            cursor = postings.cursor() if isinstance(postings, PostingsList) else _ListCursor(list(postings))
+            upper_bound = self.__upper_bound(term, postings, frequencies, idf, doc_lengths)
+            cursors.append(_TermCursor(cursor, frequencies, idf, upper_bound))
+        if not cursors:
+            return []
+
+        # Smallest max score first, bounds[i] = max score of a document matching only terms 0..i
+        cursors.sort(key=lambda cursor: cursor.upper_bound)
+        bounds = []
+        total = 0.0
+        for cursor in cursors:
+            total += cursor.upper_bound
+            bounds.append(total)
+
+        # Min-heap of (score, -doc_id): the root is the current k-th best (worst) result
+        heap: list[tuple[float, int]] = []
+        threshold = 0.0
+        # Terms before first_essential can't produce a top-k document on their own
+        first_essential = 0
+
+        while True:
+            essential = [cursor for cursor in cursors[first_essential:] if cursor.doc_id is not None]
+            if not essential:
+                break
+            doc_id = min(cursor.doc_id for cursor in essential)
+            length_norm = length_base + length_weight * doc_lengths[doc_id]
+
+            score = 0.0
+            for cursor in essential:
+                if cursor.doc_id == doc_id:
+                    tf = cursor.frequency()
+                    score += cursor.idf * tf * k1_plus_1 / (tf + length_norm)
+                    cursor.advance(doc_id + 1)
+
+            # Probe the non-essential terms, largest max score first, while the document can still make it
+            for i in range(first_essential - 1, -1, -1):
+                if score + bounds[i] < threshold:
+                    break
+                cursor = cursors[i]
+                if cursor.advance(doc_id) == doc_id:
+                    tf = cursor.frequency()
+                    score += cursor.idf * tf * k1_plus_1 / (tf + length_norm)
+
+            entry = (score, -doc_id)
+            if len(heap) < k:
+                heapq.heappush(heap, entry)
+            elif entry > heap[0]:
+                heapq.heapreplace(heap, entry)
+            else:
+                continue
+
+            if len(heap) == k and self.prune:
+                threshold = heap[0][0]
+                while first_essential < len(cursors) and bounds[first_essential] < threshold:
+                    first_essential += 1
+
+        return [(-negative_id, score) for score, negative_id in sorted(heap, reverse=True)]
+
+    def __check_source(self, inverted_index: object, doc_lengths: Sequence[int]) -> None:
+        """Recompute collection statistics when queries run on a different (reloaded or updated) index."""
+        if inverted_index is self._source:
+            return
+        self._source = inverted_index
+        self._average_length = max(sum(doc_lengths) / (len(doc_lengths) - 1), 1e-9)
+        self._upper_bounds = {}
+
+    @staticmethod
+    def __idf(doc_frequency: int, n_docs: int) -> float:
+        """BM25 idf (non-negative variant)."""
+        return math.log(1 + (n_docs - doc_frequency + 0.5) / (doc_frequency + 0.5))
+
+    def __upper_bound(
+        self,
+        term: str,
+        postings: Sequence[int],
+        frequencies: FrequencyList,
+        idf: float,
+        doc_lengths: Sequence[int]
+        ) -> float:
+        """Maximum BM25 score of the term over its postings (one scan, cached per index)."""
+        upper_bound = self._upper_bounds.get(term)
+        if upper_bound is None:
+            length_base = self.k1 * (1 - self.b)
+            length_weight = self.k1 * self.b / self._average_length
+            # Score grows with tf / (tf + length_norm), so the best document maximizes that ratio
+            best = max(
+                tf / (tf + length_base + length_weight * doc_lengths[doc_id])
+                for doc_id, tf in zip(postings, frequencies)
+            )
+            upper_bound = idf * (self.k1 + 1) * best
+            self._upper_bounds[term] = upper_bound
+        return upper_bound
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+
+    # Load a saved index, or build inverted index and save it for the next run
+    index_path = "index.bin"
+    if os.path.exists(index_path):
+        index = InvertedIndex.load(index_path)
+    else:
+        index = InvertedIndex()
+        index.build_index(workers=os.cpu_count())
+        index.save(index_path)
+
+    # Ranked retrieval
+    ranked_retrieval = RankedRetrieval(analyzer=index.get_analyzer())
+    ranked_retrieval.retrieve(
+        index.get_index(), index.get_frequency_index(), index.get_doc_lengths(), index.get_doc_id_map()
+    )
@@ -0,0 +1,101 @@
+import sys
+import threading
+from collections import OrderedDict
+from typing import Hashable, Optional, Sequence
+
+# Rough per-entry cost besides the result itself (OrderedDict slot, key tree)
+ENTRY_OVERHEAD_BYTES = 200
+# A decoded doc ID in a result list (list slot + int object)
+LIST_ITEM_BYTES = 40
+
+
+def result_nbytes(result: Sequence[int]) -> int:
+    """Approximate memory held by a query result."""
+    if isinstance(result, list):
+        return sys.getsizeof(result) + LIST_ITEM_BYTES * len(result)
+    # Compressed lists, bitmaps and numpy arrays report their buffer size
+    return result.nbytes + sys.getsizeof(result)
+
+
+class ResultCache:
+    """
+    LRU cache of query and sub-query results, bounded by (approximate) bytes
+    Keys are query plan nodes; all entries are dropped when the index they were computed on changes.
+    """
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        # {plan_node: (result, nbytes), ...} from least to most recently used
+        self._entries: OrderedDict[Hashable, tuple[Sequence[int], int]] = OrderedDict()
+        self._nbytes: int = 0
+        # The index mapping the cached results were computed on
+        self._source: Optional[object] = None
+        self._lock = threading.Lock()
+        # Counters
+        self.hits: int = 0
+        self.misses: int = 0
+        self.evictions: int = 0
+        self.invalidations: int = 0
+
+    def bind(self, index) -> None:
+        """Clear the cache whenever the InvertedIndex is mutated."""
+        index.add_listener(self.clear)
+
+    def check_source(self, inverted_index: object) -> None:
+        """Clear the cache if queries now run on a different index mapping (reloaded or updated index)."""
+        with self._lock:
+            if inverted_index is not self._source:
+                self.__clear()
+                self._source = inverted_index
+
+    def get(self, key: Hashable) -> Optional[Sequence[int]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key: Hashable, result: Sequence[int]) -> None:
+        nbytes = result_nbytes(result) + ENTRY_OVERHEAD_BYTES
+        if nbytes > self.max_bytes:
+            return  # would evict everything else
+
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._nbytes -= previous[1]
+
+            # Evict least recently used entries until the new one fits
+            while self._entries and self._nbytes + nbytes > self.max_bytes:
+                _, (_, evicted_nbytes) = self._entries.popitem(last=False)
+                self._nbytes -= evicted_nbytes
+                self.evictions += 1
+
+            self._entries[key] = (result, nbytes)
+            self._nbytes += nbytes
+
+    def clear(self) -> None:
+        """Drop all entries (counted as an invalidation)."""
+        with self._lock:
+            self.__clear()
+
+    def __clear(self) -> None:
+        if self._entries:
+            self.invalidations += 1
+        self._entries.clear()
+        self._nbytes = 0
+
+    def stats(self) -> dict[str, int]:
+        """Counters and current size, for tuning max_bytes."""
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+                "entries": len(self._entries),
+                "bytes": self._nbytes,
+                "max_bytes": self.max_bytes,
+            }
@@ -0,0 +1,160 @@
+import struct
+import time
+from collections.abc import Mapping
+from itertools import islice
+from typing import Iterable, Iterator, Optional
+
+from docTable import DocTable
+from instrumentation import Sink
+from postingsList import decode_varbyte, encode_varbyte
+
+# Output formats:
+#   "text"   - one line per query, the matching DOCNOs space separated (the Part_2.txt format)
+#   "varint" - header, then per query the ascending internal IDs as variable-byte gaps (first ID,
+#              then differences, all >= 1) ended by a 0 byte, so a result is written as it streams
+FORMATS = {"text", "varint"}
+VARINT_MAGIC = b"IPRS"
+VARINT_VERSION = 1
+_VARINT_HEADER = struct.Struct("<4sI")
+# Bytes buffered before each write to the file
+BUFFER_SIZE = 1024 * 1024
+# Doc IDs converted / encoded per step, so a streamed result is never held in full
+WRITE_CHUNK = 1000
+# Minimum seconds between two progress records
+PROGRESS_INTERVAL = 1.0
+
+
+def read_queries(query_file_path: str) -> Iterator[str]:
+    """Yield the non-empty query lines of a file (stripped), reading one line at a time."""
+    with open(query_file_path, "r", encoding="utf-8") as in_f:
+        for line in in_f:
+            line = line.strip()
+            if line:
+                yield line
+
+
+def read_results(result_file_path: str) -> Iterator[list[int]]:
+    """Yield the internal IDs of each query from a "varint" result file."""
+    with open(result_file_path, "rb") as in_f:
+        data = in_f.read()
+
+    magic, version = _VARINT_HEADER.unpack_from(data, 0)
+    if magic != VARINT_MAGIC:
+        raise ValueError(f"{result_file_path} is not a varint result file.")
+    if version != VARINT_VERSION:
+        raise ValueError(f"Unsupported result format version {version} in {result_file_path}.")
+
+    pos = _VARINT_HEADER.size
+    internal_ids: list[int] = []
+    doc_id = 0
+    while pos < len(data):
+        gap, pos = decode_varbyte(data, pos)
+        if not gap:  # end of the query's result
+            yield internal_ids
+            internal_ids = []
+            doc_id = 0
+        else:
+            doc_id += gap
+            internal_ids.append(doc_id)
+
+
+class ResultWriter:
+    """
+    Streaming output stage of query results: one write() per query, in query order
+    Output goes through a large write buffer, results are converted (text) or encoded (varint)
+    chunk by chunk. progress gets {"event": "progress", queries, doc_ids, seconds, queries_per_second}
+    records at most every progress_interval seconds, and a last one on close.
+    """
+    def __init__(
+        self,
+        output_file_path: str,
+        doc_map: Optional[Mapping[int, str]] = None,
+        output_format: str = "text",
+        progress: Optional[Sink] = None,
+        progress_interval: float = PROGRESS_INTERVAL,
+        buffer_size: int = BUFFER_SIZE
+        ):
+        if output_format not in FORMATS:
+            raise ValueError(f"Unknown output format {output_format!r}, expected one of {sorted(FORMATS)}.")
+        if output_format == "text" and doc_map is None:
+            raise ValueError("The text output format needs a doc ID map.")
+        self.output_file_path = output_file_path
+        self.output_format = output_format
+        # A DocTable converts a whole chunk from its DOCNO buffer
+        if isinstance(doc_map, DocTable):
+            self._to_original = doc_map.to_original
+        elif doc_map is not None:
+            self._to_original = lambda internal_ids: [doc_map[internal_id] for internal_id in internal_ids]
+        self.progress = progress
+        self.progress_interval = progress_interval
+        self._file = open(output_file_path, "wb", buffering=buffer_size)
+        if output_format == "varint":
+            self._file.write(_VARINT_HEADER.pack(VARINT_MAGIC, VARINT_VERSION))
+        # Counters
+        self.queries: int = 0
+        self.doc_ids: int = 0
+        self._start = time.perf_counter()
+        self._last_progress = self._start
+
+    def write(self, internal_ids: Iterable[int]) -> int:
+        """Write the result of the next query (ascending internal IDs), return how many doc IDs it had."""
+        internal_ids = iter(internal_ids)
+        if self.output_format == "text":
+            count = self.__write_text(internal_ids)
+        else:
+            count = self.__write_varint(internal_ids)
+
+        self.queries += 1
+        self.doc_ids += count
+        if self.progress is not None:
+            now = time.perf_counter()
+            if now - self._last_progress >= self.progress_interval:
+                self._last_progress = now
+                self.__report(now)
+        return count
+
+    def __write_text(self, internal_ids: Iterator[int]) -> int:
+        count = 0
+        separator = b""
+        for chunk in iter(lambda: list(islice(internal_ids, WRITE_CHUNK)), []):
+            self._file.write(separator + " ".join(self._to_original(chunk)).encode("utf-8"))
+            separator = b" "
+            count += len(chunk)
+        self._file.write(b"\n")
+        return count
+
+    def __write_varint(self, internal_ids: Iterator[int]) -> int:
+        count = 0
+        previous = 0
+        for chunk in iter(lambda: list(islice(internal_ids, WRITE_CHUNK)), []):
+            encoded = bytearray()
+            for internal_id in chunk:
+                encode_varbyte(internal_id - previous, encoded)
+                previous = internal_id
+            self._file.write(encoded)
+            count += len(chunk)
+        self._file.write(b"\0")
+        return count
+
+    def __report(self, now: float) -> None:
+        seconds = now - self._start
+        self.progress({
+            "event": "progress",
+            "queries": self.queries,
+            "doc_ids": self.doc_ids,
+            "seconds": seconds,
+            "queries_per_second": self.queries / seconds if seconds else 0.0,
+        })
+
+    def close(self) -> None:
+        if self._file.closed:
+            return
+        self._file.close()
+        if self.progress is not None:
+            self.__report(time.perf_counter())
+
+    def __enter__(self) -> "ResultWriter":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
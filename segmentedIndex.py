@@ -0,0 +1,212 @@
+from collections.abc import Mapping
+from itertools import chain
+from typing import Iterator, Optional
+
+from postingsList import BitmapPostings, FrequencyList, PositionsList, PostingsList
+
+
+class DeletionBitmap:
+    """Bitmap over internal doc IDs marking deleted documents."""
+    __slots__ = ("_bits", "_count")
+
+    def __init__(self):
+        self._bits = bytearray()
+        # Number of set bits
+        self._count: int = 0
+
+    def add(self, internal_id: int) -> bool:
+        """Mark a doc ID as deleted, return False if it already was."""
+        byte, bit = divmod(internal_id, 8)
+        if byte >= len(self._bits):
+            self._bits.extend(bytes(byte - len(self._bits) + 1))
+        if self._bits[byte] & (1 << bit):
+            return False
+        self._bits[byte] |= 1 << bit
+        self._count += 1
+        return True
+
+    def difference_update(self, other: "DeletionBitmap") -> None:
+        """Clear every doc ID that is set in other."""
+        for i in range(min(len(self._bits), len(other._bits))):
+            if self._bits[i] & other._bits[i]:
+                self._bits[i] &= ~other._bits[i] & 0xFF
+        self._count = sum(bin(byte).count("1") for byte in self._bits)
+
+    def to_postings(self) -> BitmapPostings:
+        """The deleted doc IDs as bitmap postings (same bit layout)."""
+        return BitmapPostings.from_buffer(bytes(self._bits), self._count)
+
+    def copy(self) -> "DeletionBitmap":
+        bitmap = DeletionBitmap()
+        bitmap._bits = bytearray(self._bits)
+        bitmap._count = self._count
+        return bitmap
+
+    def __iter__(self) -> Iterator[int]:
+        """Deleted doc IDs in ascending order."""
+        for byte_index, byte in enumerate(self._bits):
+            if byte:
+                for bit in range(8):
+                    if byte & (1 << bit):
+                        yield byte_index * 8 + bit
+
+    def __contains__(self, internal_id: int) -> bool:
+        byte = internal_id >> 3
+        return byte < len(self._bits) and bool(self._bits[byte] & (1 << (internal_id & 7)))
+
+    def __len__(self) -> int:
+        return self._count
+
+
+class SegmentedIndexView(Mapping):
+    """
+    Read-only term -> PostingsList view of base + delta segments - deleted docs
+    Delta segments hold strictly larger doc IDs than the base (and than earlier deltas),
+    so a term's merged list is the concatenation of its segment lists.
+    Merged lists are built on first access and cached (the view is replaced on every update).
+    """
+
+    def __init__(
+        self,
+        base: Mapping[str, PostingsList],
+        deltas: list[Mapping[str, PostingsList]],
+        deleted: DeletionBitmap
+        ):
+        self._base = base
+        self._deltas = deltas
+        self._deleted = deleted
+        self._cache: dict[str, PostingsList] = {}
+
+    def _segments(self, term: str) -> list[PostingsList]:
+        """The term's posting lists in each segment (base first)."""
+        segments = []
+        for segment in chain((self._base,), self._deltas):
+            postings = segment.get(term)
+            if postings is not None:
+                segments.append(postings)
+        return segments
+
+    def __getitem__(self, term: str) -> PostingsList:
+        merged = self._cache.get(term)
+        if merged is not None:
+            return merged
+
+        segments = self._segments(term)
+        if not segments:
+            raise KeyError(term)
+
+        if isinstance(segments[0], BitmapPostings):
+            # Dense base term: set the delta bits and clear the deleted ones, it stays a bitmap
+            merged = segments[0]
+            for postings in segments[1:]:
+                merged = merged.with_ids(postings)
+            if self._deleted:
+                merged = merged.difference(self._deleted.to_postings())
+        elif len(segments) == 1 and not self._deleted:
+            merged = segments[0]
+        elif not self._deleted:
+            merged = PostingsList()
+            for postings in segments:
+                merged.concat(postings)
+        else:
+            deleted = self._deleted
+            merged = PostingsList(doc_id for doc_id in chain(*segments) if doc_id not in deleted)
+
+        self._cache[term] = merged
+        return merged
+
+    def __contains__(self, term: object) -> bool:
+        return any(term in segment for segment in chain((self._base,), self._deltas))
+
+    def __iter__(self) -> Iterator[str]:
+        yield from self._base
+        seen = set()
+        for delta in self._deltas:
+            for term in delta:
+                if term not in seen and term not in self._base:
+                    seen.add(term)
+                    yield term
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self)
+
+
+class SegmentedPositionalView(Mapping):
+    """
+    Read-only term -> PositionsList view aligned with a SegmentedIndexView
+    (or term -> FrequencyList with list_type=FrequencyList - any per-document list with append / concat)
+    """
+
+    def __init__(
+        self,
+        postings_view: SegmentedIndexView,
+        base: Mapping[str, PositionsList],
+        deltas: list[Mapping[str, PositionsList]],
+        list_type: type = PositionsList
+        ):
+        self._postings_view = postings_view
+        self._base = base
+        self._deltas = deltas
+        self._list_type = list_type
+        self._cache: dict[str, PositionsList] = {}
+
+    def __getitem__(self, term: str) -> PositionsList:
+        merged = self._cache.get(term)
+        if merged is not None:
+            return merged
+
+        positions_segments = [
+            segment[term] for segment in chain((self._base,), self._deltas) if term in segment
+        ]
+        if not positions_segments:
+            raise KeyError(term)
+
+        merged = self._list_type()
+        deleted = self._postings_view._deleted
+        if not deleted:
+            for positions in positions_segments:
+                merged.concat(positions)
+        else:
+            # Drop the positions of deleted documents, walking postings and positions together
+            doc_ids = chain(*self._postings_view._segments(term))
+            for doc_id, positions in zip(doc_ids, chain(*positions_segments)):
+                if doc_id not in deleted:
+                    merged.append(positions)
+
+        self._cache[term] = merged
+        return merged
+
+    def __contains__(self, term: object) -> bool:
+        return term in self._postings_view
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._postings_view)
+
+    def __len__(self) -> int:
+        return len(self._postings_view)
+
+
+def compact_segments(
+    view: SegmentedIndexView,
+    frequency_view: SegmentedPositionalView,
+    positional_view: Optional[SegmentedPositionalView] = None
+    ) -> tuple[dict[str, PostingsList], dict[str, FrequencyList], dict[str, PositionsList]]:
+    """Materialize views into a single in-memory segment, dropping terms left without documents.
+
+    Lists still read from a memory-mapped base are copied, so the segment owns all its data
+    (it can be appended to, and doesn't pin the mapped file).
+    """
+    inverted_index: dict[str, PostingsList] = {}
+    frequency_index: dict[str, FrequencyList] = {}
+    positional_index: dict[str, PositionsList] = {}
+
+    for term in view:
+        postings = view[term]
+        if not postings:
+            continue
+        inverted_index[term] = postings.owned()
+        frequency_index[term] = frequency_view[term]
+        if positional_view is not None:
+            positional_index[term] = positional_view[term]
+
+    return inverted_index, frequency_index, positional_index
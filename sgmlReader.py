@@ -0,0 +1,73 @@
+from typing import BinaryIO, Iterator, Optional
+
+# AP collection tags
+DOC_START = b"<DOC>"
+DOC_END = b"</DOC>"
+DOCNO_START = b"<DOCNO>"
+DOCNO_END = b"</DOCNO>"
+TEXT_START = b"<TEXT>"
+TEXT_END = b"</TEXT>"
+# Bytes read from the stream at a time
+CHUNK_SIZE = 1 << 20
+
+
+def iter_documents(stream: BinaryIO, chunk_size: int = CHUNK_SIZE) -> Iterator[tuple[Optional[str], str]]:
+    """Stream (DOCNO, text) pairs of the <DOC> blocks of an SGML file, reading it chunk by chunk.
+
+    Tags are located on the raw bytes, only the DOCNO and TEXT spans are decoded (latin-1).
+    The text of a document is all its <TEXT> sections, one per line; DOCNO is None if missing.
+    """
+    buffer = bytearray()
+    # Start of the unparsed part of the buffer
+    pos = 0
+
+    while True:
+        chunk = stream.read(chunk_size)
+        if chunk:
+            # Drop what was parsed, keep an incomplete document (or a partial <DOC> tag)
+            del buffer[:pos]
+            pos = 0
+            buffer += chunk
+
+        while True:
+            start = buffer.find(DOC_START, pos)
+            if start < 0:
+                pos = max(pos, len(buffer) - len(DOC_START) + 1)
+                break
+            end = buffer.find(DOC_END, start + len(DOC_START))
+            if end < 0:
+                pos = start
+                break
+            yield _parse_document(buffer, start + len(DOC_START), end)
+            pos = end + len(DOC_END)
+
+        if not chunk:
+            return
+
+
+def _parse_document(buffer: bytearray, start: int, end: int) -> tuple[Optional[str], str]:
+    """DOCNO and text of the document between start and end."""
+    doc_id = None
+    id_start = buffer.find(DOCNO_START, start, end)
+    if id_start >= 0:
+        id_start += len(DOCNO_START)
+        id_end = buffer.find(DOCNO_END, id_start, end)
+        if id_end >= 0:
+            doc_id = buffer[id_start:id_end].decode("latin-1").strip()
+
+    sections = []
+    pos = start
+    while True:
+        text_start = buffer.find(TEXT_START, pos, end)
+        if text_start < 0:
+            break
+        text_start += len(TEXT_START)
+        text_end = buffer.find(TEXT_END, text_start, end)
+        if text_end < 0:
+            break
+        section = buffer[text_start:text_end].decode("latin-1").strip()
+        if section:
+            sections.append(section)
+        pos = text_end + len(TEXT_END)
+
+    return doc_id, "\n".join(sections)
@@ -0,0 +1,239 @@
+import logging
+import os
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from itertools import accumulate
+from typing import Optional
+
+from booleanRetrieval import BooleanRetrieval
+from docTable import DocTable
+from invertedIndex import InvertedIndex
+from resultWriter import read_queries
+from textAnalyzer import Analyzer
+
+logger = logging.getLogger(__name__)
+
+# File name of shard i in a saved sharded index directory
+SHARD_FILE = "shard_{:03d}.bin"
+
+# Per-process state of a shard worker (each shard has a process of its own)
+_shard_index: Optional[InvertedIndex] = None
+_shard_retrieval: Optional[BooleanRetrieval] = None
+
+
+def _set_shard(index: InvertedIndex, strategy: str) -> DocTable:
+    global _shard_index, _shard_retrieval
+    _shard_index = index
+    _shard_retrieval = BooleanRetrieval(
+        strategy=strategy, analyzer=index.get_analyzer(), term_dictionary=index.get_term_dictionary
+    )
+    # The shard's doc table (pickled as two buffers), for the coordinator to map results
+    return index.get_doc_id_map()
+
+
+def _build_shard(
+    members: list[tuple[str, list[str]]],
+    positional: bool,
+    analyzer: Analyzer,
+    strategy: str
+    ) -> DocTable:
+    """Worker: index the shard's zip members, return its doc table."""
+    index = InvertedIndex(positional, analyzer)
+    index.build_index(members=members)
+    return _set_shard(index, strategy)
+
+
+def _load_shard(index_path: str, strategy: str) -> DocTable:
+    """Worker: memory-map a saved shard, return its doc table."""
+    return _set_shard(InvertedIndex.load(index_path), strategy)
+
+
+def _save_shard(index_path: str) -> None:
+    _shard_index.save(index_path)
+
+
+def _query_shard(queries: list[str], limit: Optional[int]) -> list[array]:
+    """Worker: evaluate RPN queries on the shard, return the local internal IDs of each.
+
+    IDs go back as array("I"), pickled as one buffer instead of an object per doc ID.
+    """
+    inverted_index = _shard_index.get_index()
+    positional_index = _shard_index.get_positional_index()
+
+    results = []
+    for query in queries:
+        if limit is None:
+            internal_ids = _shard_retrieval._execute_query_retrieval(query.split(), inverted_index, positional_index)
+        else:
+            # A shard contributes at most limit doc IDs, so its evaluation stops there
+            internal_ids = list(_shard_retrieval.iter_query(query, inverted_index, positional_index, limit))
+        results.append(array("I", internal_ids))
+    return results
+
+
+class ShardedIndex:
+    """
+    Document-partitioned index: each shard owns a contiguous range of the documents (zip members in
+    serial build order, so of the internal IDs) and lives in a worker process of its own
+    Queries are scattered to every shard and the already sorted per-shard results gathered in shard
+    order, so they come out sorted and identical to those of a single InvertedIndex, while the shards
+    evaluate on separate cores and heaps. A local stand-in for index nodes.
+    """
+    def __init__(
+        self,
+        n_shards: Optional[int] = None,
+        positional: bool = False,
+        analyzer: Optional[Analyzer] = None,
+        strategy: str = "auto"
+        ):
+        self.n_shards = n_shards or os.cpu_count() or 1
+        self.positional = positional
+        self.analyzer = analyzer if analyzer is not None else Analyzer()
+        self.strategy = strategy  # AND / AND-NOT algorithm of the shards' BooleanRetrieval
+        # One single-process executor per shard, in shard order
+        self._executors: list[ProcessPoolExecutor] = []
+        # Local internal ID -> original doc ID table of each shard (a copy of the shard's)
+        self._doc_ids: list[DocTable] = []
+        # Global internal ID offset of each shard (shard i: offset + local ID)
+        self._offsets: list[int] = []
+
+    def build_index(self, data_dir: str = "data") -> None:
+        """Split the zip members into contiguous, size-balanced shards and index each in its worker.
+
+        A zip member is never split, so a collection with fewer members than n_shards gets one shard
+        per member; n_shards is set to the number actually built.
+        """
+        self.close()
+        shards = InvertedIndex._plan_shards(data_dir, self.n_shards)
+        if len(shards) < self.n_shards:
+            logger.warning(
+                "%d shards requested, but %s has only %d zip members: building %d shards",
+                self.n_shards, data_dir, len(shards), len(shards)
+            )
+            self.n_shards = len(shards)
+        self.__start(len(shards))
+        futures = [
+            executor.submit(_build_shard, members, self.positional, self.analyzer, self.strategy)
+            for executor, members in zip(self._executors, shards)
+        ]
+        self.__set_doc_ids([future.result() for future in futures])
+        logger.info("Indexed %d documents in %d shards", len(self), len(self._doc_ids))
+
+    def save(self, shard_dir: str) -> None:
+        """Save every shard to shard_dir (one index file per shard)."""
+        os.makedirs(shard_dir, exist_ok=True)
+        futures = [
+            executor.submit(_save_shard, os.path.join(shard_dir, SHARD_FILE.format(shard_number)))
+            for shard_number, executor in enumerate(self._executors)
+        ]
+        for future in futures:
+            future.result()
+
+    @classmethod
+    def load(cls, shard_dir: str, strategy: str = "auto") -> "ShardedIndex":
+        """Open the shards saved in shard_dir, each memory-mapped by its worker."""
+        shard_paths = []
+        while os.path.exists(os.path.join(shard_dir, SHARD_FILE.format(len(shard_paths)))):
+            shard_paths.append(os.path.join(shard_dir, SHARD_FILE.format(len(shard_paths))))
+        if not shard_paths:
+            raise FileNotFoundError(f"No shards in {shard_dir}.")
+
+        sharded = cls(len(shard_paths), strategy=strategy)
+        sharded.__start(len(shard_paths))
+        futures = [
+            executor.submit(_load_shard, shard_path, strategy)
+            for executor, shard_path in zip(sharded._executors, shard_paths)
+        ]
+        sharded.__set_doc_ids([future.result() for future in futures])
+        return sharded
+
+    def __start(self, n_shards: int) -> None:
+        self._executors = [ProcessPoolExecutor(max_workers=1) for _ in range(n_shards)]
+
+    def __set_doc_ids(self, doc_ids: list[DocTable]) -> None:
+        self._doc_ids = doc_ids
+        self._offsets = [0, *accumulate(len(shard_doc_ids) for shard_doc_ids in doc_ids)][:-1]
+
+    def close(self) -> None:
+        """Stop the shard workers."""
+        for executor in self._executors:
+            executor.shutdown(wait=True, cancel_futures=True)
+        self._executors = []
+
+    def __enter__(self) -> "ShardedIndex":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def __len__(self) -> int:
+        return sum(len(shard_doc_ids) for shard_doc_ids in self._doc_ids)
+
+    def shard_sizes(self) -> list[int]:
+        """Number of documents of each shard, in shard order."""
+        return [len(shard_doc_ids) for shard_doc_ids in self._doc_ids]
+
+    def __scatter(self, queries: list[str], limit: Optional[int]) -> list[list[array]]:
+        """Send the queries to every shard at once, return [shard][query] local IDs in shard order."""
+        if not self._executors:
+            raise RuntimeError("The sharded index is not built or loaded.")
+        futures = [executor.submit(_query_shard, queries, limit) for executor in self._executors]
+        # A malformed query fails on every shard, the first error is raised
+        return [future.result() for future in futures]
+
+    def search_batch(self, queries: list[str], limit: Optional[int] = None) -> list[list[str]]:
+        """Original doc IDs matching each RPN query (at most limit per query), in document order."""
+        per_shard = self.__scatter(queries, limit)
+        results = []
+        for i in range(len(queries)):
+            doc_ids = []
+            for shard_doc_ids, shard_results in zip(self._doc_ids, per_shard):
+                doc_ids.extend(shard_doc_ids.to_original(shard_results[i]))
+                if limit is not None and len(doc_ids) >= limit:
+                    break
+            results.append(doc_ids[:limit])
+        return results
+
+    def search(self, query: str, limit: Optional[int] = None) -> list[str]:
+        """Original doc IDs matching an RPN query (at most limit), in document order."""
+        return self.search_batch([query], limit)[0]
+
+    def retrieve_ids(self, query: str, limit: Optional[int] = None) -> list[int]:
+        """Global internal IDs matching an RPN query (those a single InvertedIndex over all the documents assigns)."""
+        per_shard = self.__scatter([query], limit)
+        internal_ids = []
+        for offset, shard_results in zip(self._offsets, per_shard):
+            internal_ids.extend(offset + internal_id for internal_id in shard_results[0])
+        return internal_ids[:limit]
+
+    def retrieve(
+        self,
+        query_file_path: str = "BooleanQueries.txt",
+        output_file_path: str = "Part_2.txt",
+        limit: Optional[int] = None
+        ) -> None:
+        """Evaluate Boolean RPN queries on all shards and write matching document IDs to file."""
+        queries = list(read_queries(query_file_path))
+
+        with open(output_file_path, "w", encoding="utf-8") as out_f:
+            for doc_ids in self.search_batch(queries, limit):
+                out_f.write(" ".join(doc_ids) + "\n")
+
+        logger.info("Boolean retrieval results written to %s", output_file_path)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+
+    # Load saved shards, or build them and save them for the next run
+    shard_dir = "shards"
+    if os.path.exists(shard_dir):
+        sharded_index = ShardedIndex.load(shard_dir)
+    else:
+        sharded_index = ShardedIndex()
+        sharded_index.build_index()
+        sharded_index.save(shard_dir)
+
+    with sharded_index:
+        print(sharded_index.shard_sizes())
+        sharded_index.retrieve()
@@ -0,0 +1,114 @@
+import re
+from array import array
+from bisect import bisect_left
+from typing import Iterable, Iterator, Optional
+
+# Length of the k-grams indexed for infix / suffix wildcards
+KGRAM_SIZE = 3
+# Marks the start and end of a term in its k-grams ("\0co": terms starting with "co"),
+# a character the analyzer never produces
+BOUNDARY = "\0"
+# Wildcard character of query patterns (any characters, possibly none)
+WILDCARD = "*"
+
+
+def is_pattern(token: str) -> bool:
+    """Whether a query token is a wildcard pattern (a lone * is a plain term)."""
+    return WILDCARD in token and bool(token.strip(WILDCARD))
+
+
+class TermDictionary:
+    """
+    Sorted vocabulary for prefix and wildcard term lookups
+    Prefix patterns (comput*) are a binary-searched range, O(log V + matches). Other patterns
+    (*ing, c*ter) intersect the term numbers of their k-grams when built with kgrams=True and
+    check the candidates against the pattern; without k-grams they scan the range of the
+    pattern's literal prefix (the whole vocabulary for a leading *).
+    """
+    def __init__(self, terms: Iterable[str], kgrams: bool = False, k: int = KGRAM_SIZE):
+        self.k = k
+        # ['term_a', 'term_b', ...] in code point order - a term's number is its position
+        self._terms: list[str] = sorted(terms)
+        # {'k-gram': array('I', [term numbers, ascending]), ...}
+        self._kgrams: Optional[dict[str, array]] = self.__index_kgrams() if kgrams else None
+
+    def __index_kgrams(self) -> dict[str, array]:
+        kgrams: dict[str, list[int]] = {}
+        for number, term in enumerate(self._terms):
+            padded = BOUNDARY + term + BOUNDARY
+            # Each k-gram once per term, so the number lists stay ascending and duplicate-free
+            for gram in {padded[i:i + self.k] for i in range(len(padded) - self.k + 1)}:
+                numbers = kgrams.get(gram)
+                if numbers is None:
+                    kgrams[gram] = [number]
+                else:
+                    numbers.append(number)
+        return {gram: array("I", numbers) for gram, numbers in kgrams.items()}
+
+    @property
+    def has_kgrams(self) -> bool:
+        return self._kgrams is not None
+
+    def __len__(self) -> int:
+        return len(self._terms)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._terms)
+
+    def __contains__(self, term: object) -> bool:
+        i = bisect_left(self._terms, term)
+        return i < len(self._terms) and self._terms[i] == term
+
+    def __range(self, prefix: str) -> tuple[int, int]:
+        """[lo, hi) term numbers of the terms starting with prefix."""
+        if not prefix:
+            return 0, len(self._terms)
+        lo = bisect_left(self._terms, prefix)
+        if ord(prefix[-1]) == 0x10FFFF:
+            return lo, len(self._terms)
+        # The smallest string after every string that starts with prefix
+        return lo, bisect_left(self._terms, prefix[:-1] + chr(ord(prefix[-1]) + 1), lo)
+
+    def prefix(self, prefix: str) -> list[str]:
+        """Terms starting with prefix, in sorted order."""
+        lo, hi = self.__range(prefix)
+        return self._terms[lo:hi]
+
+    def match(self, pattern: str) -> list[str]:
+        """Terms matching a wildcard pattern, in sorted order."""
+        if WILDCARD not in pattern:
+            return [pattern] if pattern in self else []
+
+        head, _, rest = pattern.partition(WILDCARD)
+        if not rest.strip(WILDCARD):
+            return self.prefix(head)  # comput*
+
+        regex = re.compile(".*".join(re.escape(piece) for piece in pattern.split(WILDCARD)), re.DOTALL)
+        lo, hi = self.__range(head)
+        if self._kgrams is not None:
+            candidates = self.__kgram_candidates(pattern, lo, hi)
+            if candidates is not None:
+                return list(filter(regex.fullmatch, [self._terms[number] for number in candidates]))
+        return list(filter(regex.fullmatch, self._terms[lo:hi]))
+
+    def __kgram_candidates(self, pattern: str, lo: int, hi: int) -> Optional[list[int]]:
+        """Ascending numbers (in [lo, hi)) of the terms having every k-gram of the pattern's literal pieces.
+
+        None when no piece is long enough to have a k-gram (e.g. *a*).
+        """
+        grams = {
+            piece[i:i + self.k]
+            for piece in (BOUNDARY + pattern + BOUNDARY).split(WILDCARD)
+            for i in range(len(piece) - self.k + 1)
+        }
+        if not grams:
+            return None
+
+        # Intersect starting from the rarest k-gram
+        postings = sorted((self._kgrams.get(gram, ()) for gram in grams), key=len)
+        candidates = {number for number in postings[0] if lo <= number < hi}
+        for numbers in postings[1:]:
+            if not candidates:
+                break
+            candidates.intersection_update(numbers)
+        return sorted(candidates)
@@ -0,0 +1,93 @@
+import os
+import random
+import sys
+import zipfile
+
+import pytest
+
+# The modules live at the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def write_corpus(data_dir: str, zips: dict[str, list[list[tuple[str, str]]]]) -> str:
+    """Write AP-format zips ({zip name: [member file: [(DOCNO, text), ...], ...]}) and return data_dir."""
+    os.makedirs(data_dir, exist_ok=True)
+    for zip_name, members in zips.items():
+        with zipfile.ZipFile(os.path.join(data_dir, zip_name), "w") as zip_file:
+            for number, documents in enumerate(members):
+                zip_file.writestr(f"{zip_name}.{number}", "".join(
+                    f"<DOC>\n<DOCNO> {doc_id} </DOCNO>\n<TEXT>\n{text}\n</TEXT>\n</DOC>\n"
+                    for doc_id, text in documents
+                ))
+    return data_dir
+
+
+@pytest.fixture
+def small_corpus(tmp_path) -> str:
+    """Two zips of two members each, 8 documents AP000001..AP000008."""
+    texts = [
+        "oil prices rise", "oil exports fall", "new york city council", "prices of oil in new york",
+        "the council votes", "york prices", "city oil council", "new prices",
+    ]
+    documents = [(f"AP{number:06d}", text) for number, text in enumerate(texts, start=1)]
+    return write_corpus(str(tmp_path / "data"), {
+        "ap1.zip": [documents[0:2], documents[2:4]],
+        "ap2.zip": [documents[4:6], documents[6:8]],
+    })
+
+
+# Skewed word weights: w0-w11 are in at least 1/16 of the documents (stored as bitmaps), the rest in a few
+WORDS = [f"w{number}" for number in range(30)]
+WEIGHTS = [1 / (rank + 1) ** 1.5 for rank in range(len(WORDS))]
+
+
+@pytest.fixture(scope="module")
+def random_corpus(tmp_path_factory) -> tuple[str, dict[str, set[str]]]:
+    """300 random documents in one zip, and {word: {DOCNO, ...}, ...}."""
+    rng = random.Random(0)
+    documents, doc_sets = [], {word: set() for word in WORDS}
+    for number in range(1, 301):
+        doc_id = f"AP{number:06d}"
+        words = rng.choices(WORDS, WEIGHTS, k=rng.randint(1, 12))
+        documents.append((doc_id, " ".join(words)))
+        for word in words:
+            doc_sets[word].add(doc_id)
+    data_dir = write_corpus(str(tmp_path_factory.mktemp("random") / "data"), {"ap.zip": [documents[:150], documents[150:]]})
+    return data_dir, doc_sets
+
+
+def random_queries(count: int, seed: int = 0) -> list[str]:
+    """RPN queries of 1-6 terms combined with random AND / OR / NOT."""
+    rng = random.Random(seed)
+    queries = []
+    for _ in range(count):
+        tokens = [rng.choice(WORDS)]
+        for _ in range(rng.randint(0, 5)):
+            tokens += [rng.choice(WORDS), rng.choice(["AND", "OR", "NOT"])]
+        queries.append(" ".join(tokens))
+    return queries
+
+
+def random_tree_queries(count: int, seed: int = 0) -> list[str]:
+    """Nested RPN queries (NOT chains, differences inside AND / OR, ...) of up to 4 levels."""
+    rng = random.Random(seed)
+
+    def subtree(depth: int) -> str:
+        if depth == 0 or rng.random() < 0.3:
+            return rng.choice(WORDS)
+        operator = rng.choice(["AND", "OR", "NOT", "NOT"])
+        return f"{subtree(depth - 1)} {subtree(depth - 1)} {operator}"
+
+    return [subtree(4) for _ in range(count)]
+
+
+def expected_result(text: str, doc_sets: dict[str, set[str]]) -> list[str]:
+    """Set-based evaluation of an RPN query (NOT is AND-NOT)."""
+    stack = []
+    for token in text.split():
+        if token in ("AND", "OR", "NOT"):
+            right, left = stack.pop(), stack.pop()
+            stack.append({"AND": left & right, "OR": left | right, "NOT": left - right}[token])
+        else:
+            stack.append(doc_sets.get(token, set()))
+    return sorted(stack.pop())
@@ -0,0 +1,42 @@
+from benchmarks.runBenchmarks import compare, workload_drift
+
+
+def results(**changes: float) -> dict:
+    values = {
+        "documents": 1000, "terms": 5000, "input_mb": 1.5, "serial_seconds": 2.0, "docs_per_second": 500.0,
+        "build_peak_mb": 40.0, "median_us": 10.0, "measured_selectivity": 0.01, "qps": 900.0, "queries": 300,
+    }
+    values.update(changes)
+    return {
+        "environment": {"cpus": 8},
+        "config": {"documents": 1000},
+        "indexing": {
+            "documents": values["documents"], "terms": values["terms"], "input_mb": values["input_mb"],
+            "serial": {"seconds": values["serial_seconds"], "docs_per_second": values["docs_per_second"]},
+        },
+        "memory": {"build_peak_mb": values["build_peak_mb"]},
+        "operators": {"AND@0.01": {"median_us": values["median_us"], "measured_selectivity": values["measured_selectivity"]}},
+        "queries": {"boolean": {"queries": values["queries"], "qps": values["qps"]}},
+    }
+
+
+def test_compare_uses_metric_directions():
+    baseline = results()
+    assert compare(results(), baseline) == []
+    assert compare(results(serial_seconds=1.0, docs_per_second=1000.0, qps=800.0, build_peak_mb=50.0), baseline) == [
+        "improved indexing.serial.seconds: 2.0 -> 1.0 (-50%)",
+        "improved indexing.serial.docs_per_second: 500.0 -> 1000.0 (+100%)",
+        "REGRESSED memory.build_peak_mb: 40.0 -> 50.0 (+25%)",
+        "REGRESSED queries.boolean.qps: 900.0 -> 800.0 (-11%)",
+    ]
+    # Changes within the tolerance, and numbers that aren't metrics, are not reported
+    assert compare(results(median_us=10.5, queries=600, terms=9000, measured_selectivity=0.02), baseline) == []
+
+
+def test_workload_drift_is_reported_apart():
+    baseline = results()
+    assert workload_drift(results(qps=100.0), baseline) == []
+    assert workload_drift(results(documents=2000, measured_selectivity=0.0101), baseline) == [
+        "indexing.documents: 1000 -> 2000",
+        "operators.AND@0.01.measured_selectivity: 0.01 -> 0.0101",
+    ]
@@ -0,0 +1,332 @@
+import random
+from itertools import permutations
+
+import pytest
+
+from booleanRetrieval import BooleanRetrieval
+from invertedIndex import InvertedIndex
+from postingsList import PostingsList
+
+from conftest import WORDS, expected_result, random_queries, random_tree_queries, write_corpus
+
+
+def query(index: InvertedIndex, retrieval: BooleanRetrieval, text: str) -> list[str]:
+    return index.get_doc_id_map().to_original(retrieval._execute_query_retrieval(text.split(), index.get_index()))
+
+
+@pytest.mark.parametrize("kgrams", [False, True])
+def test_wildcards_follow_index_updates(small_corpus, tmp_path, kgrams):
+    index = InvertedIndex()
+    index.build_index(small_corpus)
+    retrieval = BooleanRetrieval(term_dictionary=index.get_term_dictionary, kgrams=kgrams)
+
+    assert query(index, retrieval, "pri*") == ["AP000001", "AP000004", "AP000006", "AP000008"]
+    assert query(index, retrieval, "*ports") == ["AP000002"]
+    assert index.get_term_dictionary(kgrams) is index.get_term_dictionary(kgrams)
+
+    extra = write_corpus(str(tmp_path / "extra"), {"ap3.zip": [[("AP000009", "imports prison")]]})
+    index.add_documents(f"{extra}/ap3.zip")
+    assert query(index, retrieval, "pri*") == ["AP000001", "AP000004", "AP000006", "AP000008", "AP000009"]
+    assert query(index, retrieval, "*ports") == ["AP000002", "AP000009"]
+
+
+def test_wildcards_without_term_dictionary_are_plain_terms(small_corpus):
+    index = InvertedIndex()
+    index.build_index(small_corpus)
+    assert query(index, BooleanRetrieval(), "pri*") == []
+
+
+def test_queries_match_set_operations(random_corpus):
+    data_dir, doc_sets = random_corpus
+    index = InvertedIndex()
+    index.build_index(data_dir)
+    retrieval = BooleanRetrieval()
+    for text in random_queries(200):
+        assert query(index, retrieval, text) == expected_result(text, doc_sets), text
+
+
+@pytest.fixture(scope="module")
+def skewed_index() -> dict[str, PostingsList]:
+    """Compressed lists of 40, 1500 and 12000 of 20000 doc IDs."""
+    rng = random.Random(4)
+    return {
+        term: PostingsList(sorted(rng.sample(range(1, 20001), size)))
+        for term, size in [("rare", 40), ("some", 1500), ("common", 12000)]
+    }
+
+
+@pytest.mark.parametrize("strategy", ["merge", "gallop", "auto"])
+def test_strategies_agree(skewed_index, strategy):
+    retrieval = BooleanRetrieval(strategy=strategy, optimize=False)
+    doc_sets = {term: set(postings) for term, postings in skewed_index.items()}
+    for left, right in permutations(skewed_index, 2):
+        for operator in ("AND", "NOT"):
+            text = f"{left} {right} {operator}"
+            assert retrieval._execute_query_retrieval(text.split(), skewed_index) == expected_result(text, doc_sets), text
+
+
+@pytest.mark.parametrize("strategy, text, algorithm", [
+    ("auto", "rare common AND", "gallop"),
+    ("auto", "common rare AND", "gallop"),
+    ("auto", "some common AND", "merge"),
+    ("auto", "rare common NOT", "gallop"),
+    ("auto", "common rare NOT", "merge"),
+    ("merge", "rare common AND", "merge"),
+    ("gallop", "some common AND", "gallop"),
+])
+def test_strategy_choice(skewed_index, strategy, text, algorithm):
+    records = []
+    BooleanRetrieval(strategy=strategy, optimize=False, sink=records.append)._execute_query_retrieval(
+        text.split(), skewed_index
+    )
+    assert [operation["algorithm"] for operation in records[0]["operations"]] == [algorithm]
+
+
+def test_unknown_strategy():
+    with pytest.raises(ValueError, match="Unknown strategy"):
+        BooleanRetrieval(strategy="skip")
+
+
+def test_optimized_plans_match_written_order(random_corpus):
+    data_dir, doc_sets = random_corpus
+    index = InvertedIndex()
+    index.build_index(data_dir)
+    optimized, unoptimized = BooleanRetrieval(), BooleanRetrieval(optimize=False)
+    for text in random_tree_queries(300) + ["w1 w2 NOT w3 NOT w4 NOT", "w0 w1 w2 NOT AND w3 w4 NOT AND"]:
+        expected = expected_result(text, doc_sets)
+        assert query(index, optimized, text) == expected, text
+        assert query(index, unoptimized, text) == expected, text
+
+
+POSITIONAL_WORDS = ["new", "york", "city", "oil", "prices", "rise"]
+
+
+def random_documents(first: int, count: int, seed: int) -> list[tuple[str, str]]:
+    rng = random.Random(seed)
+    return [
+        (f"AP{number:06d}", " ".join(rng.choices(POSITIONAL_WORDS, k=rng.randint(1, 12))))
+        for number in range(first, first + count)
+    ]
+
+
+def expected_positional(text: str, documents: list[tuple[str, str]]) -> list[str]:
+    """DOCNOs where left is followed by right (PHRASE) or within distance of it (NEAR/k)."""
+    left, right, operator = text.split()
+    matched = []
+    for doc_id, document in documents:
+        tokens = document.split()
+        lefts = [i for i, token in enumerate(tokens) if token == left]
+        rights = [j for j, token in enumerate(tokens) if token == right]
+        if operator == "PHRASE":
+            found = any(i + 1 == j for i in lefts for j in rights)
+        else:
+            distance = int(operator.split("/")[1])
+            found = any(abs(i - j) <= distance for i in lefts for j in rights)
+        if found:
+            matched.append(doc_id)
+    return matched
+
+
+def positional_queries() -> list[str]:
+    return [
+        f"{left} {right} {operator}"
+        for left, right in permutations(POSITIONAL_WORDS[:4], 2)
+        for operator in ("PHRASE", "NEAR/1", "NEAR/3")
+    ] + ["oil oil NEAR/2"]
+
+
+def positional_query(index: InvertedIndex, text: str) -> list[str]:
+    doc_ids = BooleanRetrieval()._execute_query_retrieval(
+        text.split(), index.get_index(), positional_index=index.get_positional_index()
+    )
+    return index.get_doc_id_map().to_original(doc_ids)
+
+
+def test_phrase_and_near_after_updates(tmp_path):
+    documents = random_documents(1, 80, seed=6)
+    added = random_documents(81, 20, seed=7)
+    data_dir = write_corpus(str(tmp_path / "data"), {"ap.zip": [documents[:40], documents[40:]]})
+    write_corpus(str(tmp_path / "new"), {"new.zip": [added]})
+
+    index = InvertedIndex(positional=True)
+    index.build_index(data_dir)
+    for text in positional_queries():
+        assert positional_query(index, text) == expected_positional(text, documents), text
+
+    deleted = {doc_id for doc_id, _ in documents[::3]}
+    index.delete_documents(deleted)
+    index.add_documents(str(tmp_path / "new" / "new.zip"))
+    remaining = [document for document in documents + added if document[0] not in deleted]
+    for text in positional_queries():
+        assert positional_query(index, text) == expected_positional(text, remaining), text
+
+    index.compact()
+    for text in positional_queries():
+        assert positional_query(index, text) == expected_positional(text, remaining), text
+
+
+def test_positional_operators_need_positions(small_corpus):
+    index = InvertedIndex()
+    index.build_index(small_corpus)
+    with pytest.raises(ValueError, match="positional index"):
+        BooleanRetrieval()._execute_query_retrieval("new york PHRASE".split(), index.get_index())
+
+
+@pytest.mark.parametrize("text, algorithm", [
+    ("w0 w1 AND", "bitmap"),
+    ("w0 w29 AND", "bitmap-probe"),
+    ("w29 w0 NOT", "bitmap-probe"),
+    ("w0 w29 OR", "bitmap-set"),
+    ("w15 w29 AND", "merge"),
+])
+def test_bitmap_operations(random_corpus, text, algorithm):
+    data_dir, doc_sets = random_corpus
+    index = InvertedIndex()
+    index.build_index(data_dir)
+    records = []
+    retrieval = BooleanRetrieval(optimize=False, sink=records.append)
+    assert query(index, retrieval, text) == expected_result(text, doc_sets)
+    assert [operation["algorithm"] for operation in records[0]["operations"]] == [algorithm]
+
+
+def test_batch_matches_single_queries(random_corpus):
+    data_dir, doc_sets = random_corpus
+    index = InvertedIndex()
+    index.build_index(data_dir)
+    # Queries sharing sub-expressions, plus repeats
+    queries = [f"{text} w{n % 5} AND" for n, text in enumerate(random_tree_queries(60, seed=10))] * 2
+    results = BooleanRetrieval().retrieve_batch(queries, index.get_index())
+    assert [index.get_doc_id_map().to_original(result) for result in results] == [
+        expected_result(text, doc_sets) for text in queries
+    ]
+
+
+def test_batch_evaluates_shared_sub_expressions_once(random_corpus):
+    data_dir, doc_sets = random_corpus
+    index = InvertedIndex()
+    index.build_index(data_dir)
+    records = []
+    queries = ["w12 w13 OR w1 AND", "w1 w13 w12 OR AND w2 NOT", "w14 w15 AND"]
+    results = BooleanRetrieval(sink=records.append).retrieve_batch(queries, index.get_index())
+
+    assert [index.get_doc_id_map().to_original(result) for result in results] == [
+        expected_result(text, doc_sets) for text in queries
+    ]
+    # (w12 OR w13) AND w1 is computed by the first query, taken from the batch memo by the second
+    cached = [[node["node"] for node in record["nodes"] if node["cached"]] for record in records]
+    assert cached[0] == [] and cached[2] == []
+    assert len(cached[1]) == 1 and set(cached[1][0].split()) == {"w1", "w12", "w13", "OR", "AND"}
+
+
+@pytest.mark.parametrize("optimize", [True, False])
+def test_lazy_matches_eager(random_corpus, optimize):
+    data_dir, doc_sets = random_corpus
+    index = InvertedIndex()
+    index.build_index(data_dir)
+    retrieval = BooleanRetrieval(optimize=optimize)
+    doc_map = index.get_doc_id_map()
+    for text in random_queries(100, seed=5) + random_tree_queries(100, seed=5) + ["w0 w1 w2 w3 w4 AND AND AND AND"]:
+        expected = expected_result(text, doc_sets)
+        assert doc_map.to_original(list(retrieval.iter_query(text, index.get_index()))) == expected, text
+        assert doc_map.to_original(list(retrieval.iter_query(text, index.get_index(), limit=3))) == expected[:3], text
+
+
+class CountingPostings(list):
+    """Doc IDs that count how many were read through iteration."""
+    def __iter__(self):
+        self.read = 0
+        for doc_id in super().__iter__():
+            self.read += 1
+            yield doc_id
+
+
+def test_lazy_evaluation_stops_early():
+    inverted_index = {
+        "odd": CountingPostings(range(1, 20001, 2)),
+        "even": CountingPostings(range(2, 20001, 2)),
+        "third": CountingPostings(range(3, 20001, 3)),
+    }
+    records = []
+    retrieval = BooleanRetrieval(sink=records.append)
+
+    assert list(retrieval.iter_query("odd even OR", inverted_index, limit=10)) == list(range(1, 11))
+    assert inverted_index["odd"].read <= 6 and inverted_index["even"].read <= 6
+    assert records[-1]["result_size"] == 10
+
+    # Stopping the iterator also stops the evaluation, and the profile counts what was consumed
+    doc_ids = retrieval.iter_query("odd third AND", inverted_index)
+    assert [next(doc_ids) for _ in range(4)] == [3, 9, 15, 21]
+    doc_ids.close()
+    assert inverted_index["third"].read <= 8
+    assert records[-1]["result_size"] == 4
+
+    assert list(retrieval.iter_query("odd even OR", inverted_index, limit=0)) == []
+    with pytest.raises(ValueError):
+        retrieval.iter_query("odd AND", inverted_index)
+
+
+@pytest.mark.parametrize("limit", [None, 2])
+def test_lazy_retrieve_writes_the_eager_output(random_corpus, tmp_path, limit):
+    data_dir, doc_sets = random_corpus
+    index = InvertedIndex()
+    index.build_index(data_dir)
+    queries = random_tree_queries(30, seed=6)
+    query_file = tmp_path / "queries.txt"
+    query_file.write_text("\n".join(queries) + "\n")
+
+    for lazy in (False, True):
+        BooleanRetrieval(lazy=lazy).retrieve(
+            index.get_index(), index.get_doc_id_map(), str(query_file), str(tmp_path / f"{lazy}.txt"), limit=limit
+        )
+    lines = (tmp_path / "True.txt").read_text().splitlines()
+    assert lines == (tmp_path / "False.txt").read_text().splitlines()
+    assert [line.split() for line in lines] == [expected_result(text, doc_sets)[:limit] for text in queries]
+
+
+def chain(words: list[str], operator: str) -> str:
+    return " ".join([words[0]] + [f"{word} {operator}" for word in words[1:]])
+
+
+@pytest.mark.parametrize("operator", ["AND", "OR"])
+@pytest.mark.parametrize("optimize", [True, False])
+def test_n_ary_chains_match_pairwise_results(random_corpus, operator, optimize):
+    data_dir, doc_sets = random_corpus
+    index = InvertedIndex()
+    index.build_index(data_dir)
+    retrieval = BooleanRetrieval(optimize=optimize)
+    doc_map = index.get_doc_id_map()
+    rng = random.Random(7)
+    for _ in range(40):
+        # Bitmaps (w0-w11) and compressed lists mixed, sometimes a sub-expression operand
+        words = rng.sample(WORDS[:6], 2) + rng.sample(WORDS[6:], rng.randint(1, 5))
+        text = chain(words, operator) + rng.choice(["", " w3 w20 NOT " + operator])
+        expected = expected_result(text, doc_sets)
+        assert query(index, retrieval, text) == expected, text
+        assert doc_map.to_original(list(retrieval.iter_query(text, index.get_index()))) == expected, text
+
+
+def test_long_chains_do_not_recurse(random_corpus):
+    data_dir, doc_sets = random_corpus
+    index = InvertedIndex()
+    index.build_index(data_dir)
+    words = [WORDS[number % len(WORDS)] for number in range(2000)]
+    retrieval = BooleanRetrieval(optimize=False)
+    for operator in ("AND", "OR"):
+        text = chain(words, operator)
+        expected = expected_result(text, doc_sets)
+        assert query(index, retrieval, text) == expected
+        assert index.get_doc_id_map().to_original(list(retrieval.iter_query(text, index.get_index()))) == expected
+
+
+def test_or_of_many_operands_is_one_operation(skewed_index, random_corpus):
+    records = []
+    retrieval = BooleanRetrieval(sink=records.append)
+    retrieval._execute_query_retrieval("rare some OR common OR".split(), skewed_index)
+    assert [(operation["operator"], operation["algorithm"]) for operation in records[0]["operations"]] == [("OR", "set-sort")]
+    assert sorted(records[0]["operations"][0]["input_sizes"]) == [40, 1500, 12000]
+
+    data_dir, _ = random_corpus
+    index = InvertedIndex()
+    index.build_index(data_dir)
+    retrieval._execute_query_retrieval(chain(["w0", "w1", "w20", "w21"], "OR").split(), index.get_index())
+    assert [operation["algorithm"] for operation in records[1]["operations"]] == ["bitmap-set"]
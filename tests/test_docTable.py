@@ -0,0 +1,76 @@
+import pickle
+from array import array
+
+import pytest
+
+from docTable import DocTable
+from invertedIndex import InvertedIndex
+
+from conftest import write_corpus
+
+
+def test_lookups():
+    table = DocTable(["AP000001", "AP000002"])
+    assert table.append("AP000003") == 3
+    assert dict(table) == {1: "AP000001", 2: "AP000002", 3: "AP000003"}
+    assert table.to_original([3, 1, 3]) == ["AP000003", "AP000001", "AP000003"]
+    with pytest.raises(KeyError):
+        table[0]
+    with pytest.raises(KeyError):
+        table[4]
+
+    assert table.internal_id("AP000002") == 2 and table.internal_id("AP999999") is None
+    # The reverse lookup follows later appends
+    table.append("AP000004")
+    assert table.to_internal(["AP000004", "AP000001", "missing"]) == [4, 1, None]
+    assert table.to_original([4]) == ["AP000004"]
+
+    table.forget([1])
+    assert table.internal_id("AP000001") is None and table[1] == "AP000001"
+
+
+def test_non_ascii_doc_ids():
+    table = DocTable(["AP000001", "ÄP000002", "AP000003"])
+    assert table.to_original([1, 2, 3]) == ["AP000001", "ÄP000002", "AP000003"]
+    assert table[2] == "ÄP000002" and table.internal_id("AP000003") == 3
+
+
+def test_extend_with_a_table():
+    table = DocTable(["AP000001", "AP000002"])
+    table.internal_id("AP000001")  # Reverse lookup built before the extend
+    table.extend(DocTable(["ÄP000003", "AP000004"]))
+    assert table.to_original(table) == ["AP000001", "AP000002", "ÄP000003", "AP000004"]
+    assert table.to_internal(["AP000004", "ÄP000003"]) == [4, 3]
+
+
+def test_table_over_a_buffer_copies_on_append():
+    blob = bytearray(b"AP000001AP000002")
+    offsets = array("Q", [0, 8, 16])
+    table = DocTable.from_buffer(memoryview(blob).toreadonly(), memoryview(offsets))
+    assert table.to_original([2, 1]) == ["AP000002", "AP000001"]
+    assert table.append("AP000003") == 3
+    assert table.to_original(table) == ["AP000001", "AP000002", "AP000003"]
+    assert blob == b"AP000001AP000002"
+
+    copy = pickle.loads(pickle.dumps(table))
+    assert dict(copy) == dict(table) and copy.internal_id("AP000003") == 3
+
+
+def test_index_doc_table_round_trip(small_corpus, tmp_path):
+    index = InvertedIndex()
+    index.build_index(small_corpus)
+    doc_ids = [f"AP{number:06d}" for number in range(1, 9)]
+    assert index.get_doc_id_map().to_original(range(1, 9)) == doc_ids
+
+    index.save(str(tmp_path / "index.bin"))
+    loaded = InvertedIndex.load(str(tmp_path / "index.bin"))
+    doc_table = loaded.get_doc_id_map()
+    assert isinstance(doc_table, DocTable) and dict(doc_table) == dict(index.get_doc_id_map())
+    assert doc_table.to_internal(doc_ids[::-1]) == list(range(8, 0, -1))
+
+    # Deletions find documents through the reverse lookup, additions copy the mapped table
+    assert loaded.delete_documents(["AP000002", "AP000099"]) == 1
+    extra = write_corpus(str(tmp_path / "extra"), {"ap3.zip": [[("AP000009", "oil")]]})
+    loaded.add_documents(f"{extra}/ap3.zip")
+    assert loaded.get_doc_id_map().to_original([9]) == ["AP000009"]
+    assert loaded.get_doc_id_map().internal_id("AP000009") == 9
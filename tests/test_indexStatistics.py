@@ -0,0 +1,77 @@
+from collections import Counter
+
+import pytest
+
+from invertedIndex import InvertedIndex
+
+from conftest import write_corpus
+
+
+def expected_frequencies(index: InvertedIndex) -> dict[str, int]:
+    return {term: len(postings) for term, postings in index.get_index().items() if len(postings)}
+
+
+def check_statistics(index: InvertedIndex) -> None:
+    statistics = index.get_statistics()
+    frequencies = expected_frequencies(index)
+    assert {term: statistics.document_frequency(term) for term in frequencies} == frequencies
+    assert statistics.df_histogram() == dict(sorted(Counter(frequencies.values()).items()))
+    assert [frequency for _, frequency in statistics.top_terms(3)] == sorted(frequencies.values(), reverse=True)[:3]
+    assert [frequency for _, frequency in statistics.bottom_terms(3)] == sorted(frequencies.values())[:3]
+    assert all(frequencies[term] == frequency for term, frequency in statistics.top_terms(3))
+    summary = statistics.summary()
+    assert summary["vocabulary_size"] == len(frequencies)
+    assert summary["postings"] == sum(frequencies.values())
+
+
+@pytest.mark.parametrize("build_options", [{}, {"workers": 2}, {"memory_budget": 1}])
+def test_statistics_after_build(small_corpus, tmp_path, build_options):
+    index = InvertedIndex()
+    index.build_index(small_corpus, index_path=str(tmp_path / "index.bin"), **build_options)
+    check_statistics(index)
+    assert index.get_top_10_terms()[0] in (("oil", 4), ("prices", 4))
+    assert index.get_statistics().summary()["documents"] == 8
+
+
+def test_statistics_after_load(small_corpus, tmp_path):
+    index = InvertedIndex()
+    index.build_index(small_corpus)
+    index.save(str(tmp_path / "index.bin"))
+    loaded = InvertedIndex.load(str(tmp_path / "index.bin"))
+    check_statistics(loaded)
+    assert loaded.get_statistics().summary() == index.get_statistics().summary()
+
+
+def test_statistics_after_updates(small_corpus, tmp_path):
+    index = InvertedIndex()
+    index.build_index(small_corpus)
+    extra = write_corpus(str(tmp_path / "extra"), {"ap3.zip": [[("AP000009", "oil council tax"), ("AP000010", "tax")]]})
+    index.add_documents(f"{extra}/ap3.zip")
+    check_statistics(index)
+    assert index.get_statistics().document_frequency("tax") == 2
+
+    index.delete_documents(["AP000001", "AP000010"])
+    assert index.get_statistics().summary()["deleted_documents"] == 2
+    index.compact()
+    check_statistics(index)
+    summary = index.get_statistics().summary()
+    assert summary["documents"] == 8
+    assert summary["deleted_documents"] == 0
+    assert index.get_statistics().document_frequency("tax") == 1
+
+
+def test_top_and_lowest_terms_follow_baseline_order(tmp_path):
+    # Many df ties: the baseline stably sorted the whole vocabulary by decreasing df
+    texts = [f"common w{number} w{number + 1} rare{number}" for number in range(30)]
+    data_dir = write_corpus(str(tmp_path / "data"), {
+        "ap1.zip": [[(f"AP{number:06d}", text) for number, text in enumerate(texts[:15])]],
+        "ap2.zip": [[(f"AP{number:06d}", text) for number, text in enumerate(texts[15:], start=15)]],
+    })
+    index = InvertedIndex()
+    index.build_index(data_dir)
+    baseline = sorted(
+        ((term, len(postings)) for term, postings in index.get_index().items()), key=lambda item: item[1], reverse=True
+    )
+    assert index.get_lowest_10_terms() == baseline[-10:]
+    assert [frequency for _, frequency in index.get_top_10_terms()] == [frequency for _, frequency in baseline[:10]]
+    assert index.get_top_10_terms()[0] == ("common", 30)
@@ -0,0 +1,46 @@
+import pytest
+
+from invertedIndex import InvertedIndex
+
+
+def test_build_index_on_loaded_index_raises(small_corpus, tmp_path):
+    index = InvertedIndex()
+    index.build_index(small_corpus)
+    index.save(str(tmp_path / "index.bin"))
+
+    loaded = InvertedIndex.load(str(tmp_path / "index.bin"))
+    with pytest.raises(RuntimeError, match="read-only"):
+        loaded.build_index(small_corpus)
+    # Still usable, and open to add_documents
+    assert loaded.get_index()["oil"].to_list() == index.get_index()["oil"].to_list()
+    assert loaded.add_documents(f"{small_corpus}/ap1.zip") == 4
+
+
+def test_save_over_loaded_index(small_corpus, tmp_path):
+    index_path = str(tmp_path / "index.bin")
+    index = InvertedIndex()
+    index.build_index(small_corpus)
+    index.save(index_path)
+
+    # The loaded index maps index_path while it is rewritten
+    loaded = InvertedIndex.load(index_path)
+    loaded.save(index_path)
+    assert loaded.get_index()["oil"].to_list() == [1, 2, 4, 7]
+    assert loaded.get_doc_id_map()[8] == "AP000008"
+
+    reloaded = InvertedIndex.load(index_path)
+    assert reloaded.get_index()["oil"].to_list() == [1, 2, 4, 7]
+    assert list(reloaded.get_doc_id_map().values()) == list(index.get_doc_id_map().values())
+    assert [name for name in tmp_path.iterdir() if name.suffix == ".tmp"] == []
+
+
+def test_spimi_build_needs_an_index_path(small_corpus, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    with pytest.raises(ValueError, match="index_path"):
+        InvertedIndex().build_index(small_corpus, memory_budget=1)
+    assert not (tmp_path / "index.bin").exists()
+
+    index = InvertedIndex()
+    index.build_index(small_corpus, memory_budget=1, index_path=str(tmp_path / "spimi.bin"))
+    assert index.get_index()["oil"].to_list() == [1, 2, 4, 7]
+    assert sorted(path.name for path in tmp_path.iterdir()) == ["data", "spimi.bin"]
@@ -0,0 +1,54 @@
+import random
+
+import pytest
+
+import booleanRetrieval
+from booleanRetrieval import BooleanRetrieval
+from invertedIndex import InvertedIndex
+from postingsList import BitmapPostings, PostingsList
+
+from conftest import expected_result, random_tree_queries
+
+
+def query(index: InvertedIndex, retrieval: BooleanRetrieval, text: str) -> list[str]:
+    return index.get_doc_id_map().to_original(retrieval._execute_query_retrieval(text.split(), index.get_index()))
+
+
+def test_falls_back_to_python_without_numpy(monkeypatch, small_corpus):
+    monkeypatch.setattr(booleanRetrieval, "numpy_available", lambda: False)
+    for backend in ("auto", "numpy"):
+        retrieval = BooleanRetrieval(backend=backend)
+        assert retrieval.backend == "python"
+
+    index = InvertedIndex()
+    index.build_index(small_corpus)
+    assert query(index, BooleanRetrieval(backend="numpy"), "oil prices AND") == ["AP000001", "AP000004"]
+
+
+def test_unknown_backend():
+    with pytest.raises(ValueError, match="Unknown backend"):
+        BooleanRetrieval(backend="gpu")
+
+
+def test_to_array_decodes_postings():
+    np = pytest.importorskip("numpy")
+    from numpyBackend import to_array
+
+    rng = random.Random(13)
+    doc_ids = sorted(rng.sample(range(1, 3_000_000), 3000))
+    for postings in (PostingsList(doc_ids), BitmapPostings(doc_ids), doc_ids):
+        array = to_array(postings)
+        assert array.dtype == np.int32 and array.tolist() == doc_ids
+    assert to_array(PostingsList()).tolist() == []
+
+
+@pytest.mark.parametrize("strategy", ["merge", "gallop", "auto"])
+def test_numpy_matches_python(random_corpus, strategy):
+    pytest.importorskip("numpy")
+    data_dir, doc_sets = random_corpus
+    index = InvertedIndex()
+    index.build_index(data_dir)
+    retrieval = BooleanRetrieval(backend="numpy", strategy=strategy)
+    assert retrieval.backend == "numpy"
+    for text in random_tree_queries(200, seed=13):
+        assert query(index, retrieval, text) == expected_result(text, doc_sets), text
@@ -0,0 +1,217 @@
+import random
+from array import array
+from bisect import bisect_left
+
+import pytest
+
+import invertedIndex
+from invertedIndex import InvertedIndex
+from postingsList import BITMAP_DENSITY, SKIP_INTERVAL, BitmapPostings, FrequencyList, PostingsList, optimize_postings
+
+from conftest import write_corpus
+
+
+def appended(doc_ids: list[int]) -> PostingsList:
+    postings = PostingsList()
+    for doc_id in doc_ids:
+        postings.append(doc_id)
+    return postings
+
+
+def random_doc_ids(rng: random.Random, count: int, max_gap: int) -> list[int]:
+    doc_ids, doc_id = [], 0
+    for _ in range(count):
+        doc_id += rng.randint(1, max_gap)
+        doc_ids.append(doc_id)
+    return doc_ids
+
+
+@pytest.mark.parametrize("max_gap", [1, 100, 200_000])
+def test_postings_round_trip(max_gap):
+    doc_ids = random_doc_ids(random.Random(0), 1000, max_gap)
+    postings = PostingsList(doc_ids)
+    assert list(postings) == postings.to_list() == doc_ids
+    assert len(postings) == 1000 and postings.last_id == doc_ids[-1]
+    # One byte per gap below 128, up to three below 2^21
+    assert postings.nbytes == 1000 if max_gap < 128 else 1000 < postings.nbytes <= 3000
+
+
+def test_postings_cursor_advance():
+    rng = random.Random(1)
+    doc_ids = random_doc_ids(rng, 2000, 50)
+    postings = PostingsList(doc_ids)
+    cursor = postings.cursor()
+    target = 0
+    while True:
+        target += rng.randint(0, 400)
+        position = bisect_left(doc_ids, target)
+        expected = doc_ids[position] if position < len(doc_ids) else None
+        assert cursor.advance(target) == expected
+        if expected is None:
+            break
+        assert cursor.index == position
+    assert cursor.advance(1) is None
+
+
+def test_postings_concat_with_offset():
+    first = random_doc_ids(random.Random(2), 150, 300)
+    second = random_doc_ids(random.Random(3), 200, 300)
+    postings = PostingsList(first)
+    postings.concat(PostingsList(second), offset=first[-1])
+    expected = first + [doc_id + first[-1] for doc_id in second]
+    assert postings.to_list() == expected
+    assert postings.to_bytes() == PostingsList(expected).to_bytes()
+    cursor = postings.cursor()
+    assert [cursor.advance(doc_id) for doc_id in expected[::37]] == expected[::37]
+
+
+@pytest.mark.parametrize("max_gap", [1, 127, 300, 20000, 3_000_000])
+@pytest.mark.parametrize("chunk", [1, 5, SKIP_INTERVAL, 1000])
+def test_postings_extend_matches_append(max_gap, chunk):
+    doc_ids = random_doc_ids(random.Random(max_gap), 700, max_gap)
+
+    postings = PostingsList()
+    for start in range(0, len(doc_ids), chunk):
+        postings.extend(doc_ids[start:start + chunk])
+
+    expected = appended(doc_ids)
+    assert postings.to_bytes() == expected.to_bytes()
+    assert [list(pointers) for pointers in postings.skip_pointers()] == [list(pointers) for pointers in expected.skip_pointers()]
+    assert (len(postings), postings.last_id) == (len(doc_ids), doc_ids[-1])
+    assert postings.to_list() == doc_ids
+
+
+@pytest.mark.parametrize("doc_ids", [[5, 5], [5, 3], [2]])
+def test_postings_extend_rejects_unsorted(doc_ids):
+    postings = PostingsList([2])
+    with pytest.raises(ValueError):
+        postings.extend(doc_ids)
+    assert postings.to_list() == [2]
+
+
+def test_frequency_list_extend_widens_once():
+    frequencies = FrequencyList([1, 2])
+    frequencies.extend(array("I", [3, 70000, 4]))
+    frequencies.extend(iter([5]))
+    assert list(frequencies) == [1, 2, 3, 70000, 4, 5]
+    assert frequencies.nbytes == 6 * 4
+
+
+@pytest.mark.parametrize("first, second", [([300], [1]), ([1], [300]), ([70000], [300, 2]), ([2, 300], [70000])])
+def test_frequency_list_concat_mixed_widths(first, second):
+    frequencies = FrequencyList(first)
+    frequencies.concat(FrequencyList(second))
+    assert list(frequencies) == first + second
+
+
+def test_frequency_list_concat_mapped():
+    other = FrequencyList.from_buffer(FrequencyList([1, 2]).to_bytes(), 2)
+    frequencies = FrequencyList([300])
+    frequencies.concat(other)
+    assert list(frequencies) == [300, 1, 2]
+
+
+@pytest.fixture
+def mixed_frequency_corpus(tmp_path) -> str:
+    """"oil" 300 times in the first document (2-byte frequencies), then once per document."""
+    members = [[("AP000001", "oil " * 300 + "prices")]]
+    members += [[(f"AP{number:06d}", f"oil prices {number}")] for number in range(2, 5)]
+    return write_corpus(str(tmp_path / "data"), {"ap.zip": members})
+
+
+def frequencies(index: InvertedIndex) -> dict[str, list[int]]:
+    return {term: list(frequency_list) for term, frequency_list in index.get_frequency_index().items()}
+
+
+@pytest.mark.parametrize("build_options", [{"workers": 2}, {"memory_budget": 1}])
+def test_build_with_mixed_frequency_widths(mixed_frequency_corpus, tmp_path, build_options):
+    serial = InvertedIndex()
+    serial.build_index(mixed_frequency_corpus)
+
+    index = InvertedIndex()
+    index.build_index(mixed_frequency_corpus, index_path=str(tmp_path / "index.bin"), **build_options)
+
+    assert frequencies(index) == frequencies(serial)
+    assert frequencies(index)["oil"] == [300, 1, 1, 1]
+
+
+def test_add_documents_with_mixed_frequency_widths(tmp_path):
+    data_dir = write_corpus(str(tmp_path / "data"), {
+        "ap1.zip": [[("AP000001", "oil " * 300)]],
+        "ap2.zip": [[("AP000002", "oil prices")]],
+        "ap3.zip": [[("AP000003", "oil")]],
+    })
+    index = InvertedIndex()
+    index.add_documents(f"{data_dir}/ap1.zip")
+    index.add_documents(f"{data_dir}/ap2.zip")
+    index.add_documents(f"{data_dir}/ap3.zip")
+    index.compact()
+    assert frequencies(index)["oil"] == [300, 1, 1]
+
+
+@pytest.mark.parametrize("positional", [False, True])
+def test_build_flushing_the_postings_buffer(small_corpus, monkeypatch, positional):
+    index = InvertedIndex(positional)
+    index.build_index(small_corpus)
+
+    # Encoded and counted after every zip member instead of once at the end
+    monkeypatch.setattr(invertedIndex, "BUFFERED_POSTINGS", 1)
+    flushed = InvertedIndex(positional)
+    flushed.build_index(small_corpus)
+
+    assert {term: postings.to_list() for term, postings in flushed.get_index().items()} == {
+        term: postings.to_list() for term, postings in index.get_index().items()
+    }
+    assert frequencies(flushed) == frequencies(index)
+    assert flushed.get_statistics().summary() == index.get_statistics().summary()
+    assert flushed.get_statistics().df_histogram() == index.get_statistics().df_histogram()
+    assert flushed.get_index()["oil"].to_list() == [1, 2, 4, 7]
+
+
+def test_bitmap_operations_match_sets():
+    rng = random.Random(9)
+    first, second = set(rng.sample(range(1, 3000), 1200)), set(rng.sample(range(1, 3000), 900))
+    sparse = sorted(rng.sample(range(1, 4000), 60))
+    bitmap, other = BitmapPostings(sorted(first)), BitmapPostings(sorted(second))
+
+    assert list(bitmap) == sorted(first) and len(bitmap) == len(first)
+    assert bitmap.last_id == max(first)
+    assert all((doc_id in bitmap) == (doc_id in first) for doc_id in range(0, 3100))
+    assert bitmap.intersection(other).to_list() == sorted(first & second)
+    assert bitmap.union(other).to_list() == sorted(first | second)
+    assert bitmap.difference(other).to_list() == sorted(first - second)
+    assert len(bitmap.union(other)) == len(first | second)
+    assert bitmap.select(sparse) == [doc_id for doc_id in sparse if doc_id in first]
+    assert bitmap.select(sparse, present=False) == [doc_id for doc_id in sparse if doc_id not in first]
+    assert bitmap.with_ids(sparse).to_list() == sorted(first | set(sparse))
+    assert bitmap.without_ids(sparse).to_list() == sorted(first - set(sparse))
+    assert len(bitmap.without_ids(sparse)) == len(first - set(sparse))
+
+
+def test_optimize_postings_density_threshold():
+    postings = PostingsList(range(1, 11))
+    assert isinstance(optimize_postings(postings, 10 * BITMAP_DENSITY), BitmapPostings)
+    assert optimize_postings(postings, 10 * BITMAP_DENSITY + 1) is postings
+    assert optimize_postings(postings, 0) is postings
+
+
+def test_dense_terms_stored_as_bitmaps(small_corpus, tmp_path):
+    texts = [f"common {'rare' if number % 20 == 0 else 'word'}{number}" for number in range(1, 101)]
+    data_dir = write_corpus(str(tmp_path / "dense"), {
+        "ap.zip": [[(f"AP{number:06d}", text) for number, text in enumerate(texts, start=1)]]
+    })
+    index = InvertedIndex()
+    index.build_index(data_dir)
+    assert isinstance(index.get_index()["common"], BitmapPostings)
+    assert isinstance(index.get_index()["rare20"], PostingsList)
+    assert index.get_index()["common"].to_list() == list(range(1, 101))
+
+    index.save(str(tmp_path / "index.bin"))
+    loaded = InvertedIndex.load(str(tmp_path / "index.bin"))
+    assert isinstance(loaded.get_index()["common"], BitmapPostings)
+    assert loaded.get_index()["common"].to_list() == list(range(1, 101))
+
+    # Later documents are appended to the expanded list, and the term is a bitmap again
+    index.build_index(small_corpus)
+    assert isinstance(index.get_index()["common"], BitmapPostings)
+    assert index.get_index()["oil"].to_list() == [101, 102, 104, 107]
@@ -0,0 +1,56 @@
+import pytest
+
+from queryPlanner import And, Near, Not, Or, Phrase, QueryPlanner, Term, to_rpn
+
+DOC_FREQUENCIES = {"a": 30, "b": 5, "c": 10, "d": 20, "x": 1}
+
+
+def plan(text: str) -> object:
+    planner = QueryPlanner()
+    return planner.optimize(planner.parse(text.split()), lambda term: DOC_FREQUENCIES.get(term, 0))
+
+
+def terms(*names: str) -> tuple[Term, ...]:
+    return tuple(Term(name) for name in names)
+
+
+def test_parse_collapses_same_operator_chains():
+    planner = QueryPlanner()
+    assert planner.parse("a b AND c AND".split()) == And(terms("a", "b", "c"))
+    assert planner.parse("a b c AND AND".split()) == And(terms("a", "b", "c"))
+    assert planner.parse("a b OR c AND".split()) == And((Or(terms("a", "b")), Term("c")))
+
+
+@pytest.mark.parametrize("text", ["a AND", "a b", "a b c AND", "NOT"])
+def test_parse_rejects_malformed_queries(text):
+    with pytest.raises(ValueError):
+        QueryPlanner().parse(text.split())
+
+
+def test_operands_ordered_by_document_frequency():
+    assert plan("a b AND c AND") == And(terms("b", "c", "a"))
+    # OR estimates add up: (b OR x) = 6 < c = 10
+    assert plan("a c AND b x OR AND") == And((Or(terms("x", "b")), Term("c"), Term("a")))
+
+
+def test_not_chain_becomes_one_difference():
+    assert plan("a b NOT c NOT") == Not(Term("a"), Or(terms("b", "c")))
+    assert plan("a b NOT c NOT d NOT") == Not(Term("a"), Or(terms("b", "c", "d")))
+
+
+def test_and_of_differences_becomes_one_difference():
+    # (x AND (a NOT b)) AND (c NOT d) -> (x AND c AND a) NOT (b OR d)
+    assert plan("x a b NOT AND c d NOT AND") == Not(And(terms("x", "c", "a")), Or(terms("b", "d")))
+
+
+def test_positional_nodes_are_kept():
+    # A phrase is estimated by its rarer term: min(30, 5) < 10
+    assert plan("a b PHRASE c AND") == And((Phrase(Term("a"), Term("b")), Term("c")))
+    assert plan("b a NEAR/3") == Near(Term("b"), Term("a"), 3)
+
+
+def test_to_rpn_round_trip():
+    planner = QueryPlanner()
+    for text in ["a b AND c AND", "a b NOT c d OR NOT", "a b PHRASE c NEAR/2 x OR"]:
+        tree = planner.parse(text.split())
+        assert planner.parse(to_rpn(tree).split()) == tree
@@ -0,0 +1,53 @@
+import asyncio
+
+import pytest
+
+from invertedIndex import InvertedIndex
+from queryClient import QueryClient, QueryError
+from queryServer import QueryServer
+
+
+def test_blank_query_is_answered(small_corpus):
+    index = InvertedIndex()
+    index.build_index(small_corpus)
+
+    async def run() -> list:
+        server = QueryServer(index, port=0, workers=2)
+        await server.start()
+        try:
+            async with QueryClient(port=server.port) as client:
+                results = await client.pipeline(["oil prices AND", "", "   ", "new york AND"])
+                # Raw blank line: the next response still belongs to the next query
+                client._writer.write(b"\noil exports AND\n")
+                results += [await client._read_response(), await client._read_response()]
+                return results
+        finally:
+            await server.close()
+
+    results = asyncio.run(asyncio.wait_for(run(), timeout=30))
+    assert results[0] == ["AP000001", "AP000004"]
+    assert all(isinstance(result, QueryError) for result in (results[1], results[2], results[4]))
+    assert str(results[1]) == "Empty query."
+    assert results[3] == ["AP000003", "AP000004"]
+    assert results[5] == ["AP000002"]
+
+
+def test_truncated_response_raises():
+    async def truncated_server(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        await reader.readline()
+        writer.write(b"OK 5\nAP000001 AP000002\n")
+        await writer.drain()
+        writer.close()
+
+    async def run() -> None:
+        server = await asyncio.start_server(truncated_server, "127.0.0.1", 0)
+        port = server.sockets[0].getsockname()[1]
+        try:
+            async with QueryClient(port=port) as client:
+                with pytest.raises(ConnectionError, match="2 of 5"):
+                    await client.query("oil prices OR")
+        finally:
+            server.close()
+            await server.wait_closed()
+
+    asyncio.run(asyncio.wait_for(run(), timeout=30))
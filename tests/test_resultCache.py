@@ -0,0 +1,79 @@
+from booleanRetrieval import BooleanRetrieval
+from invertedIndex import InvertedIndex
+from resultCache import ENTRY_OVERHEAD_BYTES, ResultCache, result_nbytes
+
+from conftest import write_corpus
+
+
+def query(index: InvertedIndex, retrieval: BooleanRetrieval, text: str) -> list[str]:
+    return index.get_doc_id_map().to_original(retrieval._execute_query_retrieval(text.split(), index.get_index()))
+
+
+def test_lru_eviction_by_bytes():
+    entry_bytes = result_nbytes([1, 2, 3]) + ENTRY_OVERHEAD_BYTES
+    cache = ResultCache(max_bytes=3 * entry_bytes)
+    for key in "abc":
+        cache.put(key, [1, 2, 3])
+    assert cache.get("a") == [1, 2, 3]  # "b" is now the least recently used
+    cache.put("d", [1, 2, 3])
+
+    assert cache.get("b") is None
+    assert [cache.get(key) for key in "acd"] == [[1, 2, 3]] * 3
+    stats = cache.stats()
+    assert (stats["entries"], stats["bytes"], stats["evictions"]) == (3, 3 * entry_bytes, 1)
+    assert (stats["hits"], stats["misses"]) == (4, 1)
+
+    # Larger than the whole cache: not stored, nothing evicted
+    cache.put("e", list(range(1000)))
+    assert cache.get("e") is None and cache.stats()["evictions"] == 1
+
+
+def test_equivalent_queries_share_entries(small_corpus):
+    index = InvertedIndex()
+    index.build_index(small_corpus)
+    cache = ResultCache()
+    retrieval = BooleanRetrieval(cache=cache)
+
+    assert query(index, retrieval, "oil prices AND") == ["AP000001", "AP000004"]
+    hits = cache.stats()["hits"]
+    # Optimized plans are canonical: operand order doesn't matter
+    assert query(index, retrieval, "prices oil AND") == ["AP000001", "AP000004"]
+    assert cache.stats()["hits"] == hits + 1
+    # A sub-query result is reused inside a larger query
+    assert query(index, retrieval, "oil prices AND new NOT") == ["AP000001"]
+    assert cache.stats()["hits"] == hits + 2
+
+
+def test_invalidated_by_index_updates(small_corpus, tmp_path):
+    index = InvertedIndex()
+    index.build_index(small_corpus)
+    cache = ResultCache()
+    cache.bind(index)
+    retrieval = BooleanRetrieval(cache=cache)
+    assert query(index, retrieval, "oil prices AND") == ["AP000001", "AP000004"]
+
+    extra = write_corpus(str(tmp_path / "extra"), {"ap3.zip": [[("AP000009", "oil prices fall")]]})
+    index.add_documents(f"{extra}/ap3.zip")
+    assert cache.stats()["entries"] == 0
+    assert query(index, retrieval, "oil prices AND") == ["AP000001", "AP000004", "AP000009"]
+
+    index.delete_documents(["AP000001"])
+    assert query(index, retrieval, "oil prices AND") == ["AP000004", "AP000009"]
+
+    index.compact()
+    assert query(index, retrieval, "oil prices AND") == ["AP000004", "AP000009"]
+    assert cache.stats()["invalidations"] == 3
+
+
+def test_invalidated_by_reload(small_corpus, tmp_path):
+    index = InvertedIndex()
+    index.build_index(small_corpus)
+    cache = ResultCache()
+    retrieval = BooleanRetrieval(cache=cache)
+    assert query(index, retrieval, "oil prices AND") == ["AP000001", "AP000004"]
+
+    other = InvertedIndex()
+    other.build_index(write_corpus(str(tmp_path / "other"), {"ap.zip": [[("AP000100", "oil prices")]]}))
+    # Not bound to either index: a different mapping is noticed when it is queried
+    assert query(other, retrieval, "oil prices AND") == ["AP000100"]
+    assert cache.stats()["invalidations"] == 1
@@ -0,0 +1,112 @@
+import random
+
+import pytest
+
+import resultWriter
+from booleanRetrieval import BooleanRetrieval
+from docTable import DocTable
+from invertedIndex import InvertedIndex
+from resultWriter import VARINT_MAGIC, ResultWriter, read_queries, read_results
+
+from conftest import expected_result, random_tree_queries
+
+
+def random_results(seed: int) -> list[list[int]]:
+    rng = random.Random(seed)
+    results = [[], [1], [127, 128, 16383, 16384, 2_000_000, 300_000_000]]
+    for size in (5, 1000, 2500):
+        results.append(sorted(rng.sample(range(1, 5_000_000), size)))
+    return results
+
+
+def test_varint_round_trip(tmp_path):
+    results = random_results(0)
+    path = str(tmp_path / "results.bin")
+    with ResultWriter(path, output_format="varint") as writer:
+        # Any iterable, e.g. a streamed result
+        counts = [writer.write(iter(result)) for result in results]
+    assert counts == [len(result) for result in results]
+    assert list(read_results(path)) == results
+
+    with ResultWriter(path, output_format="varint") as writer:
+        writer.write([1, 3, 300])
+    # Header, then the gaps 1, 2, 297 (low 7 bits first) and the end of the result
+    assert (tmp_path / "results.bin").read_bytes()[8:] == bytes([1, 2, 0xA9, 0x02, 0])
+
+
+def test_read_results_rejects_other_files(tmp_path):
+    path = tmp_path / "results.txt"
+    path.write_bytes(b"AP000001 AP000002\n")
+    with pytest.raises(ValueError, match="not a varint result file"):
+        list(read_results(str(path)))
+    path.write_bytes(VARINT_MAGIC + bytes([2, 0, 0, 0]))
+    with pytest.raises(ValueError, match="Unsupported"):
+        list(read_results(str(path)))
+
+
+@pytest.mark.parametrize("doc_map", [
+    DocTable(f"AP{number:06d}" for number in range(1, 21)),
+    {number: f"AP{number:06d}" for number in range(1, 21)},
+])
+def test_text_output(tmp_path, monkeypatch, doc_map):
+    # Results converted over several chunks
+    monkeypatch.setattr(resultWriter, "WRITE_CHUNK", 3)
+    path = tmp_path / "results.txt"
+    with ResultWriter(str(path), doc_map) as writer:
+        writer.write(range(1, 21, 2))
+        writer.write([])
+        writer.write([20])
+    assert path.read_text().splitlines() == [
+        " ".join(f"AP{number:06d}" for number in range(1, 21, 2)), "", "AP000020"
+    ]
+
+
+def test_invalid_options(tmp_path):
+    with pytest.raises(ValueError, match="Unknown output format"):
+        ResultWriter(str(tmp_path / "results"), {}, output_format="json")
+    with pytest.raises(ValueError, match="needs a doc ID map"):
+        ResultWriter(str(tmp_path / "results"))
+
+
+def test_progress_is_throttled(tmp_path):
+    records = []
+    with ResultWriter(str(tmp_path / "results.bin"), output_format="varint", progress=records.append,
+                      progress_interval=3600) as writer:
+        for result in random_results(1):
+            writer.write(result)
+    # Only the record on close
+    assert [(record["event"], record["queries"], record["doc_ids"]) for record in records] == [
+        ("progress", 6, sum(map(len, random_results(1))))
+    ]
+
+    records.clear()
+    with ResultWriter(str(tmp_path / "results.bin"), output_format="varint", progress=records.append,
+                      progress_interval=0) as writer:
+        writer.write([1, 2])
+        writer.write([3])
+    assert [record["queries"] for record in records] == [1, 2, 2]
+
+
+def test_read_queries_streams_lines(tmp_path):
+    path = tmp_path / "queries.txt"
+    path.write_text("a b AND\n\n   \n  c  \n")
+    queries = read_queries(str(path))
+    assert next(queries) == "a b AND"
+    assert list(queries) == ["c"]
+
+
+@pytest.mark.parametrize("lazy", [False, True])
+def test_retrieve_varint_output(random_corpus, tmp_path, lazy):
+    data_dir, doc_sets = random_corpus
+    index = InvertedIndex()
+    index.build_index(data_dir)
+    queries = random_tree_queries(30, seed=8)
+    (tmp_path / "queries.txt").write_text("\n".join(queries) + "\n")
+
+    BooleanRetrieval(lazy=lazy).retrieve(
+        index.get_index(), None, str(tmp_path / "queries.txt"), str(tmp_path / "results.bin"), output_format="varint"
+    )
+    doc_map = index.get_doc_id_map()
+    assert [doc_map.to_original(result) for result in read_results(str(tmp_path / "results.bin"))] == [
+        expected_result(text, doc_sets) for text in queries
+    ]
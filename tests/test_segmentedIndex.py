@@ -0,0 +1,73 @@
+import pytest
+
+from invertedIndex import InvertedIndex
+from postingsList import BitmapPostings
+
+from conftest import write_corpus
+
+
+@pytest.fixture
+def loaded_index(small_corpus, tmp_path) -> InvertedIndex:
+    index = InvertedIndex(positional=True)
+    index.build_index(small_corpus)
+    index.save(str(tmp_path / "index.bin"))
+    return InvertedIndex.load(str(tmp_path / "index.bin"))
+
+
+@pytest.fixture
+def extra_corpus(tmp_path) -> str:
+    return write_corpus(str(tmp_path / "extra"), {"ap3.zip": [[("AP000009", "oil tax"), ("AP000010", "new tax")]]})
+
+
+def doc_ids(index: InvertedIndex, term: str) -> list[str]:
+    postings = index.get_index().get(term)
+    return index.get_doc_id_map().to_original(postings) if postings is not None else []
+
+
+def assert_owned(index: InvertedIndex) -> None:
+    """No list of the compacted base is still backed by the mapped file."""
+    for postings in index._inverted_index.values():
+        data = postings._bits if isinstance(postings, BitmapPostings) else postings._data
+        assert not isinstance(data, memoryview)
+
+
+def test_add_compact_then_build(loaded_index, extra_corpus, tmp_path):
+    loaded_index.add_documents(f"{extra_corpus}/ap3.zip")
+    loaded_index.compact()
+    assert_owned(loaded_index)
+
+    more = write_corpus(str(tmp_path / "more"), {"ap4.zip": [[("AP000011", "oil spill")]]})
+    loaded_index.build_index(more)
+    assert doc_ids(loaded_index, "oil") == ["AP000001", "AP000002", "AP000004", "AP000007", "AP000009", "AP000011"]
+    assert doc_ids(loaded_index, "tax") == ["AP000009", "AP000010"]
+    assert list(loaded_index.get_doc_lengths())[-3:] == [2, 2, 2]
+
+
+def test_delete_compact_save_reload(loaded_index, tmp_path):
+    index_path = str(tmp_path / "index.bin")
+    assert loaded_index.delete_documents(["AP000002", "AP000004"]) == 2
+    assert doc_ids(loaded_index, "oil") == ["AP000001", "AP000007"]
+    loaded_index.compact()
+    assert_owned(loaded_index)
+
+    loaded_index.save(index_path)
+    reloaded = InvertedIndex.load(index_path)
+    assert doc_ids(reloaded, "oil") == ["AP000001", "AP000007"]
+    assert "exports" not in reloaded.get_index()
+    assert list(reloaded.get_positional_index()["oil"]) == [[0], [1]]
+
+
+def test_delete_add_compact_rebuild(loaded_index, extra_corpus, tmp_path):
+    loaded_index.delete_documents(["AP000001"])
+    loaded_index.add_documents(f"{extra_corpus}/ap3.zip")
+    loaded_index.compact()
+    assert_owned(loaded_index)
+
+    more = write_corpus(str(tmp_path / "more"), {"ap4.zip": [[("AP000011", "tax oil")]]})
+    loaded_index.build_index(more)
+    assert doc_ids(loaded_index, "oil") == ["AP000002", "AP000004", "AP000007", "AP000009", "AP000011"]
+    assert list(loaded_index.get_frequency_index()["tax"]) == [1, 1, 1]
+
+    loaded_index.save(str(tmp_path / "index.bin"))
+    reloaded = InvertedIndex.load(str(tmp_path / "index.bin"))
+    assert doc_ids(reloaded, "tax") == ["AP000009", "AP000010", "AP000011"]
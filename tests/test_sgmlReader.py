@@ -0,0 +1,39 @@
+import io
+
+import pytest
+
+from sgmlReader import iter_documents
+
+SGML = (
+    b"<DOC>\n<DOCNO> AP880212-0001 </DOCNO>\n<FILEID>AP-NR-02-12-88</FILEID>\n"
+    b"<HEAD>Head line</HEAD>\n<TEXT>\n   First section.\n</TEXT>\n<NOTE>between</NOTE>\n"
+    b"<TEXT>\nSecond section,\n two lines.\n</TEXT>\n</DOC>\n"
+    b"junk between documents\n"
+    b"<DOC>\n<DOCNO>AP880212-0002</DOCNO>\n<TEXT>\n Caf\xe9 \xbdprice\n</TEXT>\n</DOC>\n"
+    b"<DOC>\n<DOCNO> AP880212-0003 </DOCNO>\n<HEAD>No text</HEAD>\n</DOC>\n"
+    b"<DOC>\n<TEXT>\nno docno\n</TEXT>\n<TEXT>\n\n</TEXT>\n</DOC>\n"
+)
+EXPECTED = [
+    ("AP880212-0001", "First section.\nSecond section,\n two lines."),
+    ("AP880212-0002", "Caf\xe9 \xbdprice"),
+    ("AP880212-0003", ""),
+    (None, "no docno"),
+]
+
+
+def test_documents_and_text_sections():
+    assert list(iter_documents(io.BytesIO(SGML))) == EXPECTED
+
+
+@pytest.mark.parametrize("chunk_size", [1, 2, 3, 4, 5, 6, 7, 8, 13, 64, 100, len(SGML) - 1, len(SGML)])
+def test_tags_split_across_chunks(chunk_size):
+    assert list(iter_documents(io.BytesIO(SGML), chunk_size)) == EXPECTED
+
+
+def test_incomplete_document_at_end():
+    truncated = SGML + b"<DOC>\n<DOCNO> AP880212-0004 </DOCNO>\n<TEXT>\ncut off"
+    assert list(iter_documents(io.BytesIO(truncated), 16)) == EXPECTED
+
+
+def test_empty_stream():
+    assert list(iter_documents(io.BytesIO(b""))) == []
@@ -0,0 +1,56 @@
+import pytest
+
+from booleanRetrieval import BooleanRetrieval
+from invertedIndex import InvertedIndex
+from shardedIndex import ShardedIndex
+
+from conftest import write_corpus
+
+
+def test_fewer_members_than_shards(small_corpus, tmp_path, caplog):
+    queries = ["oil prices AND", "new york AND council OR", "prices oil NOT"]
+    query_file = tmp_path / "queries.txt"
+    query_file.write_text("\n".join(queries[:2]) + "\n\n" + queries[2] + "\n", encoding="utf-8")
+
+    index = InvertedIndex()
+    index.build_index(small_corpus)
+    retrieval = BooleanRetrieval()
+    expected = [
+        " ".join(index.get_doc_id_map().to_original(retrieval._execute_query_retrieval(query.split(), index.get_index())))
+        for query in queries
+    ]
+
+    # 4 zip members for 8 requested shards
+    with ShardedIndex(n_shards=8) as sharded_index:
+        sharded_index.build_index(small_corpus)
+        assert sharded_index.n_shards == 4
+        assert len(sharded_index.shard_sizes()) == 4
+        assert "8 shards requested, but" in caplog.text and "only 4 zip members" in caplog.text
+        sharded_index.retrieve(str(query_file), str(tmp_path / "results.txt"))
+
+    assert (tmp_path / "results.txt").read_text(encoding="utf-8").splitlines() == expected
+
+
+@pytest.mark.parametrize("n_members, n_shards, expected_sizes", [
+    (9, 4, [2, 2, 3, 2]),
+    (5, 4, [1, 1, 2, 1]),
+    (4, 4, [1, 1, 1, 1]),
+    (3, 4, [1, 1, 1]),
+    (8, 1, [8]),
+])
+def test_plan_shards_equal_members(tmp_path, n_members, n_shards, expected_sizes):
+    documents = [[(f"AP{number:06d}", "oil prices")] for number in range(n_members)]
+    data_dir = write_corpus(str(tmp_path / "data"), {"ap.zip": documents})
+    shards = InvertedIndex._plan_shards(data_dir, n_shards)
+    assert [sum(len(file_names) for _, file_names in shard) for shard in shards] == expected_sizes
+    # Contiguous, in member order, each member once
+    file_names = [file_name for shard in shards for _, names in shard for file_name in names]
+    assert file_names == [f"ap.zip.{number}" for number in range(n_members)]
+
+
+def test_plan_shards_balances_sizes(tmp_path):
+    # One large member first, then small ones: the large one is a shard of its own
+    documents = [[("AP000000", "oil " * 6000)]] + [[(f"AP{number:06d}", "oil " * 100)] for number in range(1, 31)]
+    data_dir = write_corpus(str(tmp_path / "data"), {"ap.zip": documents})
+    shards = InvertedIndex._plan_shards(data_dir, 2)
+    assert [sum(len(file_names) for _, file_names in shard) for shard in shards] == [1, 30]
@@ -0,0 +1,76 @@
+import pickle
+
+import pytest
+
+from booleanRetrieval import BooleanRetrieval
+from invertedIndex import InvertedIndex
+from textAnalyzer import ENGLISH_STOPWORDS, Analyzer, s_stem
+
+from conftest import write_corpus
+
+
+def test_case_folding_and_punctuation():
+    analyzer = Analyzer(lowercase=True, strip_punctuation=True)
+    assert analyzer.analyze("Said, said. SAID “said” -- U.S.") == ["said"] * 4 + ["u.s"]
+    assert analyzer.analyze_term("Prices,") == "prices"
+    assert analyzer.analyze_term("...") is None
+    assert analyzer.analyze_pattern("Comput*") == "comput*"
+
+
+def test_default_analyzer_keeps_tokens():
+    analyzer = Analyzer()
+    assert analyzer.analyze("Said, said.\n SAID") == ["Said,", "said.", "SAID"]
+    assert analyzer.analyze_term("Said,") == "Said,"
+
+
+def test_stopwords_and_stemming():
+    analyzer = Analyzer(lowercase=True, stopwords=ENGLISH_STOPWORDS, stemmer="s")
+    assert analyzer.analyze("The cities of the Companies are big buses") == ["city", "company", "big", "buse"]
+    assert [s_stem(term) for term in ["cats", "glass", "status", "does", "toes", "is"]] == [
+        "cat", "glass", "status", "doe", "toe", "is"
+    ]
+    with pytest.raises(ValueError, match="Unknown stemmer"):
+        Analyzer(stemmer="porter2")
+
+
+def test_terms_are_interned():
+    analyzer = Analyzer(lowercase=True, strip_punctuation=True)
+    # Built at run time, so the strings are distinct objects
+    first = analyzer.analyze(" ".join(["Oil" + suffix for suffix in ("", ",", ".")]))
+    second = analyzer.analyze("".join(["o", "i", "l"]))
+    assert first == ["oil"] * 3
+    assert all(term is second[0] for term in first)
+
+
+def test_cache_is_bounded():
+    analyzer = Analyzer(lowercase=True, cache_size=2)
+    assert analyzer.analyze("A B C D A") == ["a", "b", "c", "d", "a"]
+    assert len(analyzer._cache) == 2
+
+
+def test_config_round_trip():
+    analyzer = Analyzer(lowercase=True, stopwords=["the"], stemmer="s")
+    copy = pickle.loads(pickle.dumps(analyzer))
+    assert copy.config() == analyzer.config() == Analyzer(**analyzer.config()).config()
+    assert copy.analyze("The Cats") == ["cat"]
+
+
+def test_index_and_queries_use_the_same_analyzer(tmp_path):
+    data_dir = write_corpus(str(tmp_path / "data"), {"ap.zip": [[
+        ("AP000001", "Oil prices rose."), ("AP000002", "The OIL price, again"), ("AP000003", "prices of gas"),
+    ]]})
+    analyzer = Analyzer(lowercase=True, strip_punctuation=True, stopwords=ENGLISH_STOPWORDS, stemmer="s")
+    index = InvertedIndex(analyzer=analyzer)
+    index.build_index(data_dir)
+    assert sorted(index.get_index()) == ["again", "ga", "oil", "price", "rose"]
+
+    index.save(str(tmp_path / "index.bin"))
+    loaded = InvertedIndex.load(str(tmp_path / "index.bin"))
+    assert loaded.get_analyzer().config() == analyzer.config()
+
+    retrieval = BooleanRetrieval(analyzer=loaded.get_analyzer())
+    doc_ids = retrieval._execute_query_retrieval("OIL, Prices AND".split(), loaded.get_index())
+    assert loaded.get_doc_id_map().to_original(doc_ids) == ["AP000001", "AP000002"]
+    # A stopword operand is dropped from its operator
+    doc_ids = retrieval._execute_query_retrieval("the prices AND".split(), loaded.get_index())
+    assert loaded.get_doc_id_map().to_original(doc_ids) == ["AP000001", "AP000002", "AP000003"]
@@ -0,0 +1,122 @@
+import string
+import sys
+from typing import Callable, Iterable, Optional
+
+# A small English stopword list (pass stopwords=ENGLISH_STOPWORDS to drop them)
+ENGLISH_STOPWORDS = frozenset("""
+a an and are as at be but by for from has have he in is it its of on or that the their they this to was
+were will with
+""".split())
+
+# Characters stripped from both ends of a token with strip_punctuation=True
+PUNCTUATION = string.punctuation + "‘’“”"
+# Cache lookup miss (None is a cached result: the token is dropped)
+_MISSING = object()
+
+
+def s_stem(term: str) -> str:
+    """Harman's S-stemmer: conflate English plurals."""
+    if len(term) > 3 and term.endswith("ies") and not term.endswith(("eies", "aies")):
+        return term[:-3] + "y"
+    if len(term) > 3 and term.endswith("es") and not term.endswith(("aes", "ees", "oes")):
+        return term[:-1]
+    if len(term) > 2 and term.endswith("s") and not term.endswith(("us", "ss")):
+        return term[:-1]
+    return term
+
+
+# Stemmers by name, so an index file can record which one it was built with
+# (register others before building / loading, e.g. STEMMERS["porter"] = PorterStemmer().stem)
+STEMMERS: dict[str, Callable[[str], str]] = {"s": s_stem}
+
+
+class Analyzer:
+    """
+    Turns text into index terms: whitespace tokens, then (optionally) lowercased, stripped of
+    surrounding punctuation, stopwords dropped and stemmed
+    The same analyzer must be used at index and query time. Each distinct token is analyzed once
+    (cached), and the resulting terms are interned so the index keys share one string object per term.
+    The default analyzer keeps tokens as they are (plain whitespace split).
+    """
+    def __init__(
+        self,
+        lowercase: bool = False,
+        strip_punctuation: bool = False,
+        stopwords: Iterable[str] = (),
+        stemmer: Optional[str] = None,
+        cache_size: int = 1 << 20
+        ):
+        if stemmer is not None and stemmer not in STEMMERS:
+            raise ValueError(f"Unknown stemmer {stemmer!r}, expected one of {sorted(STEMMERS)}.")
+        self.lowercase = lowercase
+        self.strip_punctuation = strip_punctuation
+        self.stopwords = frozenset(stopwords)
+        self.stemmer = stemmer
+        self.cache_size = cache_size
+        self._stem = STEMMERS[stemmer] if stemmer is not None else None
+        # {'raw_token': term or None (dropped), ...}
+        self._cache: dict[str, Optional[str]] = {}
+        self._identity = not (lowercase or strip_punctuation or self.stopwords or stemmer)
+
+    def analyze(self, text: str) -> list[str]:
+        """Terms of a text, in order."""
+        if self._identity:
+            return text.split()
+
+        cache = self._cache
+        terms = []
+        for token in text.split():
+            term = cache.get(token, _MISSING)
+            if term is _MISSING:
+                term = self.__analyze_token(token)
+            if term is not None:
+                terms.append(term)
+        return terms
+
+    def analyze_term(self, token: str) -> Optional[str]:
+        """The term of a single token (e.g. a query operand), None if it is dropped."""
+        if self._identity:
+            return token
+        term = self._cache.get(token, _MISSING)
+        if term is _MISSING:
+            term = self.__analyze_token(token)
+        return term
+
+    def analyze_pattern(self, pattern: str) -> str:
+        """A wildcard pattern in index term form: only lowercased (partial words aren't stripped or stemmed)."""
+        return pattern.lower() if self.lowercase else pattern
+
+    def __analyze_token(self, token: str) -> Optional[str]:
+        """Run the pipeline on a token and cache the result."""
+        term = token
+        if self.lowercase:
+            term = term.lower()
+        if self.strip_punctuation:
+            term = term.strip(PUNCTUATION)
+        if not term or term in self.stopwords:
+            term = None
+        else:
+            if self._stem is not None:
+                term = self._stem(term)
+            term = sys.intern(term)
+
+        if len(self._cache) < self.cache_size:
+            self._cache[token] = term
+        return term
+
+    def config(self) -> dict:
+        """Settings that recreate this analyzer (stored in index files)."""
+        return {
+            "lowercase": self.lowercase,
+            "strip_punctuation": self.strip_punctuation,
+            "stopwords": sorted(self.stopwords),
+            "stemmer": self.stemmer,
+        }
+
+    def __reduce__(self):
+        # Worker processes get the settings, not the token cache
+        return _analyzer_from_config, (self.config(),)
+
+
+def _analyzer_from_config(config: dict) -> Analyzer:
+    return Analyzer(**config)